@@ -0,0 +1,72 @@
+import time
+
+# Change between two consecutive samples that counts as a transient, per metric.
+DEFAULT_THRESHOLDS = {
+    "temperature": 2,
+    "core_clock": 50,
+    "memory_clock": 100,
+    "power_usage": 10,
+    "utilization": 10,
+}
+
+class AdaptiveInterval:
+    """
+    Chooses the next sampling interval from the samples seen so far.
+
+    - Transients (a metric moving more than its threshold between two samples)
+      and boost() calls, e.g. right after an apply, drop the interval to min_ms.
+    - While values stay stable the interval doubles (backoff) up to max_ms.
+    - While the window is hidden or unfocused it is at least background_ms.
+    """
+
+    def __init__(self, min_ms: int = 250, max_ms: int = 4000, background_ms: int = 10000,
+                 backoff: float = 2.0, thresholds=None, boost_seconds: float = 5.0):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.background_ms = background_ms
+        self.backoff = backoff
+        self.thresholds = dict(thresholds or DEFAULT_THRESHOLDS)
+        self.boost_seconds = boost_seconds
+        self.background = False
+        self._interval = min_ms
+        self._previous = {}
+        self._boost_until = 0.0
+
+    @property
+    def interval_ms(self) -> int:
+        """Interval to wait before the next sample."""
+        if self.background:
+            return max(self._interval, self.background_ms)
+        if time.monotonic() < self._boost_until:
+            return self.min_ms
+        return self._interval
+
+    def is_transient(self, devices) -> bool:
+        """Compares the samples with the previous ones and remembers them."""
+        transient = False
+        for stats in devices:
+            index = stats.get("index", 0)
+            previous = self._previous.get(index)
+            if previous is not None:
+                for metric, threshold in self.thresholds.items():
+                    old, new = previous.get(metric), stats.get(metric)
+                    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and abs(new - old) >= threshold:
+                        transient = True
+            self._previous[index] = stats
+        return transient
+
+    def observe(self, devices) -> int:
+        """Feeds one sample of all GPUs and returns the next interval."""
+        if self.is_transient(devices):
+            self._interval = self.min_ms
+        else:
+            self._interval = min(int(self._interval * self.backoff), self.max_ms)
+        return self.interval_ms
+
+    def boost(self, seconds: float = None):
+        """Samples at min_ms for a while, e.g. while new settings take effect."""
+        self._boost_until = time.monotonic() + (self.boost_seconds if seconds is None else seconds)
+        self._interval = self.min_ms
+
+    def set_background(self, background: bool):
+        self.background = background
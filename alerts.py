@@ -0,0 +1,230 @@
+import json
+import logging
+import operator
+import os
+import re
+import shlex
+import subprocess
+import time
+from collections import deque
+
+import gpu
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "&": lambda value, mask: bool(int(value) & mask), # any bit of a mask such as throttle_reasons
+}
+ACTIONS = ["log", "hook", "reset", "profile"]
+HOOK_TIMEOUT = 30 # seconds
+CONDITION_PATTERN = re.compile(r"^\s*(?:avg\((?P<avg>\w+)\)|(?P<metric>\w+))\s*(?P<op>>=|<=|==|!=|>|<|&)\s*(?P<value>\S+)\s*$")
+
+class Condition:
+    """
+    One comparison of a metric with a constant, e.g. "temperature > 83". With
+    avg(metric) the mean over the rule's window is compared instead; the
+    window keeps a running sum, so adding a sample is amortized O(1).
+    """
+
+    def __init__(self, text: str):
+        match = CONDITION_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"Invalid condition {text!r}, expected e.g. 'temperature > 83' or 'avg(power_usage) >= 300'.")
+        self.text = text.strip()
+        self.average = match["avg"] is not None
+        self.metric = match["avg"] or match["metric"]
+        if self.metric not in gpu.QUERY_FIELDS:
+            raise ValueError(f"Unknown metric {self.metric!r} in condition {text!r}, expected one of {', '.join(gpu.QUERY_FIELDS)}.")
+        self.op = OPERATORS[match["op"]]
+        try:
+            self.value = int(match["value"], 0) if match["op"] == "&" else float(match["value"])
+        except ValueError:
+            raise ValueError(f"Invalid number in condition {text!r}.")
+
+class Rule:
+    """
+    A named set of conditions that must all hold, on one GPU, continuously
+    for `duration` seconds before `action` runs. It fires once per streak
+    and at most once per `cooldown` seconds.
+    """
+
+    def __init__(self, name: str, conditions, duration: float = 0, window: float = None, action: str = "log",
+                 command: str = None, profile: str = "Default", cooldown: float = 60, gpus=None):
+        if action not in ACTIONS:
+            raise ValueError(f"Rule '{name}': unknown action {action!r}, expected one of {', '.join(ACTIONS)}.")
+        if action == "hook" and not command:
+            raise ValueError(f"Rule '{name}': the hook action needs a command.")
+        self.name = name
+        self.conditions = [Condition(text) for text in ([conditions] if isinstance(conditions, str) else conditions)]
+        self.duration = duration
+        self.window = window if window is not None else max(duration, 10)
+        self.action = action
+        self.command = command
+        self.profile = profile
+        self.cooldown = cooldown
+        self.gpus = set(gpus) if gpus is not None else None
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Builds a rule from its JSON form: {"name", "when", "for", "window", "action", ...}."""
+        try:
+            return cls(data["name"], data["when"], data.get("for", 0), data.get("window"), data.get("action", "log"),
+                       data.get("command"), data.get("profile", "Default"), data.get("cooldown", 60), data.get("gpus"))
+        except KeyError as e:
+            raise ValueError(f"Rule {data.get('name', data)!r} is missing {e}.")
+
+def load_rules(path: str):
+    """Reads a JSON list of rules. Raises ValueError if the file is not valid."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read rules from '{path}': {e}")
+    if not isinstance(data, list):
+        raise ValueError(f"'{path}' must contain a JSON list of rules.")
+    rules = [Rule.from_dict(rule) for rule in data]
+    check_unique_names(rules)
+    return rules
+
+def check_unique_names(rules):
+    """Events and actions refer to rules by name, so two rules must not share one."""
+    seen = set()
+    for rule in rules:
+        if rule.name in seen:
+            raise ValueError(f"Duplicate rule name '{rule.name}'. Rule names must be unique.")
+        seen.add(rule.name)
+
+class RuleState:
+    """Streak and window state of one rule on one GPU."""
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.since = None # start of the current streak of matching samples
+        self.fired = False
+        self.last_fired = None
+        # Per avg() condition: deque of (time, value) inside the window and its running sum.
+        self.windows = [[deque(), 0.0] if condition.average else None for condition in rule.conditions]
+
+    def matches(self, stats, now: float) -> bool:
+        matched = True
+        for condition, window in zip(self.rule.conditions, self.windows):
+            value = stats.get(condition.metric)
+            if not isinstance(value, (int, float)):
+                matched = False
+                continue
+            if window is not None:
+                samples = window[0]
+                samples.append((now, value))
+                window[1] += value
+                while samples[0][0] <= now - self.rule.window:
+                    window[1] -= samples.popleft()[1]
+                value = window[1] / len(samples)
+            if not condition.op(value, condition.value):
+                matched = False
+        return matched
+
+    def update(self, stats, now: float) -> bool:
+        """Feeds one sample; returns True if the rule fires on it."""
+        if not self.matches(stats, now):
+            self.since = None
+            self.fired = False
+            return False
+        if self.since is None:
+            self.since = now
+        if self.fired or now - self.since < self.rule.duration:
+            return False
+        if self.last_fired is not None and now - self.last_fired < self.rule.cooldown:
+            return False
+        self.fired = True
+        self.last_fired = now
+        return True
+
+class Watchdog:
+    """
+    Evaluates rules on the sample stream, one RuleState per rule and GPU, so
+    a sample costs a constant amount of work per rule whatever the window
+    lengths. `runner(event)` is called for every firing; it must not block the
+    sampling loop (see ActionRunner). Without a runner events are only returned.
+    """
+
+    def __init__(self, rules, runner=None):
+        self.rules = rules
+        self.runner = runner
+        self.states = {} # (rule position, GPU index) -> RuleState
+        self.events = 0
+
+    def on_sample(self, devices, now: float = None):
+        """Feeds the samples of all GPUs and returns the events that fired."""
+        now = time.time() if now is None else now
+        events = []
+        for stats in devices:
+            index = stats.get("index", 0)
+            for position, rule in enumerate(self.rules):
+                if rule.gpus is not None and index not in rule.gpus:
+                    continue
+                state = self.states.get((position, index))
+                if state is None:
+                    state = self.states[(position, index)] = RuleState(rule)
+                if state.update(stats, now):
+                    values = {condition.metric: stats.get(condition.metric) for condition in rule.conditions}
+                    events.append({"time": now, "rule": rule.name, "gpu": index, "action": rule.action, "values": values})
+        self.events += len(events)
+        for event in events:
+            logging.warning(f"Watchdog: rule '{event['rule']}' fired on GPU {event['gpu']} {event['values']}, action {event['action']}.")
+            if self.runner:
+                self.runner(event)
+        return events
+
+class ActionRunner:
+    """
+    Runs the actions of fired rules. `submit(func, *args)` hands the work to a
+    background executor so hooks and privileged writes never stall sampling.
+    """
+
+    def __init__(self, rules, submit):
+        check_unique_names(rules)
+        self.rules = {rule.name: rule for rule in rules}
+        self.submit = submit
+
+    def __call__(self, event):
+        rule = self.rules[event["rule"]]
+        if rule.action == "hook":
+            self.submit(run_hook, rule.command, event)
+        elif rule.action == "reset":
+            import gpu
+            self.submit(gpu.reset_all_settings, [event["gpu"]])
+        elif rule.action == "profile":
+            import profiles
+            self.submit(profiles.apply_profile, rule.profile, [event["gpu"]])
+
+def run_hook(command: str, event: dict):
+    """Runs a hook command with the event in NVIDIAOC_RULE, NVIDIAOC_GPU and NVIDIAOC_EVENT (JSON)."""
+    env = dict(os.environ, NVIDIAOC_RULE=event["rule"], NVIDIAOC_GPU=str(event["gpu"]), NVIDIAOC_EVENT=json.dumps(event))
+    try:
+        result = subprocess.run(shlex.split(command), env=env, capture_output=True, text=True, timeout=HOOK_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.error(f"Watchdog hook '{command}' failed: {e}")
+        return
+    if result.returncode != 0:
+        logging.error(f"Watchdog hook '{command}' exited with status {result.returncode}: {result.stderr.strip()}")
+
+def check_recording(rules, recording):
+    """
+    Replays a recorder.Recording through the rules without running actions;
+    returns the events. Raises ValueError if a rule needs a metric the
+    recording does not store, since such a rule could never fire.
+    """
+    for rule in rules:
+        missing = [condition.metric for condition in rule.conditions if condition.metric not in recording.metrics]
+        if missing:
+            raise ValueError(f"Rule '{rule.name}' uses {', '.join(missing)}, which the recording does not contain "
+                             f"(it has {', '.join(recording.metrics)}).")
+    watchdog = Watchdog(rules)
+    events = []
+    for timestamp, devices in recording.samples():
+        events += watchdog.on_sample(devices, timestamp)
+    return events
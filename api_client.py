@@ -0,0 +1,112 @@
+import http.client
+import json
+import os
+import socket
+
+def get_token_path(port: int):
+    """File holding the control token of a daemon listening on TCP port `port`."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, f"nvidiaoc-daemon-{port}.token")
+
+def read_token(port: int):
+    """Returns the control token of the daemon on `port`, or None if it cannot be read."""
+    try:
+        with open(get_token_path(port)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection talking to a server on a Unix socket."""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class ApiError(Exception):
+    """Raised when the monitor API cannot be reached or rejects a request."""
+
+class ApiClient:
+    """
+    Client of the local monitor API served by `--daemon`. Lets the GUI and
+    scripts share the daemon's single sampler instead of querying the GPU.
+    :param address: "HOST:PORT" or "unix:/path/to.sock".
+    """
+
+    def __init__(self, address: str, timeout: float = 10):
+        self.address = address
+        self.timeout = timeout
+
+    def _connect(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.address.startswith("unix:"):
+            return UnixHTTPConnection(self.address[len("unix:"):], timeout=timeout)
+        host, _, port = self.address.rpartition(":")
+        return http.client.HTTPConnection(host or "127.0.0.1", int(port), timeout=timeout)
+
+    def _request(self, method, path, body=None, timeout=None):
+        connection = self._connect(timeout)
+        try:
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {"Content-Type": "application/json"} if payload is not None else {}
+            if not self.address.startswith("unix:"):
+                # Over TCP the daemon only accepts control requests carrying the token it wrote for its user.
+                token = read_token(int(self.address.rpartition(":")[2]))
+                if token:
+                    headers["Authorization"] = f"Bearer {token}"
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"null")
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            raise ApiError(f"{method} {path} failed: {e}") from e
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise ApiError(f"{method} {path} returned {response.status}: {data}")
+        return data
+
+    def get_stats(self):
+        """Returns the latest stats of all GPUs as a list of dictionaries."""
+        return self._request("GET", "/api/stats")["devices"]
+
+    def get_history(self, gpu_index=0, metric="temperature", seconds=600):
+        """Returns (time, mean, min, max) points of one GPU metric."""
+        data = self._request("GET", f"/api/history?gpu={gpu_index}&metric={metric}&seconds={seconds}")
+        return [tuple(point) for point in data["points"]]
+
+    def get_diagnostics(self):
+        """Returns the daemon's external command counters and latencies per command family."""
+        return self._request("GET", "/api/diagnostics")["commands"]
+
+    def apply(self, fan_speed, core_offset, mem_offset, gpu_indices=(0,)):
+        # Applies can wait on an authentication dialog, so no short timeout here.
+        return self._request("POST", "/api/apply", {
+            "fan_speed": fan_speed, "core_clock": core_offset, "mem_clock": mem_offset, "gpus": list(gpu_indices)
+        }, timeout=300)
+
+    def reset(self, gpu_indices=(0,)):
+        return self._request("POST", "/api/reset", {"gpus": list(gpu_indices)}, timeout=300)
+
+    def load_profile(self, name, gpu_indices=(0,)):
+        return self._request("POST", "/api/profile", {"name": name, "gpus": list(gpu_indices)}, timeout=300)
+
+    def stream(self):
+        """Yields {"time": ..., "devices": [...]} for every sample pushed by the server."""
+        connection = self._connect(timeout=None)
+        try:
+            connection.request("GET", "/api/stream")
+            response = connection.getresponse()
+            if response.status != 200:
+                raise ApiError(f"GET /api/stream returned {response.status}")
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException) as e:
+            raise ApiError(f"Stream failed: {e}") from e
+        finally:
+            connection.close()
@@ -0,0 +1,300 @@
+import logging
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+# clocks_throttle_reasons bits that mean the card is in trouble rather than
+# merely at its power cap: HW slowdown, SW thermal, HW thermal, power brake.
+THROTTLE_FAILURE_MASK = 0x08 | 0x20 | 0x40 | 0x80
+DEFAULT_TEMPERATURE_LIMIT = 83
+
+class AutotuneError(Exception):
+    """Raised when the search cannot continue (apply failed, unstable at the baseline...)."""
+
+class ProbeResult:
+    """Outcome of one probe run: stable or not, an optional throughput score and why it failed."""
+
+    def __init__(self, stable: bool, score: float = None, reason: str = ""):
+        self.stable = stable
+        self.score = score
+        self.reason = reason
+
+    def __repr__(self):
+        return f"ProbeResult(stable={self.stable}, score={self.score}, reason={self.reason!r})"
+
+class CommandProbe:
+    """
+    Runs an external stability/throughput benchmark at each step. The offsets
+    under test are passed in NVIDIAOC_CORE_OFFSET and NVIDIAOC_MEM_OFFSET. A
+    zero exit status means stable; if the last line of stdout is a number it
+    is used as the throughput score (higher is better).
+    """
+
+    def __init__(self, command, timeout: float = 300):
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.timeout = timeout
+
+    def __call__(self, core_offset: int, mem_offset: int) -> ProbeResult:
+        env = dict(os.environ, NVIDIAOC_CORE_OFFSET=str(core_offset), NVIDIAOC_MEM_OFFSET=str(mem_offset))
+        try:
+            result = subprocess.run(self.command, capture_output=True, text=True, timeout=self.timeout, env=env)
+        except subprocess.TimeoutExpired:
+            return ProbeResult(False, reason=f"probe timed out after {self.timeout:g} s")
+        except OSError as e:
+            raise AutotuneError(f"Cannot run probe {self.command[0]!r}: {e}")
+        if result.returncode != 0:
+            return ProbeResult(False, reason=f"probe exited with status {result.returncode}")
+        lines = result.stdout.strip().splitlines()
+        try:
+            score = float(lines[-1]) if lines else None
+        except ValueError:
+            score = None
+        return ProbeResult(True, score)
+
+def check_stats(devices, temperature_limit: int = DEFAULT_TEMPERATURE_LIMIT):
+    """Returns why a telemetry sample fails the limits, or "" if it is fine."""
+    for stats in devices:
+        index = stats.get("index", 0)
+        temperature = stats.get("temperature")
+        if isinstance(temperature, int) and temperature >= temperature_limit:
+            return f"GPU {index} reached {temperature} °C"
+        reasons = stats.get("throttle_reasons")
+        if isinstance(reasons, int) and reasons & THROTTLE_FAILURE_MASK:
+            return f"GPU {index} throttled (reasons {reasons:#x})"
+    return ""
+
+class TelemetryWatch:
+    """
+    Samples telemetry in a background thread while a probe runs and keeps
+    the first violation of the limits. stop() takes one last sample, so even
+    an instantaneous probe is checked at least once.
+    """
+
+    def __init__(self, read_stats, temperature_limit: int = DEFAULT_TEMPERATURE_LIMIT, interval: float = 1.0):
+        self.read_stats = read_stats
+        self.temperature_limit = temperature_limit
+        self.interval = interval
+        self.violation = ""
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        if self.violation:
+            return
+        try:
+            self.violation = check_stats(self.read_stats(), self.temperature_limit)
+        except Exception as e:
+            self.violation = f"telemetry read failed: {e}"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.violation = ""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.violation
+
+def binary_search(is_stable, low: int, high: int, step: int) -> int:
+    """
+    Highest stable multiple of step above low, up to high. Assumes low is
+    stable and that stability only gets worse as the offset grows.
+    """
+    good, bad = 0, (high - low) // step + 1
+    while bad - good > 1:
+        middle = (good + bad) // 2
+        if is_stable(low + middle * step):
+            good = middle
+        else:
+            bad = middle
+    return low + good * step
+
+def step_search(is_stable, low: int, high: int, step: int) -> int:
+    """Raises the offset one step at a time until the first failure."""
+    best = low
+    while best + step <= high and is_stable(best + step):
+        best += step
+    return best
+
+STRATEGIES = {"binary": binary_search, "step": step_search}
+
+class AutoTuner:
+    """
+    Searches the highest stable core, then memory clock offset.
+
+    Each point is applied with apply_settings(core, mem), tested with
+    probe(core, mem) while a TelemetryWatch checks read_stats(), and rolled
+    back to the last good point as soon as it fails. The three callables are
+    the whole hardware interface, so SimulatedGpu can stand in for a card.
+    """
+
+    def __init__(self, apply_settings, probe, read_stats, strategy: str = "binary",
+                 core_range=(0, 300), mem_range=(0, 1500), core_step: int = 15, mem_step: int = 50,
+                 temperature_limit: int = DEFAULT_TEMPERATURE_LIMIT, sample_interval: float = 1.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}.")
+        self.apply_settings = apply_settings
+        self.probe = probe
+        self.read_stats = read_stats
+        self.search = STRATEGIES[strategy]
+        self.core_range = core_range
+        self.mem_range = mem_range
+        self.core_step = core_step
+        self.mem_step = mem_step
+        self.temperature_limit = temperature_limit
+        self.sample_interval = sample_interval
+        self.results = [] # (core, mem, ProbeResult) of every point tested
+        self.last_good = None
+
+    def apply(self, core: int, mem: int):
+        if not self.apply_settings(core, mem):
+            raise AutotuneError(f"Applying core {core:+d} MHz / mem {mem:+d} MHz failed.")
+
+    def try_point(self, core: int, mem: int) -> bool:
+        """Applies and probes one point; rolls back to the last good one if it fails."""
+        self.apply(core, mem)
+        watch = TelemetryWatch(self.read_stats, self.temperature_limit, self.sample_interval)
+        watch.start()
+        try:
+            result = self.probe(core, mem)
+        finally:
+            violation = watch.stop()
+        if result.stable and violation:
+            result = ProbeResult(False, result.score, violation)
+        self.results.append((core, mem, result))
+        if result.stable:
+            logging.info(f"Autotune: core {core:+d} / mem {mem:+d} MHz stable (score {result.score}).")
+            self.last_good = (core, mem)
+        else:
+            logging.warning(f"Autotune: core {core:+d} / mem {mem:+d} MHz failed: {result.reason}.")
+            if self.last_good is not None:
+                self.apply(*self.last_good)
+        return result.stable
+
+    def best(self):
+        """
+        The best stable point: the highest score if the probe reports one
+        (memory errors corrected by retries can cost throughput before they
+        crash), otherwise the last good point of the search.
+        """
+        stable = [(core, mem, result.score) for core, mem, result in self.results if result.stable]
+        scored = [point for point in stable if point[2] is not None]
+        if scored:
+            core, mem, _ = max(scored, key=lambda point: point[2])
+            return core, mem
+        return self.last_good
+
+    def run(self):
+        """Runs the search and leaves the best point applied. Returns (core, mem)."""
+        core_low, core_high = self.core_range
+        mem_low, mem_high = self.mem_range
+        try:
+            if not self.try_point(core_low, mem_low):
+                raise AutotuneError("The GPU is not stable at the starting offsets.")
+            core = self.search(lambda value: self.try_point(value, mem_low), core_low, core_high, self.core_step)
+            self.search(lambda value: self.try_point(core, value), mem_low, mem_high, self.mem_step)
+        except BaseException:
+            # Never leave an untested point applied, whatever interrupted the search.
+            if self.last_good is not None:
+                self.apply(*self.last_good)
+            raise
+        best = self.best()
+        self.apply(*best)
+        return best
+
+class SimulatedGpu:
+    """
+    Model of a card for developing and checking the search without hardware:
+    offsets above the limits crash the probe, memory offsets above
+    edc_start_mem lose throughput to error retries, and the temperature rises
+    with the core offset until it trips thermal throttling.
+    """
+
+    def __init__(self, core_limit: int = 165, mem_limit: int = 1200, edc_start_mem: int = 900,
+                 base_temperature: int = 66, degrees_per_100_mhz: float = 6.0, thermal_limit: int = 90):
+        self.core_limit = core_limit
+        self.mem_limit = mem_limit
+        self.edc_start_mem = edc_start_mem
+        self.base_temperature = base_temperature
+        self.degrees_per_100_mhz = degrees_per_100_mhz
+        self.thermal_limit = thermal_limit
+        self.core_offset = 0
+        self.mem_offset = 0
+        self.applies = 0
+
+    def apply(self, core: int, mem: int) -> bool:
+        self.core_offset, self.mem_offset = core, mem
+        self.applies += 1
+        return True
+
+    def temperature(self) -> int:
+        return int(self.base_temperature + max(self.core_offset, 0) * self.degrees_per_100_mhz / 100)
+
+    def probe(self, core: int, mem: int) -> ProbeResult:
+        if core > self.core_limit:
+            return ProbeResult(False, reason="simulated driver reset")
+        if mem > self.mem_limit:
+            return ProbeResult(False, reason="simulated memory errors")
+        retries = max(mem - self.edc_start_mem, 0) * 0.4
+        return ProbeResult(True, round(1000 + core * 0.8 + mem * 0.15 - retries, 1))
+
+    def read_stats(self):
+        temperature = self.temperature()
+        return [{
+            "index": 0,
+            "temperature": temperature,
+            "core_clock": 1800 + self.core_offset,
+            "memory_clock": 9500 + self.mem_offset // 2,
+            "throttle_reasons": 0x20 if temperature >= self.thermal_limit else 0,
+        }]
+
+def save_profile(name: str, fan_speed: int, core: int, mem: int) -> bool:
+    """Stores the result as a profile in the profile store."""
+    import profiles
+    all_profiles = profiles.load_profiles()
+    all_profiles[name] = {"fan_speed": fan_speed, "core_clock": core, "mem_clock": mem}
+    return profiles.save_profiles(all_profiles)
+
+def run_autotune(profile_name: str, probe_command: str = None, simulate: bool = False, gpu_indices=(0,),
+                 fan_speed: int = 70, strategy: str = "binary", max_core: int = 300, max_mem: int = 1500,
+                 temperature_limit: int = DEFAULT_TEMPERATURE_LIMIT) -> int:
+    """Entry point of --autotune. Returns the process exit status."""
+    if simulate:
+        model = SimulatedGpu()
+        apply_settings, probe, read_stats, interval = model.apply, model.probe, model.read_stats, 0.05
+    else:
+        import gpu
+
+        def apply_settings(core, mem):
+            return gpu.apply_all_settings(fan_speed, core, mem, gpu_indices).returncode == 0
+
+        def read_stats():
+            return gpu.get_all_gpu_stats(gpu_indices, max_age=0)
+
+        probe, interval = CommandProbe(probe_command), 1.0
+    tuner = AutoTuner(apply_settings, probe, read_stats, strategy, core_range=(0, max_core), mem_range=(0, max_mem),
+                      temperature_limit=temperature_limit, sample_interval=interval)
+    started = time.monotonic()
+    try:
+        core, mem = tuner.run()
+    except AutotuneError as e:
+        logging.error(f"Autotune stopped: {e}")
+        return 1
+    logging.info(f"Autotune finished in {time.monotonic() - started:.0f} s after {len(tuner.results)} probes.")
+    print(f"Best stable offsets: core {core:+d} MHz, mem {mem:+d} MHz")
+    if simulate:
+        print("(simulated GPU, no profile saved)")
+        return 0
+    if not save_profile(profile_name, fan_speed, core, mem):
+        return 1
+    print(f"Saved as profile '{profile_name}'.")
+    return 0
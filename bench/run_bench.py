@@ -0,0 +1,231 @@
+"""
+Benchmark harness for the hot paths of nvidiaoc.
+
+Puts stub nvidia-smi, nvidia-settings, xhost and pkexec executables (bench/stubs)
+first on PATH, runs each scenario a number of times and reports p50/p99
+latency and the number of process spawns per call. Results are written as
+JSON so runs of different commits can be compared:
+
+    python3 bench/run_bench.py --output before.json
+    python3 bench/run_bench.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, "stubs")
+sys.path.insert(0, REPO_DIR)
+
+# Imports the CLI module and fails if that pulled in the GUI or daemon stacks.
+CLI_IMPORT_COMMAND = [
+    sys.executable, "-c",
+    "import sys, nvidia_control; "
+    "heavy = [m for m in ('tkinter', 'http.server', 'gui', 'daemon') if m in sys.modules]; "
+    "sys.exit(f'CLI import loaded {heavy}' if heavy else 0)",
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[position]
+
+class SpawnCounter:
+    """Counts the stub executables started, from the log the stubs append to."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return Counter()
+        with open(self.path) as f:
+            return Counter(line.strip() for line in f if line.strip())
+
+def measure(name, func, iterations, spawns, setup=None):
+    """Runs func `iterations` times and returns its latency and spawn statistics."""
+    timings = []
+    before = spawns.read()
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    spawned = spawns.read() - before
+    result = {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "spawns_per_call": round(sum(spawned.values()) / iterations, 2),
+        "spawns_by_command": {command: round(count / iterations, 2) for command, count in sorted(spawned.items())},
+    }
+    print(f"{name:<28} p50 {result['p50_ms']:>9.2f} ms   p99 {result['p99_ms']:>9.2f} ms   spawns/call {result['spawns_per_call']:>5}")
+    return result
+
+def setup_environment(workdir, args):
+    """Points PATH, DISPLAY and XAUTHORITY at the stubs and returns the spawn log path."""
+    spawn_log = os.path.join(workdir, "spawns.log")
+    xauthority = os.path.join(workdir, "Xauthority")
+    open(xauthority, "w").close()
+    os.environ.update({
+        "PATH": STUBS_DIR + os.pathsep + os.environ.get("PATH", ""),
+        "DISPLAY": ":99",
+        "XAUTHORITY": xauthority,
+        "XDG_RUNTIME_DIR": workdir, # keeps the privileged helper socket out of the way
+        "XDG_CONFIG_HOME": workdir, # and the profile store
+        "XDG_STATE_HOME": workdir, # and the log
+        "NVIDIAOC_BACKEND": "nvidia-smi",
+        "BENCH_SPAWN_LOG": spawn_log,
+        "BENCH_STATE_FILE": os.path.join(workdir, "settings.json"),
+        "BENCH_GPUS": str(args.gpus),
+        "BENCH_LATENCY_MS": str(args.latency_ms),
+    })
+    return spawn_log
+
+def bench_gui_tick(gpu):
+    """
+    Returns a function doing the work of one GUI stats tick with Tk mocked out:
+    reading the stats, recording the history and formatting the table cells.
+    """
+    import gui
+    import table
+    app = gui.App.__new__(gui.App)
+    app.client = None
+    app.sampler = gpu.create_sampler(interval_ms=200)
+    app.history = gui.history.TelemetryHistory()
+
+    def tick():
+        devices = app.get_current_stats()
+        app.history.record(devices)
+        [table.format_cell(key, unit, stats) for stats in devices for key, _, unit in gui.STATS_ROWS]
+    return app, tick
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="nvidiaoc-bench-")
+    spawns = SpawnCounter(setup_environment(workdir, args))
+    os.chdir(workdir) # anything else written to the working directory ends up here, not in the repo
+    logging.basicConfig(level=logging.CRITICAL)
+
+    import gpu
+    results = {}
+    n = args.iterations
+
+    # Uncached reads, comparable with revisions that had no stats cache.
+    results["get_all_stats"] = measure("get_all_stats", gpu.get_all_stats, n, spawns, setup=gpu.invalidate_stats_cache)
+    results["get_all_gpu_stats"] = measure("get_all_gpu_stats", gpu.get_all_gpu_stats, n, spawns, setup=gpu.invalidate_stats_cache)
+    results["get_all_gpu_stats_cached"] = measure("get_all_gpu_stats (cached)", gpu.get_all_gpu_stats, n, spawns)
+
+    gpu.get_fan_map() # resolved once per process, keep it out of the apply numbers
+    values = iter(range(10**6))
+    results["apply_all_settings"] = measure(
+        "apply_all_settings (changed)",
+        lambda: gpu.apply_all_settings(60, next(values) % 200, 500, gpu_indices=range(args.gpus)), n, spawns
+    )
+    results["apply_all_settings_unchanged"] = measure(
+        "apply_all_settings (same)",
+        lambda: gpu.apply_all_settings(60, 150, 500, gpu_indices=range(args.gpus)), n, spawns,
+        setup=gpu.invalidate_settings_cache
+    )
+    results["reset_all_settings"] = measure(
+        "reset_all_settings",
+        lambda: gpu.reset_all_settings(gpu_indices=range(args.gpus), force=True), n, spawns
+    )
+
+    cli_command = [sys.executable, os.path.join(REPO_DIR, "nvidia_control.py"), "--fan", "60"]
+    results["cli_startup"] = measure(
+        "cli --fan 60",
+        lambda: subprocess.run(cli_command, cwd=workdir, capture_output=True), max(n // 5, 3), spawns
+    )
+    results["cli_import"] = measure(
+        "cli import",
+        lambda: subprocess.run(CLI_IMPORT_COMMAND, cwd=REPO_DIR, check=True), max(n // 5, 3), spawns
+    )
+
+    import alerts
+    rules = [alerts.Rule(f"rule {i}", ["temperature > 83", "avg(power_usage) >= 300"], duration=10) for i in range(100)]
+    dog = alerts.Watchdog(rules)
+    devices = gpu.get_all_gpu_stats()
+    results["watchdog_sample"] = measure("watchdog (100 rules)", lambda: dog.on_sample(devices), n, spawns)
+
+    app, tick = bench_gui_tick(gpu)
+    results["gui_tick_cold"] = measure("gui tick (no sampler)", tick, n, spawns)
+    app.sampler.start()
+    time.sleep(1)
+    results["gui_tick_sampler"] = measure("gui tick (sampler)", tick, n, spawns)
+    app.sampler.stop()
+
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"\nComparison with {baseline_path} (p50, spawns/call):")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (result["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{name:<28} {old['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f} ms ({change:+.1f}%)   "
+              f"{old['spawns_per_call']} -> {result['spawns_per_call']}")
+
+def check_startup_budget(results, budget_ms):
+    """Returns False if importing the CLI module took longer than budget_ms (p50)."""
+    p50 = results["cli_import"]["p50_ms"]
+    if p50 > budget_ms:
+        print(f"\nStartup budget exceeded: cli import p50 {p50:.1f} ms > {budget_ms:g} ms")
+        return False
+    print(f"\nStartup budget met: cli import p50 {p50:.1f} ms <= {budget_ms:g} ms")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nvidiaoc against stub NVIDIA tools.")
+    parser.add_argument("--iterations", type=int, default=50, help="Calls per scenario (default 50).")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Extra latency of every stub call (default 20).")
+    parser.add_argument("--gpus", type=int, default=1, help="Number of GPUs the stubs report (default 1).")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", metavar="FILE", help="Compare with the results of an earlier run.")
+    parser.add_argument("--startup-budget-ms", type=float, help="Exit with status 1 if the p50 CLI import time exceeds this.")
+    args = parser.parse_args()
+    # run() changes into a scratch directory, so resolve user paths first.
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    results = run(args)
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {"iterations": args.iterations, "latency_ms": args.latency_ms, "gpus": args.gpus},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    if args.startup_budget_ms is not None and not check_startup_budget(results, args.startup_budget_ms):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
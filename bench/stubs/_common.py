@@ -0,0 +1,17 @@
+"""Shared helpers of the benchmark stub executables."""
+import os
+import time
+
+def start(name):
+    """Records the spawn and sleeps for the configured latency of this stub."""
+    log_path = os.environ.get("BENCH_SPAWN_LOG")
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(name + "\n")
+    env_name = "BENCH_" + name.upper().replace("-", "_") + "_LATENCY_MS"
+    latency_ms = float(os.environ.get(env_name, os.environ.get("BENCH_LATENCY_MS", "0")))
+    if latency_ms:
+        time.sleep(latency_ms / 1000)
+
+def gpu_count():
+    return int(os.environ.get("BENCH_GPUS", "1"))
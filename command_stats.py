@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches everything.
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+def command_family(command):
+    """
+    Groups a command line into a family such as "nvidia-smi --query-gpu" or
+    "pkexec nvidia-settings -a", so that calls doing the same job share stats.
+    """
+    if not command:
+        return "?"
+    executable = os.path.basename(command[0])
+    if executable == "pkexec":
+        # pkexec <wrapper> <display> <xauthority> <command...>
+        return "pkexec " + command_family(command[4:])
+    option = next((arg.split("=", 1)[0] for arg in command[1:] if arg.startswith("-")), None)
+    family = f"{executable} {option}" if option else executable
+    if "-lms" in command:
+        family += " -lms" # long-lived loop-mode child, kept apart from one-shot queries
+    return family
+
+class CommandStats:
+    """Counters and a latency histogram of one command family."""
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.output_bytes = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, duration_ms, returncode, output_bytes):
+        self.count += 1
+        if returncode != 0:
+            self.failures += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.output_bytes += output_bytes
+        for position, bound in enumerate(BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[position] += 1
+                break
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket containing the given percentile."""
+        if not self.count:
+            return None
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return bound if bound != float("inf") else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "output_bytes": self.output_bytes,
+            "histogram": {str(bound): count for bound, count in zip(BUCKETS_MS, self.buckets) if count},
+        }
+
+class CommandRecorder:
+    """
+    Collects per-family stats of every external command run by the app and
+    optionally appends one JSON line per command to a trace file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+        self._trace_file = None
+        self.started = time.time()
+
+    def enable_trace(self, path):
+        """Appends a JSON line per command to path from now on."""
+        try:
+            trace_file = open(path, "a", buffering=1)
+        except OSError as e:
+            logging.error(f"Cannot open trace file '{path}': {e}")
+            return False
+        with self._lock:
+            if self._trace_file:
+                self._trace_file.close()
+            self._trace_file = trace_file
+        return True
+
+    def record(self, command, duration_ms, returncode, output_bytes=0):
+        family = command_family(command)
+        with self._lock:
+            stats = self._families.get(family)
+            if stats is None:
+                stats = self._families[family] = CommandStats()
+            stats.add(duration_ms, returncode, output_bytes)
+            if self._trace_file:
+                self._trace_file.write(json.dumps({
+                    "time": round(time.time(), 6),
+                    "family": family,
+                    "command": command,
+                    "duration_ms": round(duration_ms, 3),
+                    "returncode": returncode,
+                    "output_bytes": output_bytes,
+                }) + "\n")
+
+    def snapshot(self):
+        """Returns {family: stats dictionary}, busiest family first."""
+        with self._lock:
+            families = sorted(self._families.items(), key=lambda item: -item[1].total_ms)
+            return {family: stats.to_dict() for family, stats in families}
+
+    def reset(self):
+        with self._lock:
+            self._families.clear()
+            self.started = time.time()
+
+    def format_table(self):
+        """Renders the snapshot as a fixed-width text table."""
+        snapshot = self.snapshot()
+        elapsed = time.time() - self.started
+        lines = [
+            f"External commands over the last {elapsed:.0f} s",
+            f"{'Command':<30} {'Calls':>6} {'Fail':>5} {'Mean ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'Max ms':>9} {'Total ms':>10} {'Out KiB':>8}",
+        ]
+        for family, stats in snapshot.items():
+            lines.append(
+                f"{family[:30]:<30} {stats['count']:>6} {stats['failures']:>5} {stats['mean_ms']:>9.1f} "
+                f"{stats['p50_ms']:>8g} {stats['p99_ms']:>8g} {stats['max_ms']:>9.1f} {stats['total_ms']:>10.1f} "
+                f"{stats['output_bytes'] / 1024:>8.1f}"
+            )
+        if not snapshot:
+            lines.append("(no commands run yet)")
+        return "\n".join(lines)
+
+RECORDER = CommandRecorder()
+if os.environ.get("NVIDIAOC_TRACE"):
+    RECORDER.enable_trace(os.environ["NVIDIAOC_TRACE"])
@@ -0,0 +1,433 @@
+import hmac
+import json
+import logging
+import os
+import queue
+import secrets
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import api_client
+import command_stats
+import gpu
+import history
+import profiles
+from fancurve import FanCurveDriver
+
+DEFAULT_LISTEN = "127.0.0.1:9835"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Samples buffered per streaming client; older ones are dropped if it falls behind.
+STREAM_QUEUE_SIZE = 16
+MAX_BODY_SIZE = 64 * 1024
+
+# (stats key, metric name, unit, help) of the exported gauges
+EXPORTED_METRICS = [
+    ("temperature", "nvidiaoc_gpu_temperature_celsius", "celsius", "GPU core temperature."),
+    ("utilization", "nvidiaoc_gpu_utilization_percent", "percent", "GPU utilization."),
+    ("core_clock", "nvidiaoc_gpu_core_clock_megahertz", "megahertz", "Current graphics clock."),
+    ("memory_clock", "nvidiaoc_gpu_memory_clock_megahertz", "megahertz", "Current memory clock."),
+    ("power_usage", "nvidiaoc_gpu_power_draw_watts", "watts", "Current power draw."),
+    ("fan_speed", "nvidiaoc_gpu_fan_speed_percent", "percent", "Target fan speed."),
+]
+
+class MonitorService:
+    """
+    The one shared sampling loop of a long-running process: a single sampler
+    plus the telemetry history it feeds. Every consumer (HTTP scrapes, API
+    clients, controllers) reads from here, so consumers never add GPU queries.
+    """
+
+    def __init__(self, interval_ms: int = 1000):
+        self.interval_ms = interval_ms
+        self.sampler = gpu.create_sampler(interval_ms)
+        self.history = history.TelemetryHistory()
+        self.last_sample_time = None
+        self._listeners = []
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def start(self):
+        self.sampler.start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="monitor-service", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.sampler.stop()
+
+    def add_listener(self, callback):
+        """
+        Registers callback(devices, timestamp) to be called on the sampling
+        thread once per new sample, with the wall-clock time it was taken.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def latest(self):
+        """Returns the latest samples of all GPUs, or None if there is no fresh sample."""
+        return self.sampler.get_latest_all(max_age=max(self.interval_ms / 1000 * 3, 5))
+
+    def _run(self):
+        since = None
+        while not self._stop_event.wait(self.interval_ms / 1000):
+            # Only samples stored since the last pass: a sampler that fell
+            # behind must not have its previous sample published again.
+            devices, newest = self.sampler.get_updates(since)
+            if not devices:
+                continue
+            since = newest
+            # The sampler stamps samples with time.monotonic(); convert that instant to wall-clock time.
+            self.last_sample_time = time.time() - (time.monotonic() - newest)
+            self.history.record(devices, self.last_sample_time)
+            for callback in list(self._listeners):
+                try:
+                    callback(devices, self.last_sample_time)
+                except Exception as e:
+                    logging.error(f"Monitor listener failed: {e}")
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_openmetrics(devices, sample_age=None):
+    """Renders the given samples in the OpenMetrics text format."""
+    lines = [
+        "# TYPE nvidiaoc_up gauge",
+        "# HELP nvidiaoc_up Whether a fresh GPU sample is available.",
+        f"nvidiaoc_up {1 if devices else 0}",
+    ]
+    if sample_age is not None:
+        lines += [
+            "# TYPE nvidiaoc_sample_age_seconds gauge",
+            "# UNIT nvidiaoc_sample_age_seconds seconds",
+            "# HELP nvidiaoc_sample_age_seconds Age of the exported sample.",
+            f"nvidiaoc_sample_age_seconds {sample_age:.3f}",
+        ]
+    for key, name, unit, help_text in EXPORTED_METRICS:
+        samples = [
+            (stats, stats.get(key)) for stats in devices or []
+            if isinstance(stats.get(key), (int, float))
+        ]
+        if not samples:
+            continue
+        lines += [f"# TYPE {name} gauge", f"# UNIT {name} {unit}", f"# HELP {name} {help_text}"]
+        for stats, value in samples:
+            labels = f'gpu="{stats.get("index", 0)}",name="{escape_label(stats.get("name", "N/A"))}"'
+            lines.append(f"{name}{{{labels}}} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+class MonitorRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves /metrics (OpenMetrics) and the local JSON API from the service's
+    shared sampler. Reads never query the GPU themselves.
+
+        GET  /metrics
+        GET  /api/stats
+        GET  /api/history?gpu=0&metric=temperature&seconds=600
+        GET  /api/stream                  (newline-delimited JSON, one line per sample)
+        GET  /api/diagnostics             (external command counters and latencies)
+        POST /api/apply    {"fan_speed": 60, "core_clock": 150, "mem_clock": 750, "gpus": [0]}
+        POST /api/reset    {"gpus": [0]}
+        POST /api/profile  {"name": "Default", "gpus": [0]}
+
+    POST requests must be application/json. Over TCP they also need the
+    "Authorization: Bearer <token>" header with the token the daemon writes
+    to a 0600 file in the user's runtime directory; on a Unix socket the
+    socket permissions are the access control.
+    """
+    service = None # set by create_server()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        routes = {
+            "/metrics": self.handle_metrics,
+            "/api/stats": self.handle_stats,
+            "/api/history": self.handle_history,
+            "/api/stream": self.handle_stream,
+            "/api/diagnostics": self.handle_diagnostics,
+        }
+        route = routes.get(url.path)
+        if route is None:
+            self.send_error(404)
+            return
+        route(parse_qs(url.query))
+
+    def do_POST(self):
+        routes = {
+            "/api/apply": self.handle_apply,
+            "/api/reset": self.handle_reset,
+            "/api/profile": self.handle_profile,
+        }
+        route = routes.get(urlparse(self.path).path)
+        if route is None:
+            self.send_error(404)
+            return
+        if not self.is_authorized():
+            self.send_json({"ok": False, "error": "Missing or invalid token."}, status=401)
+            return
+        # A cross-site form or no-cors fetch cannot send application/json without a preflight.
+        if self.headers.get_content_type() != "application/json":
+            self.send_json({"ok": False, "error": "Content-Type must be application/json."}, status=415)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            self.send_json({"ok": False, "error": "Request body too large."}, status=413)
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            route(body)
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json({"ok": False, "error": f"Invalid request: {e!r}"}, status=400)
+
+    def is_authorized(self):
+        if not self.client_address: # Unix socket, only reachable by its owner
+            return True
+        token = getattr(self.server, "token", None)
+        # compare_digest only takes ASCII str; a client may send any header bytes.
+        header = self.headers.get("Authorization", "").encode("utf-8", "surrogateescape")
+        return bool(token) and hmac.compare_digest(header, f"Bearer {token}".encode())
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status: int = 200):
+        self.send_body(json.dumps(data).encode(), "application/json", status)
+
+    def sample_age(self):
+        last_sample_time = self.service.last_sample_time
+        return time.time() - last_sample_time if last_sample_time else None
+
+    def handle_metrics(self, query):
+        body = format_openmetrics(self.service.latest(), self.sample_age()).encode()
+        self.send_body(body, OPENMETRICS_CONTENT_TYPE)
+
+    def handle_stats(self, query):
+        self.send_json({"devices": self.service.latest() or [], "sample_age": self.sample_age()})
+
+    def handle_history(self, query):
+        try:
+            gpu_index = int(query.get("gpu", ["0"])[0])
+            metric = query.get("metric", ["temperature"])[0]
+            seconds = float(query.get("seconds", ["600"])[0])
+        except ValueError as e:
+            self.send_json({"ok": False, "error": f"Invalid query: {e}"}, status=400)
+            return
+        if metric not in self.service.history.metrics:
+            self.send_json({"ok": False, "error": f"Unknown metric '{metric}'."}, status=400)
+            return
+        points = self.service.history.points(gpu_index, metric, seconds)
+        self.send_json({"gpu": gpu_index, "metric": metric, "points": points})
+
+    def handle_diagnostics(self, query):
+        self.send_json({"commands": command_stats.RECORDER.snapshot()})
+
+    def handle_stream(self, query):
+        samples = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+        def push(devices, timestamp):
+            # Never block the sampling thread on a slow client: drop the oldest sample instead.
+            while True:
+                try:
+                    samples.put_nowait((devices, timestamp))
+                    return
+                except queue.Full:
+                    try:
+                        samples.get_nowait()
+                    except queue.Empty:
+                        pass
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.service.add_listener(push)
+        try:
+            while not self.service.stopped:
+                try:
+                    devices, timestamp = samples.get(timeout=1)
+                except queue.Empty:
+                    continue
+                line = json.dumps({"time": timestamp, "devices": devices})
+                self.wfile.write(line.encode() + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.service.remove_listener(push)
+            self.close_connection = True
+
+    def handle_apply(self, body):
+        gpus = parse_gpus(body)
+        fan_speed, core_offset, mem_offset = int(body["fan_speed"]), int(body["core_clock"]), int(body["mem_clock"])
+        gpu.check_settings(fan_speed, core_offset, mem_offset)
+        self.send_json(result_to_json(gpu.apply_all_settings(fan_speed, core_offset, mem_offset, gpus)))
+
+    def handle_reset(self, body):
+        self.send_json(result_to_json(gpu.reset_all_settings(parse_gpus(body))))
+
+    def handle_profile(self, body):
+        name = body.get("name")
+        result = profiles.apply_profile(name, parse_gpus(body))
+        if result is None:
+            self.send_json({"ok": False, "error": f"Unknown profile '{name}'."}, status=404)
+            return
+        self.send_json(result_to_json(result))
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logging.debug(f"HTTP {self.address_string()} {format % args}")
+
+def parse_gpus(body):
+    """Returns the "gpus" list of a request body, defaulting to GPU 0."""
+    gpus = body.get("gpus", [0])
+    if not isinstance(gpus, list) or not gpus:
+        raise ValueError("'gpus' must be a non-empty list of indices")
+    gpus = [int(index) for index in gpus]
+    known = gpu.get_gpu_indices()
+    unknown = [index for index in gpus if index not in known] if known else [index for index in gpus if not 0 <= index < 100]
+    if unknown:
+        raise ValueError(f"unknown GPU indices {unknown}")
+    return gpus
+
+def result_to_json(result):
+    return {
+        "ok": result.returncode == 0,
+        "returncode": result.returncode,
+        "changes": [f"{target}={value}" for target, value in result.changes],
+    }
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket that only the current user can access."""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+class TokenHTTPServer(ThreadingHTTPServer):
+    """
+    TCP HTTP server that writes a random control token to a file only its
+    user can read (see api_client.get_token_path) and removes it on close.
+    """
+    daemon_threads = True
+
+    def server_bind(self):
+        super().server_bind()
+        self.token = secrets.token_hex(16)
+        self.token_path = api_client.get_token_path(self.server_address[1])
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            os.fchmod(f.fileno(), 0o600)
+            f.write(self.token + "\n")
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.token_path)
+        except OSError:
+            pass
+
+def parse_listen_address(value):
+    """Parses a HOST:PORT string."""
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def create_server(service, listen=DEFAULT_LISTEN, handler=MonitorRequestHandler):
+    """
+    Creates (but does not start) the HTTP server.
+    :param listen: "HOST:PORT" for TCP or "unix:/path/to.sock" for a Unix socket.
+    """
+    handler_class = type(handler.__name__, (handler,), {"service": service})
+    if listen.startswith("unix:"):
+        return UnixHTTPServer(listen[len("unix:"):], handler_class)
+    return TokenHTTPServer(parse_listen_address(listen), handler_class)
+
+def run_daemon(listen=DEFAULT_LISTEN, interval_ms=1000, fan_curve=None, gpu_indices=None, recorder=None, rules=None):
+    """
+    Runs the headless monitor until SIGINT/SIGTERM.
+    :param fan_curve: Optional FanCurve driving the fans of gpu_indices from the sampling loop.
+    :param recorder: Optional recorder.Recorder every sample is appended to.
+    :param rules: Optional list of alerts.Rule evaluated on every sample.
+    """
+    service = MonitorService(interval_ms)
+    server = create_server(service, listen)
+    if recorder is not None:
+        service.add_listener(recorder.record)
+
+    fan_writer = None
+    if fan_curve is not None:
+        # Writes go through one background thread, in order, so a slow
+        # privileged call never stalls the sampling loop.
+        fan_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fan-writer")
+        def write_fan_speed(speed, indices, done):
+            future = fan_writer.submit(gpu.set_fan_speed, speed, indices)
+            future.add_done_callback(lambda f: done(f.exception() is None and f.result().returncode == 0))
+        driver = FanCurveDriver(fan_curve, gpu_indices or [0], write_fan_speed)
+        # The ramp limit and hold time work on the monotonic clock, not the sample's wall time.
+        service.add_listener(lambda devices, timestamp: driver.on_sample(devices))
+        if not gpu.is_helper_running():
+            logging.warning("The fan curve writes through pkexec on every change. Start the privileged helper to avoid repeated prompts.")
+
+    action_worker = None
+    if rules:
+        import alerts
+        action_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watchdog-actions")
+        service.add_listener(alerts.Watchdog(rules, alerts.ActionRunner(rules, action_worker.submit)).on_sample)
+        logging.info(f"Watchdog evaluating {len(rules)} rule(s).")
+
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    service.start()
+    logging.info(f"Daemon serving /metrics and /api on {listen} (sampling every {interval_ms} ms).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Daemon shutting down.")
+    finally:
+        server.server_close()
+        service.stop()
+        if recorder is not None:
+            recorder.close()
+        if fan_writer:
+            fan_writer.shutdown(wait=True)
+            # Hand the fans back to the driver so they do not stay at the curve's last speed.
+            try:
+                gpu.set_fan_control_state(False, gpu_indices or [0])
+            except Exception as e:
+                logging.error(f"Could not restore automatic fan control: {e}")
+        if action_worker:
+            action_worker.shutdown(wait=True)
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import deque
+
+class FanCurve:
+    """
+    Piecewise-linear temperature -> fan speed curve, stored in profiles as a
+    list of [temperature, speed] points. Below the first point the first speed
+    is used and above the last point the last speed.
+    """
+
+    def __init__(self, points):
+        points = sorted((float(temp), float(speed)) for temp, speed in points)
+        if not points:
+            raise ValueError("A fan curve needs at least one point.")
+        for _, speed in points:
+            if not 0 <= speed <= 100:
+                raise ValueError(f"Fan speed {speed} is outside 0-100%.")
+        self.points = points
+
+    def speed_at(self, temperature: float) -> float:
+        points = self.points
+        if temperature <= points[0][0]:
+            return points[0][1]
+        for (t0, s0), (t1, s1) in zip(points, points[1:]):
+            if temperature <= t1:
+                return s0 + (s1 - s0) * (temperature - t0) / (t1 - t0)
+        return points[-1][1]
+
+    def to_profile(self):
+        return [[temp, speed] for temp, speed in self.points]
+
+class FanCurveController:
+    """
+    Turns a stream of temperatures into rare fan speed writes.
+
+    - Hysteresis: the speed only goes down once the temperature has dropped
+      `hysteresis` degrees below the point that would justify the current speed.
+    - Ramp limit: the target moves at most `max_ramp` percent per second.
+    - Hold time: after a write the speed is not lowered again for `min_hold`
+      seconds. Increases are never held back, only ramp-limited.
+    - Quantization: targets are rounded to `quantum` percent and update()
+      only returns a value when the quantized target changes.
+    - Confirmation: a returned speed is only taken as the fan's speed once
+      confirm() reports the write succeeded. One write is in flight at a
+      time, and a failed one is retried after `min_hold` seconds.
+    """
+
+    def __init__(self, curve: FanCurve, hysteresis: float = 3.0, max_ramp: float = 10.0,
+                 min_hold: float = 5.0, quantum: int = 5, min_speed: int = 30, max_speed: int = 100):
+        self.curve = curve
+        self.hysteresis = hysteresis
+        self.max_ramp = max_ramp
+        self.min_hold = min_hold
+        self.quantum = quantum
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.current = None # last speed confirmed written
+        self.writing = None # speed of the write in flight
+        self._retry_at = None
+        self._position = None # ramp-limited, unquantized target
+        self._last_update = None
+        self._last_write = None
+        self._pending_since = None
+        # Metrics
+        self.updates = 0
+        self.writes = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=256)
+
+    def _quantize(self, speed):
+        speed = round(speed / self.quantum) * self.quantum
+        return int(max(self.min_speed, min(self.max_speed, speed)))
+
+    def desired_speed(self, temperature: float) -> float:
+        """Curve speed for the temperature, with hysteresis applied to decreases."""
+        rising = self.curve.speed_at(temperature)
+        if self._position is None or rising >= self._position:
+            return rising
+        # Falling: only follow the curve down once the temperature is clearly lower.
+        return max(rising, min(self._position, self.curve.speed_at(temperature + self.hysteresis)))
+
+    def update(self, temperature: float, now: float = None):
+        """
+        Feeds one temperature sample. Returns the new fan speed to write, or
+        None if the fan should stay where it is. The caller reports the
+        outcome of the write with confirm().
+        """
+        now = time.monotonic() if now is None else now
+        self.updates += 1
+        desired = self.desired_speed(temperature)
+
+        if self._position is None:
+            self._position = desired
+        else:
+            max_step = self.max_ramp * (now - self._last_update)
+            self._position += max(-max_step, min(max_step, desired - self._position))
+        self._last_update = now
+        if self.writing is not None or (self._retry_at is not None and now < self._retry_at):
+            return None
+
+        target = self._quantize(self._position)
+        if target == self.current:
+            self._pending_since = None
+            return None
+        if self._pending_since is None:
+            self._pending_since = now
+        if self.current is not None and target < self.current and now - self._last_write < self.min_hold:
+            return None
+
+        if self.current is not None:
+            self.latencies.append(now - self._pending_since)
+        self._pending_since = None
+        self.writing = target
+        return target
+
+    def confirm(self, speed: int, success: bool, now: float = None):
+        """Reports the outcome of writing a speed returned by update()."""
+        now = time.monotonic() if now is None else now
+        self.writing = None
+        if success:
+            self.current = speed
+            self._last_write = now
+            self._retry_at = None
+            self.writes += 1
+        else:
+            self.failures += 1
+            self._retry_at = now + self.min_hold
+
+    def stats(self):
+        """Returns the number of updates, writes and failed writes and the reaction latency (seconds) of writes."""
+        latencies = list(self.latencies)
+        return {
+            "updates": self.updates,
+            "writes": self.writes,
+            "failures": self.failures,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else None,
+            "max_latency": max(latencies) if latencies else None,
+        }
+
+class FanCurveDriver:
+    """
+    Runs one controller per GPU on the sampling loop. `writer(speed, gpu_indices, done)`
+    is only called when a GPU's quantized target changes; it must not block
+    the caller for long (e.g. submit the privileged write to a worker) and
+    calls done(success) from any thread once the write has finished.
+    """
+
+    def __init__(self, curve: FanCurve, gpu_indices, writer, **controller_options):
+        self.writer = writer
+        self.controllers = {index: FanCurveController(curve, **controller_options) for index in gpu_indices}
+        self._lock = threading.Lock()
+
+    def on_sample(self, devices, now: float = None):
+        for stats in devices:
+            controller = self.controllers.get(stats.get("index"))
+            temperature = stats.get("temperature")
+            if controller is None or not isinstance(temperature, (int, float)):
+                continue
+            with self._lock:
+                speed = controller.update(temperature, now)
+            if speed is not None:
+                logging.info(f"Fan curve: GPU {stats['index']} at {temperature} °C -> {speed}%")
+                self.writer(speed, [stats["index"]], lambda success, controller=controller, speed=speed: self._written(controller, speed, success))
+
+    def _written(self, controller, speed, success):
+        if not success:
+            logging.warning(f"Fan curve: writing {speed}% failed. Retrying in {controller.min_hold:g} s.")
+        with self._lock:
+            controller.confirm(speed, success)
+
+    @property
+    def writes(self):
+        return sum(controller.writes for controller in self.controllers.values())
+
+    def stats(self):
+        return {index: controller.stats() for index, controller in self.controllers.items()}
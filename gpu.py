@@ -1,10 +1,23 @@
 import subprocess
 import logging
 import os
+import re
+import json
+import socket
+import sys
+import threading
+import time
+
+import command_stats
 
 def run_command(command, capture_output=True, text=True, check=False, env=None):
-    """A wrapper around subprocess.run to handle command execution and logging."""
-    logging.info(f"Executing command: {' '.join(command)}")
+    """
+    A wrapper around subprocess.run to handle command execution and logging.
+    Wall time, exit code and output size of every call are recorded in
+    command_stats.RECORDER.
+    """
+    logging.debug(f"Executing command: {' '.join(command)}")
+    start = time.perf_counter()
     try:
         result = subprocess.run(
             command,
@@ -13,83 +26,507 @@ def run_command(command, capture_output=True, text=True, check=False, env=None):
             check=check,
             env=env
         )
+        output_bytes = len(result.stdout or "") + len(result.stderr or "")
+        command_stats.RECORDER.record(command, (time.perf_counter() - start) * 1000, result.returncode, output_bytes)
         if result.returncode != 0:
             logging.error(f"Command failed with exit code {result.returncode}")
             logging.error(f"Stderr: {result.stderr.strip()}")
             logging.error(f"Stdout: {result.stdout.strip()}")
         return result
     except FileNotFoundError:
+        command_stats.RECORDER.record(command, (time.perf_counter() - start) * 1000, None)
         logging.error(f"Command not found: {command[0]}. Please ensure it is installed and in your PATH.")
         return None
     except Exception as e:
+        command_stats.RECORDER.record(command, (time.perf_counter() - start) * 1000, None)
         logging.error(f"An unexpected error occurred while running command: {' '.join(command)}. Error: {e}")
         return None
 
-def get_gpu_name():
-    """Gets the GPU product name."""
-    result = run_command(["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"])
-    return result.stdout.strip() if result and result.returncode == 0 else "N/A"
-
-def get_gpu_temperature():
-    """Gets the GPU temperature."""
-    result = run_command(["nvidia-smi", "--query-gpu=temperature.gpu", "--format=csv,noheader"])
-    return result.stdout.strip() if result and result.returncode == 0 else "N/A"
-
-def get_gpu_utilization():
-    """Gets the GPU utilization percentage."""
-    result = run_command(["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader"])
-    return result.stdout.strip().replace(" %", "") if result and result.returncode == 0 else "N/A"
-
-def get_core_clock():
-    """Gets the current GPU core clock speed."""
-    result = run_command(["nvidia-smi", "--query-gpu=clocks.gr", "--format=csv,noheader"])
-    return result.stdout.strip().replace(" MHz", "") if result and result.returncode == 0 else "N/A"
-
-def get_memory_clock():
-    """Gets the current GPU memory clock speed."""
-    result = run_command(["nvidia-smi", "--query-gpu=clocks.mem", "--format=csv,noheader"])
-    return result.stdout.strip().replace(" MHz", "") if result and result.returncode == 0 else "N/A"
-
-def get_power_usage():
-    """Gets the GPU power usage."""
-    result = run_command(["nvidia-smi", "--query-gpu=power.draw", "--format=csv,noheader"])
-    if result and result.returncode == 0:
-        power = result.stdout.strip()
-        return power.replace(" W", "") if "[N/A]" not in power else "N/A"
-    return "N/A"
-
-def get_fan_speed_from_settings():
-    """
-    Gets the target fan speed from nvidia-settings.
-    This reflects the value set by the user, not the physical speed.
-    """
-    # This command reads the value. It doesn't require root.
-    # The attribute is [fan:0] for the first fan.
-    result = run_command([
-        "nvidia-settings",
-        "-q", "[fan:0]/GPUTargetFanSpeed",
-        "-t" # Terse output
-    ])
-    return result.stdout.strip() if result and result.returncode == 0 else "N/A"
-
-def get_all_stats():
-    """Returns a dictionary with all GPU stats."""
-    stats = {
-        "name": get_gpu_name(),
-        "temperature": get_gpu_temperature(),
-        "utilization": get_gpu_utilization(),
-        "core_clock": get_core_clock(),
-        "memory_clock": get_memory_clock(),
-        "power_usage": get_power_usage(),
-        "fan_speed": get_fan_speed_from_settings(),
-    }
+# --- Batched query engine ---
+# Every metric shown by the monitor is registered here with the nvidia-smi
+# query field it comes from and a parser for its value. get_all_stats() asks
+# for all registered fields in a single nvidia-smi call, so adding a metric
+# does not add another process spawn per tick.
+QUERY_FIELDS = {}
+# Keys of fields that never change while the driver is loaded (name, VBIOS,
+# limits...). They are read once per device and merged into every sample.
+STATIC_FIELDS = set()
+
+def parse_int(value):
+    """Parses an integer field, returning "N/A" for missing or unsupported values."""
+    try:
+        return int(float(value))
+    except ValueError:
+        return "N/A"
+
+def parse_float(value):
+    """Parses a decimal field, returning "N/A" for missing or unsupported values."""
+    try:
+        return float(value)
+    except ValueError:
+        return "N/A"
+
+def parse_hex(value):
+    """Parses a hexadecimal bit mask such as 0x0000000000000004."""
+    try:
+        return int(value, 16)
+    except ValueError:
+        return "N/A"
+
+def parse_str(value):
+    """Parses a text field, mapping nvidia-smi placeholders like [N/A] to "N/A"."""
+    return "N/A" if not value or value.startswith("[") else value
+
+def register_field(key: str, query: str, parser=parse_str, static: bool = False):
+    """
+    Registers a metric for the batched query.
+    :param key: Key of the metric in the stats dictionary.
+    :param query: nvidia-smi --query-gpu field name (e.g. "clocks.sm").
+    :param parser: Callable converting the raw text value (units stripped).
+    :param static: True if the value never changes, so it is read once per device.
+    """
+    QUERY_FIELDS[key] = (query, parser)
+    if static:
+        STATIC_FIELDS.add(key)
+    else:
+        STATIC_FIELDS.discard(key)
+
+def dynamic_keys():
+    """Keys sampled on every read: the index plus every non-static field."""
+    return [key for key in QUERY_FIELDS if key not in STATIC_FIELDS]
+
+register_field("index", "index", parse_int)
+register_field("name", "name", static=True)
+register_field("uuid", "uuid", static=True)
+register_field("driver_version", "driver_version", static=True)
+register_field("vbios_version", "vbios_version", static=True)
+register_field("power_default_limit", "power.default_limit", parse_float, static=True)
+register_field("power_max_limit", "power.max_limit", parse_float, static=True)
+register_field("max_core_clock", "clocks.max.graphics", parse_int, static=True)
+register_field("temperature", "temperature.gpu", parse_int)
+register_field("utilization", "utilization.gpu", parse_int)
+register_field("core_clock", "clocks.gr", parse_int)
+register_field("memory_clock", "clocks.mem", parse_int)
+register_field("power_usage", "power.draw", parse_float)
+# fan.speed is the speed the fan is intended to run at, i.e. the same target
+# that nvidia-settings reports as GPUTargetFanSpeed, without an X connection.
+register_field("fan_speed", "fan.speed", parse_int)
+# Bit mask of the reasons the clocks are held down (power cap, thermal...).
+register_field("throttle_reasons", "clocks_throttle_reasons.active", parse_hex)
+
+def build_query_command(keys):
+    """Builds the nvidia-smi command line querying the given registered fields."""
+    fields = ",".join(QUERY_FIELDS[key][0] for key in keys)
+    return ["nvidia-smi", f"--query-gpu={fields}", "--format=csv,noheader,nounits"]
+
+def parse_query_line(keys, line):
+    """Parses one CSV line of a batched query into a stats dictionary."""
+    values = [value.strip() for value in line.split(",")]
+    if len(values) != len(keys):
+        logging.error(f"Unexpected nvidia-smi output, expected {len(keys)} fields: {line!r}")
+        return {key: "N/A" for key in keys}
+    return {key: QUERY_FIELDS[key][1](value) for key, value in zip(keys, values)}
+
+def parse_query_output(keys, output):
+    """Parses the output of a batched query, one stats dictionary per GPU line."""
+    return [parse_query_line(keys, line) for line in output.splitlines() if line.strip()]
+
+# --- Telemetry backends ---
+# A backend reads the registered stats of all GPUs in one go. NVML is used
+# when libnvidia-ml can be loaded; otherwise the batched nvidia-smi query.
+class SmiBackend:
+    """Telemetry backend running a single batched nvidia-smi query per read."""
+    name = "nvidia-smi"
+
+    def read_all(self, keys):
+        """Returns one stats dictionary per GPU with the given keys."""
+        result = run_command(build_query_command(keys))
+        if not result or result.returncode != 0:
+            return []
+        return parse_query_output(keys, result.stdout)
+
+    def close(self):
+        pass
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Returns the active telemetry backend, creating it on first use.
+    Set NVIDIAOC_BACKEND=nvidia-smi to skip NVML.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend(os.environ.get("NVIDIAOC_BACKEND", "auto"))
+        return _backend
+
+def _create_backend(preference):
+    if preference != SmiBackend.name:
+        try:
+            import nvml
+            return nvml.NvmlBackend()
+        except Exception as e:
+            logging.info(f"NVML backend unavailable ({e}). Falling back to nvidia-smi.")
+    return SmiBackend()
+
+def set_backend(backend):
+    """Replaces the active telemetry backend (e.g. with a stub), closing the old one."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None and _backend is not backend:
+            _backend.close()
+        _backend = backend
+    _static_query.invalidate()
+    _stats_query.invalidate()
+
+# --- Query caching ---
+# Seconds a read of the dynamic stats is reused by other callers (GUI,
+# verification, API, controllers). Override with NVIDIAOC_STATS_TTL.
+STATS_TTL = float(os.environ.get("NVIDIAOC_STATS_TTL", "0.5"))
+STATIC_RETRY_TTL = 30.0 # seconds a failed static attribute query is remembered before retrying
+
+class CachedQuery:
+    """
+    Caches the result of a query function for `ttl` seconds (forever if None)
+    and coalesces concurrent callers: while a query is in flight, other
+    callers wait for its result instead of starting their own. A failure is
+    re-raised without querying again for `error_ttl` seconds (not cached if 0).
+    """
+
+    def __init__(self, func, ttl: float = None, error_ttl: float = 0):
+        self.func = func
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._time = None
+        self._error = None
+        self._error_time = None
+        self._in_flight = None
+
+    def get(self, max_age: float = None):
+        """Returns the cached value if younger than max_age (default: ttl), else queries."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._time is not None and (max_age is None or time.monotonic() - self._time <= max_age):
+                return self._value
+            if self._error_time is not None and time.monotonic() - self._error_time < self.error_ttl:
+                raise self._error
+            in_flight = self._in_flight
+            if in_flight is None:
+                in_flight = self._in_flight = threading.Event()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            in_flight.wait()
+            with self._lock:
+                if self._error is not None:
+                    raise self._error
+                return self._value
+        value, error = None, None
+        try:
+            value = self.func()
+            return value
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                self._error = error
+                if error is None:
+                    self._value, self._time, self._error_time = value, time.monotonic(), None
+                else:
+                    self._error_time = time.monotonic()
+                self._in_flight = None
+            in_flight.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._time = self._error_time = None
+
+def _read_static_info():
+    keys = ["index"] + sorted(STATIC_FIELDS)
+    devices = get_backend().read_all(keys)
+    if not devices:
+        raise RuntimeError("No GPU answered the static attribute query.")
+    return {device["index"]: device for device in devices if isinstance(device.get("index"), int)}
+
+_static_query = CachedQuery(_read_static_info, error_ttl=STATIC_RETRY_TTL)
+_stats_query = CachedQuery(lambda: get_backend().read_all(dynamic_keys()), STATS_TTL)
+
+def get_static_info_all():
+    """
+    Returns {GPU index: static attributes}, queried once and then memoized.
+    After a failed query it returns {} for STATIC_RETRY_TTL seconds without
+    querying again, so callers running per sample do not spawn one each.
+    """
+    try:
+        return _static_query.get()
+    except RuntimeError:
+        return {}
+
+def get_static_info(gpu_index: int = 0):
+    """Returns the memoized static attributes (name, driver, VBIOS, limits) of one GPU."""
+    return dict(get_static_info_all().get(gpu_index, {}))
+
+def with_static_info(sample):
+    """Adds the memoized static attributes of the sample's GPU to a stats dictionary (in place)."""
+    for key, value in get_static_info_all().get(sample.get("index"), {}).items():
+        sample.setdefault(key, value)
+    return sample
+
+def invalidate_stats_cache():
+    """Forces the next get_all_gpu_stats() to query the backend."""
+    _stats_query.invalidate()
+
+def get_all_gpu_stats(gpu_indices=None, max_age: float = None):
+    """
+    Returns a list with the stats of every GPU. Dynamic stats come from one
+    backend read shared by all callers within max_age seconds (default
+    STATS_TTL); static attributes are memoized per device.
+    :param gpu_indices: Optional iterable of GPU indices to keep; all GPUs if None.
+    """
+    stats = [with_static_info(dict(device)) for device in _stats_query.get(max_age)]
+    if gpu_indices is not None:
+        wanted = set(gpu_indices)
+        stats = [device for device in stats if device.get("index") in wanted]
     return stats
 
+def get_all_stats(gpu_index: int = 0):
+    """Returns a dictionary with all stats of one GPU, read in one backend call."""
+    for device in get_all_gpu_stats():
+        if device.get("index") == gpu_index:
+            return device
+    return {key: "N/A" for key in QUERY_FIELDS}
+
+def get_gpu_indices():
+    """Returns the indices of all GPUs reported by the active backend (memoized)."""
+    return sorted(get_static_info_all())
+
+class BaseSampler:
+    """
+    Runs sampling on a background thread and keeps the latest sample per GPU
+    in a lock-protected slot, so readers never trigger a query themselves.
+    """
+    thread_name = "gpu-sampler"
+
+    def __init__(self, interval_ms: int = 1000, keys=None):
+        self.interval_ms = interval_ms
+        # Static attributes are merged in from the memoized values, not sampled.
+        self.keys = list(keys or dynamic_keys())
+        self._lock = threading.Lock()
+        # Latest sample and its timestamp per GPU index.
+        self._latest = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Starts the sampling thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the sampling thread."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def set_interval(self, interval_ms: int):
+        """Changes the sampling interval of a running sampler."""
+        self.interval_ms = interval_ms
+
+    def get_latest(self, gpu_index: int = 0, max_age: float = None):
+        """
+        Returns a copy of the latest sample of one GPU, or None if there is none yet.
+        :param max_age: If given, samples older than this many seconds are ignored.
+        """
+        with self._lock:
+            entry = self._latest.get(gpu_index)
+        if entry is None:
+            return None
+        sample, sample_time = entry
+        if max_age is not None and time.monotonic() - sample_time > max_age:
+            return None
+        return dict(sample)
+
+    def get_latest_all(self, max_age: float = None):
+        """
+        Returns copies of the latest samples of all GPUs, ordered by index.
+        Returns None if no GPU has a (fresh enough) sample yet.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = sorted(self._latest.items())
+        samples = [
+            dict(sample) for _, (sample, sample_time) in entries
+            if max_age is None or now - sample_time <= max_age
+        ]
+        return samples or None
+
+    def get_updates(self, since: float = None):
+        """
+        Returns (samples, newest): copies of the samples stored after `since`
+        (a time.monotonic() value, None for all), ordered by GPU index, and the
+        time of the newest sample. Pass `newest` back in to only get new samples.
+        """
+        with self._lock:
+            entries = sorted(self._latest.items())
+        samples = [dict(sample) for _, (sample, sample_time) in entries if since is None or sample_time > since]
+        newest = max((sample_time for _, (_, sample_time) in entries), default=since)
+        return samples, newest
+
+    def _store(self, sample):
+        if "index" in self.keys:
+            with_static_info(sample)
+        with self._lock:
+            self._latest[sample.get("index", 0)] = (sample, time.monotonic())
+
+    def _run(self):
+        raise NotImplementedError
+
+class PollingSampler(BaseSampler):
+    """Polls a cheap in-process backend (NVML) on a fixed interval."""
+    thread_name = "nvml-sampler"
+
+    def __init__(self, backend, interval_ms: int = 1000, keys=None):
+        super().__init__(interval_ms, keys)
+        self.backend = backend
+        self._wake = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        super().stop()
+
+    def set_interval(self, interval_ms: int):
+        """Changes the interval; a shorter one takes effect right away."""
+        shorter = interval_ms < self.interval_ms
+        super().set_interval(interval_ms)
+        if shorter:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                for sample in self.backend.read_all(self.keys):
+                    self._store(sample)
+            except Exception as e:
+                logging.error(f"Polling sampler read failed: {e}")
+            self._wake.wait(self.interval_ms / 1000)
+            self._wake.clear()
+
+class StreamingSampler(BaseSampler):
+    """
+    Keeps one long-lived nvidia-smi process running in loop mode (-lms) and
+    parses its output line by line on a reader thread. In loop mode nvidia-smi
+    prints one line per GPU on every interval. The child is restarted if it
+    dies while the sampler is running.
+
+    The -lms period is fixed for the life of a child, so interval changes are
+    applied sparingly: a faster interval restarts the child at once, a slower
+    one only once it has been requested for `settle_seconds`. An adaptive
+    reader backing off step by step therefore costs one restart, when its
+    values have stayed stable long enough to settle at the slow interval.
+    """
+    thread_name = "nvidia-smi-sampler"
+
+    def __init__(self, interval_ms: int = 1000, restart_delay: float = 2.0, keys=None, settle_seconds: float = 30.0):
+        super().__init__(interval_ms, keys)
+        self.restart_delay = restart_delay
+        self.settle_seconds = settle_seconds
+        self._process = None
+        self._restarting = False
+        self._child_interval = None # -lms value of the running child
+        self._requested_at = 0.0
+
+    def set_interval(self, interval_ms: int):
+        """Requests a new interval; see the class docstring for when the child is restarted."""
+        if interval_ms == self.interval_ms:
+            return
+        super().set_interval(interval_ms)
+        self._requested_at = time.monotonic()
+        if self._child_interval is not None and interval_ms < self._child_interval:
+            self._restart_child()
+
+    def _restart_child(self):
+        process = self._process
+        if process and process.poll() is None:
+            self._restarting = True
+            process.terminate()
+
+    def stop(self):
+        """Stops the reader thread and terminates the nvidia-smi child."""
+        self._stop_event.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        super().stop()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._child_interval = self.interval_ms
+            command = build_query_command(self.keys) + ["-lms", str(self._child_interval)]
+            logging.debug(f"Starting streaming sampler: {' '.join(command)}")
+            started = time.perf_counter()
+            try:
+                self._process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    bufsize=1
+                )
+            except (FileNotFoundError, OSError) as e:
+                logging.error(f"Could not start streaming sampler: {e}")
+                self._stop_event.wait(self.restart_delay)
+                continue
+
+            for line in self._process.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                self._store(parse_query_line(self.keys, line))
+                # A slower interval that has held for settle_seconds is worth one restart.
+                if (self.interval_ms > self._child_interval and not self._restarting
+                        and time.monotonic() - self._requested_at >= self.settle_seconds):
+                    self._restart_child()
+            returncode = self._process.wait()
+            # Recorded once per child, with its whole lifetime as the duration.
+            command_stats.RECORDER.record(command, (time.perf_counter() - started) * 1000, returncode)
+
+            if self._restarting:
+                self._restarting = False
+                continue
+            if not self._stop_event.is_set():
+                logging.warning(f"Streaming sampler exited with code {returncode}. Restarting in {self.restart_delay}s.")
+                self._stop_event.wait(self.restart_delay)
+
+def create_sampler(interval_ms: int = 1000, keys=None):
+    """
+    Returns the cheapest sampler for the active backend (not yet started).
+    :param keys: Registered fields to sample; all of them if None.
+    """
+    backend = get_backend()
+    if isinstance(backend, SmiBackend):
+        return StreamingSampler(interval_ms, keys=keys)
+    return PollingSampler(backend, interval_ms, keys)
+
 def get_xauthority_path():
     """Finds the path to the .Xauthority file."""
     xauth_path = os.environ.get("XAUTHORITY")
     if xauth_path and os.path.exists(xauth_path):
-        logging.info(f"Found XAUTHORITY path in environment variable: {xauth_path}")
+        logging.debug(f"Found XAUTHORITY path in environment variable: {xauth_path}")
         return xauth_path
 
     # Fallback for environments where XAUTHORITY is not set (e.g. GDM on Wayland)
@@ -99,7 +536,7 @@ def get_xauthority_path():
         for item in os.listdir(run_user_dir):
             if "xauth" in item.lower():
                 path = os.path.join(run_user_dir, item)
-                logging.info(f"Found potential XAUTHORITY file at: {path}")
+                logging.debug(f"Found potential XAUTHORITY file at: {path}")
                 return path
     
     logging.warning("Could not automatically determine XAUTHORITY path. Privileged commands may fail.")
@@ -129,10 +566,10 @@ def manage_xhost_permissions(action: str):
         logging.warning(f"xhost command failed. This might be okay if permissions were already set/unset.")
         logging.warning(f"xhost stderr: {result.stderr.strip()}")
 
-def run_privileged_command(command: list):
+def get_pkexec_prefix():
     """
-    Executes a command that requires root privileges (e.g., nvidia-settings -a)
-    using the pkexec wrapper script and managing xhost permissions.
+    Returns the pkexec + wrapper command prefix that runs a command as root
+    inside the user's X session, or None if the session cannot be determined.
     """
     xauth_path = get_xauthority_path()
     display = os.environ.get("DISPLAY")
@@ -141,17 +578,33 @@ def run_privileged_command(command: list):
         logging.error(f"Cannot execute privileged command without XAUTHORITY ({xauth_path}) or DISPLAY ({display}).")
         return None
 
-    wrapper_path = os.path.join(os.path.dirname(__file__), "pkexec_wrapper.sh")
+    wrapper_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pkexec_wrapper.sh")
     if not os.path.exists(wrapper_path):
         logging.error(f"pkexec wrapper not found at {wrapper_path}")
         return None
 
-    full_command = [
+    return [
         "pkexec",
         wrapper_path,
         display,
         xauth_path,
-    ] + command
+    ]
+
+def run_privileged_command(command: list):
+    """
+    Executes a command that requires root privileges (e.g., nvidia-settings -a).
+    nvidia-settings assignments go to the persistent helper when it is running;
+    otherwise the pkexec wrapper script is used and xhost permissions are
+    granted for the duration of the call.
+    """
+    result = run_helper_command(command)
+    if result is not None:
+        return result
+
+    prefix = get_pkexec_prefix()
+    if prefix is None:
+        return None
+    full_command = prefix + command
 
     manage_xhost_permissions("add")
     try:
@@ -164,36 +617,314 @@ def run_privileged_command(command: list):
     finally:
         manage_xhost_permissions("remove")
 
+# --- Persistent privileged helper ---
+# privileged_helper.py is started once through pkexec and then applies
+# nvidia-settings assignments sent over a Unix socket, so repeated applies
+# need neither a new pkexec prompt nor xhost changes.
+HELPER_START_TIMEOUT = 60 # seconds, includes the time spent in the auth dialog
+HELPER_REQUEST_TIMEOUT = 10
+
+def get_helper_socket_path():
+    """Returns the path of the helper socket in the user's runtime directory."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "nvidiaoc-helper.sock")
+
+def send_helper_request(request: dict, timeout: float = HELPER_REQUEST_TIMEOUT):
+    """Sends one request to the helper and returns its response, or None if it is not reachable."""
+    socket_path = get_helper_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            connection.connect(socket_path)
+            stream = connection.makefile("rwb")
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+        return json.loads(line) if line else None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Privileged helper request failed: {e}")
+        return None
+
+def is_helper_running():
+    """Returns True if the persistent helper answers a ping."""
+    response = send_helper_request({"action": "ping"}, timeout=1)
+    return bool(response and response.get("ok"))
+
+def run_helper_command(command: list):
+    """
+    Runs an nvidia-settings -a command through the helper.
+    Returns a CompletedProcess, or None if the helper cannot handle it.
+    """
+    if command[:1] != ["nvidia-settings"] or len(command) < 3 or command[1::2] != ["-a"] * (len(command) // 2):
+        return None
+    assignments = command[2::2]
+    response = send_helper_request({"action": "apply", "assignments": assignments})
+    if response is None:
+        return None
+    if "returncode" not in response:
+        logging.error(f"Privileged helper rejected the request: {response.get('error')}")
+        return None
+    if response["ok"]:
+        logging.info(f"Privileged command successful via helper: {' '.join(command)}")
+    else:
+        logging.error(f"Privileged command failed via helper: {' '.join(command)}")
+        logging.error(f"Stderr: {response.get('stderr', '').strip()}")
+    return subprocess.CompletedProcess(command, response["returncode"], response.get("stdout", ""), response.get("stderr", ""))
+
+def start_privileged_helper(idle_timeout: float = None):
+    """
+    Starts the persistent helper through pkexec (one authentication prompt)
+    and waits until it answers. Root keeps X access while the helper runs.
+    """
+    if is_helper_running():
+        logging.info("Privileged helper is already running.")
+        return True
+    prefix = get_pkexec_prefix()
+    if prefix is None:
+        return False
+
+    helper_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "privileged_helper.py")
+    command = prefix + [sys.executable, helper_path, "--socket", get_helper_socket_path(), "--uid", str(os.getuid())]
+    if idle_timeout:
+        command += ["--idle-timeout", str(idle_timeout)]
+
+    manage_xhost_permissions("add")
+    logging.info(f"Starting privileged helper: {' '.join(command)}")
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+    except (FileNotFoundError, OSError) as e:
+        logging.error(f"Could not start privileged helper: {e}")
+        manage_xhost_permissions("remove")
+        return False
+
+    deadline = time.monotonic() + HELPER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if is_helper_running():
+            logging.info("Privileged helper started.")
+            return True
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    logging.error("Privileged helper did not start (authentication cancelled or failed).")
+    manage_xhost_permissions("remove")
+    return False
+
+def stop_privileged_helper():
+    """Asks the persistent helper to exit and revokes root's X access."""
+    response = send_helper_request({"action": "shutdown"})
+    if response is None:
+        logging.info("Privileged helper is not running.")
+        return False
+    manage_xhost_permissions("remove")
+    logging.info("Privileged helper stopped.")
+    return True
+
+
+# --- Functions for setting values ---
 
-# --- Functions for setting values (will be expanded later) ---
+_fan_map = None
 
-def set_fan_control_state(enable: bool):
-    """Enables or disables manual fan control in a single call."""
+def get_fan_map():
+    """
+    Returns a dictionary mapping each GPU index to the indices of its fans.
+    nvidia-settings numbers fans globally, so the fans are split evenly over
+    the GPUs in order, which matches rigs built from identical cards. The
+    result is cached for the lifetime of the process.
+    """
+    global _fan_map
+    if _fan_map is not None:
+        return _fan_map
+
+    gpu_indices = get_gpu_indices()
+    result = run_command(["nvidia-settings", "-q", "fans"])
+    fan_indices = []
+    if result and result.returncode == 0:
+        fan_indices = sorted({int(match) for match in re.findall(r"\[fan:(\d+)\]", result.stdout)})
+
+    if not gpu_indices or not fan_indices or len(fan_indices) < len(gpu_indices):
+        logging.warning("Could not determine the fan layout. Assuming one fan per GPU.")
+        _fan_map = {index: [index] for index in (gpu_indices or [0])}
+    else:
+        per_gpu = len(fan_indices) // len(gpu_indices)
+        _fan_map = {
+            index: fan_indices[position * per_gpu:(position + 1) * per_gpu]
+            for position, index in enumerate(gpu_indices)
+        }
+    logging.info(f"Fan layout: {_fan_map}")
+    return _fan_map
+
+def get_fan_indices(gpu_indices):
+    """Returns the fan indices belonging to the given GPUs."""
+    fan_map = get_fan_map()
+    fans = []
+    for index in gpu_indices:
+        fans.extend(fan_map.get(index, [index]))
+    return fans
+
+def set_fan_control_state(enable: bool, gpu_indices=(0,)):
+    """Enables or disables manual fan control on the given GPUs in a single call."""
     value = 1 if enable else 0
-    logging.info(f"Setting GPUFanControlState to {value}")
-    return run_privileged_command(["nvidia-settings", "-a", f"[gpu:0]/GPUFanControlState={value}"])
-
-def apply_all_settings(fan_speed: int, core_offset: int, mem_offset: int):
-    """Applies all overclock settings in a single command to avoid multiple password prompts."""
-    logging.info("Constructing single command for all settings.")
-    command = [
-        "nvidia-settings",
-        "-a", f"[gpu:0]/GPUFanControlState=1",
-        "-a", f"[fan:0]/GPUTargetFanSpeed={fan_speed}",
-        "-a", f"[gpu:0]/GPUGraphicsClockOffset[3]={core_offset}",
-        "-a", f"[gpu:0]/GPUMemoryTransferRateOffset[3]={mem_offset}",
-    ]
-    return run_privileged_command(command)
-
-def reset_all_settings():
-    """Resets all overclock settings in a single command."""
-    logging.info("Constructing single command to reset all settings.")
-    command = [
-        "nvidia-settings",
-        "-a", f"[gpu:0]/GPUGraphicsClockOffset[3]=0",
-        "-a", f"[gpu:0]/GPUMemoryTransferRateOffset[3]=0",
-        "-a", f"[gpu:0]/GPUFanControlState=0", # Set to auto
-    ]
-    return run_privileged_command(command)
+    logging.info(f"Setting GPUFanControlState to {value} on GPUs {list(gpu_indices)}")
+    return apply_assignments([(f"[gpu:{index}]/GPUFanControlState", value) for index in gpu_indices])
+
+def set_fan_speed(fan_speed: int, gpu_indices=(0,)):
+    """
+    Sets a manual fan speed on the given GPUs. Thanks to the diff-based apply,
+    repeated calls only write GPUTargetFanSpeed once manual control is on.
+    """
+    assignments = [(f"[gpu:{index}]/GPUFanControlState", 1) for index in gpu_indices]
+    assignments += [(f"[fan:{fan}]/GPUTargetFanSpeed", fan_speed) for fan in get_fan_indices(gpu_indices)]
+    return apply_assignments(assignments)
+
+# --- Diff-based apply ---
+# The current values of the writable attributes are read with one unprivileged
+# nvidia-settings query and cached, so re-applying what is already on the card
+# costs a cheap read (or nothing, within the TTL) instead of a pkexec call.
+SETTINGS_CACHE_TTL = 30 # seconds
+_settings_cache = {}
+_settings_cache_lock = threading.Lock()
+
+class ApplyResult:
+    """
+    Outcome of an apply: the attribute assignments actually written and the
+    result of the privileged command (None if nothing had to be written).
+    """
+
+    def __init__(self, changes, result=None):
+        self.changes = changes
+        self.result = result
+
+    @property
+    def skipped(self):
+        return not self.changes
+
+    @property
+    def returncode(self):
+        if self.skipped:
+            return 0
+        return self.result.returncode if self.result else None
 
+    def __repr__(self):
+        return f"ApplyResult(changes={self.changes}, returncode={self.returncode})"
+
+def read_current_settings(targets):
+    """
+    Returns {target: value} for the given attribute targets (e.g.
+    "[gpu:0]/GPUFanControlState"), using cached values younger than
+    SETTINGS_CACHE_TTL and a single nvidia-settings query for the rest.
+    Targets that cannot be read are left out.
+    """
+    now = time.monotonic()
+    with _settings_cache_lock:
+        current = {
+            target: _settings_cache[target][0] for target in targets
+            if target in _settings_cache and now - _settings_cache[target][1] < SETTINGS_CACHE_TTL
+        }
+    missing = [target for target in targets if target not in current]
+    if not missing:
+        return current
+
+    command = ["nvidia-settings", "-t"]
+    for target in missing:
+        command += ["-q", target]
+    result = run_command(command)
+    lines = result.stdout.split() if result and result.returncode == 0 else []
+    if len(lines) != len(missing):
+        logging.warning("Could not read the current GPU settings. All requested settings will be written.")
+        return current
+    for target, line in zip(missing, lines):
+        try:
+            current[target] = int(line)
+        except ValueError:
+            continue
+    remember_settings({target: current[target] for target in missing if target in current})
+    return current
+
+def remember_settings(values: dict):
+    """Stores known attribute values in the settings cache."""
+    now = time.monotonic()
+    with _settings_cache_lock:
+        for target, value in values.items():
+            _settings_cache[target] = (value, now)
+
+def invalidate_settings_cache():
+    with _settings_cache_lock:
+        _settings_cache.clear()
+
+def plan_changes(assignments, force: bool = False):
+    """
+    Returns the subset of the (target, value) assignments that differ from
+    what is currently set on the card, in their original order.
+    """
+    if force:
+        return list(assignments)
+    current = read_current_settings([target for target, _ in assignments])
+    return [(target, value) for target, value in assignments if current.get(target) != value]
+
+def apply_assignments(assignments, force: bool = False):
+    """
+    Writes the assignments that actually change something in a single
+    privileged nvidia-settings call, skipping the call entirely if nothing
+    changed. Returns an ApplyResult.
+    """
+    changes = plan_changes(assignments, force)
+    if not changes:
+        logging.info("Requested settings are already active. Nothing to apply.")
+        return ApplyResult([])
+
+    logging.info(f"Applying {len(changes)} changed setting(s): {', '.join(f'{t}={v}' for t, v in changes)}")
+    command = ["nvidia-settings"]
+    for target, value in changes:
+        command += ["-a", f"{target}={value}"]
+    result = run_privileged_command(command)
+    if result and result.returncode == 0:
+        remember_settings(dict(changes))
+    else:
+        invalidate_settings_cache()
+    invalidate_stats_cache()
+    return ApplyResult(changes, result)
+
+# Values accepted from remote callers (the daemon API); nvidia-settings itself takes more.
+FAN_SPEED_RANGE = (0, 100)
+CORE_OFFSET_RANGE = (-1000, 1000)
+MEM_OFFSET_RANGE = (-2000, 4000)
+
+def check_settings(fan_speed: int, core_offset: int, mem_offset: int):
+    """Raises ValueError if a fan speed or clock offset is outside the accepted range."""
+    for name, value, (low, high) in (
+        ("fan_speed", fan_speed, FAN_SPEED_RANGE),
+        ("core_clock", core_offset, CORE_OFFSET_RANGE),
+        ("mem_clock", mem_offset, MEM_OFFSET_RANGE),
+    ):
+        if not low <= value <= high:
+            raise ValueError(f"{name} must be between {low} and {high}, got {value}")
+
+def apply_all_settings(fan_speed: int, core_offset: int, mem_offset: int, gpu_indices=(0,), force: bool = False):
+    """
+    Applies all overclock settings to the given GPUs in a single command to
+    avoid multiple password prompts, whatever the number of devices. Only
+    settings that differ from the current ones are written unless force is set.
+    """
+    assignments = []
+    for index in gpu_indices:
+        assignments += [
+            (f"[gpu:{index}]/GPUFanControlState", 1),
+            (f"[gpu:{index}]/GPUGraphicsClockOffset[3]", core_offset),
+            (f"[gpu:{index}]/GPUMemoryTransferRateOffset[3]", mem_offset),
+        ]
+    for fan in get_fan_indices(gpu_indices):
+        assignments.append((f"[fan:{fan}]/GPUTargetFanSpeed", fan_speed))
+    return apply_assignments(assignments, force)
 
+def reset_all_settings(gpu_indices=(0,), force: bool = False):
+    """Resets all overclock settings on the given GPUs in a single command."""
+    assignments = []
+    for index in gpu_indices:
+        assignments += [
+            (f"[gpu:{index}]/GPUGraphicsClockOffset[3]", 0),
+            (f"[gpu:{index}]/GPUMemoryTransferRateOffset[3]", 0),
+            (f"[gpu:{index}]/GPUFanControlState", 0), # Set to auto
+        ]
+    return apply_assignments(assignments, force)
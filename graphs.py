@@ -0,0 +1,92 @@
+import tkinter as tk
+from collections import deque
+
+class Sparkline(tk.Canvas):
+    """
+    Small scrolling line graph. Each tick creates one new segment and shifts
+    the others left with a single tagged move, so it costs one Tcl call plus
+    work linear in the visible segments (at most width / step), instead of
+    deleting and recreating them all. The graph is only rebuilt when the
+    scale grows or the widget is resized.
+    """
+
+    def __init__(self, parent, label, unit, maximum=100.0, step=3, height=42, color="#2a7ab0", **kwargs):
+        super().__init__(parent, height=height, bg="#f0f0f0", highlightthickness=0, **kwargs)
+        self.label = label
+        self.unit = unit
+        self.maximum = maximum
+        self.step = step
+        self.color = color
+        self.graph_width = self.winfo_reqwidth()
+        self.graph_height = height
+        self._values = deque(maxlen=self.graph_width // step + 1)
+        self._segments = deque()
+        self._text = self.create_text(4, 2, anchor="nw", font=("monospace", 8), text=f"{label}: N/A")
+        self.bind("<Configure>", self._on_configure)
+
+    @property
+    def capacity(self):
+        """Number of points that fit in the current width."""
+        return self._values.maxlen
+
+    def _y(self, value):
+        padding = 14 # room for the label
+        usable = self.graph_height - padding - 2
+        return self.graph_height - 2 - usable * min(value, self.maximum) / self.maximum
+
+    def _grow_scale(self, value):
+        # Round the new maximum up to a "nice" number so rescales stay rare.
+        magnitude = 10 ** max(len(str(int(value))) - 1, 0)
+        self.maximum = float(((int(value) // magnitude) + 1) * magnitude)
+
+    def add_point(self, value):
+        """Appends a value (None for a gap) and draws only the new segment."""
+        previous = self._values[-1] if self._values else None
+        self._values.append(value)
+        self.itemconfig(self._text, text=f"{self.label}: {'N/A' if value is None else f'{value:g}'} {self.unit}")
+        if value is not None and value > self.maximum:
+            self._grow_scale(value)
+            self.redraw()
+            return
+
+        self.move("segment", -self.step, 0)
+        while self._segments and self.coords(self._segments[0])[2] <= 0:
+            self.delete(self._segments.popleft())
+        if previous is not None and value is not None:
+            x = self.graph_width - 1
+            self._segments.append(self.create_line(
+                x - self.step, self._y(previous), x, self._y(value),
+                fill=self.color, width=1.5, tags="segment"
+            ))
+
+    def set_values(self, values):
+        """Replaces the whole series (e.g. after switching GPU) and redraws."""
+        self._values.clear()
+        self._values.extend(values)
+        peak = max((value for value in self._values if value is not None), default=0)
+        if peak > self.maximum:
+            self._grow_scale(peak)
+        latest = self._values[-1] if self._values else None
+        self.itemconfig(self._text, text=f"{self.label}: {'N/A' if latest is None else f'{latest:g}'} {self.unit}")
+        self.redraw()
+
+    def redraw(self):
+        """Rebuilds all segments from the buffered values."""
+        self.delete("segment")
+        self._segments.clear()
+        values = list(self._values)
+        x = self.graph_width - 1 - self.step * (len(values) - 1)
+        for previous, value in zip(values, values[1:]):
+            x += self.step
+            if previous is not None and value is not None:
+                self._segments.append(self.create_line(
+                    x - self.step, self._y(previous), x, self._y(value),
+                    fill=self.color, width=1.5, tags="segment"
+                ))
+
+    def _on_configure(self, event):
+        if event.width == self.graph_width and event.height == self.graph_height:
+            return
+        self.graph_width, self.graph_height = event.width, event.height
+        self._values = deque(self._values, maxlen=self.graph_width // self.step + 1)
+        self.redraw()
@@ -0,0 +1,594 @@
+import json
+import logging
+import queue
+import tkinter as tk
+from tkinter import ttk, messagebox
+from concurrent.futures import ThreadPoolExecutor
+
+import gpu
+import processes
+import profiles
+import command_stats
+import history
+from adaptive import AdaptiveInterval
+import api_client
+from fancurve import FanCurveDriver
+from graphs import Sparkline
+from table import StatsTable
+
+STATS_INTERVAL_MS = 2000 # refresh of the diagnostics window; stats ticks are adaptive
+ALL_DEVICES = "All GPUs"
+# (stats key, label, unit) of the rows of the stats table
+STATS_ROWS = [
+    ("index", "GPU Index", ""),
+    ("name", "GPU Name", ""),
+    ("temperature", "Temperature", "°C"),
+    ("utilization", "GPU Usage", "%"),
+    ("core_clock", "Core Clock", "MHz"),
+    ("memory_clock", "Memory Clock", "MHz"),
+    ("power_usage", "Power Usage", "W"),
+    ("fan_speed", "Target Fan Speed", "%"),
+]
+# (stats key, label, unit, initial scale maximum) of the live graphs
+GRAPH_METRICS = [
+    ("temperature", "Temp", "°C", 100),
+    ("utilization", "Usage", "%", 100),
+    ("core_clock", "Core", "MHz", 2000),
+    ("power_usage", "Power", "W", 200),
+]
+
+# --- Background Worker ---
+class BackgroundWorker:
+    """
+    Runs blocking GPU calls (sampling, pkexec applies) on worker threads and
+    hands the results back to Tk through a queue that is polled from the main
+    loop, so callbacks always run on the Tk thread.
+    """
+
+    def __init__(self, root, max_workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gpu-worker")
+        self.results = queue.Queue()
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, func, *args, callback=None, error_callback=None):
+        """Runs func(*args) in the background and calls callback(result) on the Tk thread."""
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda f: self.results.put((f, callback, error_callback)))
+        return future
+
+    def _poll(self):
+        while True:
+            try:
+                future, callback, error_callback = self.results.get_nowait()
+            except queue.Empty:
+                break
+            error = future.exception()
+            if error is not None:
+                logging.error(f"Background task failed: {error}")
+                if error_callback: error_callback(error)
+            elif callback:
+                callback(future.result())
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        self.root.after_cancel(self._poll_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Main Application Class (Simplified) ---
+class App:
+    def __init__(self, root, client=None, recorder=None):
+        self.root = root
+        # As a thin client of a running daemon (or of a replayed recording) the GUI neither samples nor applies itself.
+        self.client = client
+        self.recorder = recorder
+        self.root.title("NVIDIA GPU Control & Monitor")
+        self.root.geometry("850x720")
+        self.root.minsize(700, 550)
+
+        self.style = ttk.Style()
+        self.style.theme_use('clam')
+        self.monitoring_paused = False
+        self.stats_pending = False
+        self.profiles = {}
+        self.device_names = {}
+        self.history = history.TelemetryHistory()
+        self.graph_gpu_index = None
+        self.fan_curve_driver = None
+        self.diagnostics_window = None
+        self.diagnostics_after_id = None
+        self.processes_window = None
+        self.processes_after_id = None
+        self.process_monitor = processes.ProcessMonitor()
+        self.process_sort = ("used_memory", True)
+        self.processes_pending = False
+        self.scheduler = AdaptiveInterval()
+        self.stats_after_id = None
+        self.stats_interval = self.scheduler.interval_ms
+        self.worker = BackgroundWorker(self.root)
+
+        main_paned_window = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        main_paned_window.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        controls_frame = ttk.Frame(main_paned_window, width=400)
+        main_paned_window.add(controls_frame, weight=1)
+        right_panel_frame = ttk.Frame(main_paned_window)
+        main_paned_window.add(right_panel_frame, weight=1)
+
+        self._create_controls_ui(controls_frame)
+        self._create_monitoring_ui(right_panel_frame)
+        self._create_profiles_ui(right_panel_frame)
+        
+        self.load_and_initialize_profiles()
+
+        # A single background sampler feeds the monitor, so a tick is just a read.
+        self.sampler = None
+        if not self.client:
+            self.sampler = gpu.create_sampler(interval_ms=self.scheduler.interval_ms)
+            self.sampler.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        for event in ("<Map>", "<Unmap>", "<FocusIn>", "<FocusOut>"):
+            self.root.bind(event, self._on_visibility_changed, add="+")
+        
+        logging.info("Application GUI initialized.")
+        self.update_stats()
+
+    def _create_controls_ui(self, parent):
+        frame = ttk.LabelFrame(parent, text="GPU Controls", padding=(10, 10))
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        # Device selector - filled in once the first sample lists the GPUs
+        device_frame = ttk.Frame(frame)
+        device_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(device_frame, text="Device:").pack(side=tk.LEFT, anchor="w")
+        self.device_combobox = ttk.Combobox(device_frame, values=[ALL_DEVICES], state="readonly")
+        self.device_combobox.set(ALL_DEVICES)
+        self.device_combobox.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+        self.device_combobox.bind("<<ComboboxSelected>>", lambda event: self.update_stats_display())
+
+        # Fan Speed - Always visible and enabled
+        fan_frame = ttk.Frame(frame)
+        fan_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(fan_frame, text="Fan Speed (%):").pack(side=tk.LEFT, anchor="w")
+        self.fan_speed_label = ttk.Label(fan_frame, text="30%", width=8, anchor="e")
+        self.fan_speed_label.pack(side=tk.RIGHT, padx=5)
+        self.fan_speed = tk.IntVar(value=30)
+        self.fan_slider = ttk.Scale(fan_frame, from_=30, to=100, orient=tk.HORIZONTAL, variable=self.fan_speed, command=lambda v: self.fan_speed_label.config(text=f"{int(float(v))}"))
+        self.fan_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+        self.fan_curve_label = ttk.Label(frame, text="", foreground="#2a7ab0")
+        self.fan_curve_label.pack(fill=tk.X)
+
+        # Core Clock
+        core_frame = ttk.Frame(frame)
+        core_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(core_frame, text="Core Clock (MHz):").pack(side=tk.LEFT, anchor="w")
+        self.core_clock_label = ttk.Label(core_frame, text="+0 MHz", width=8, anchor="e")
+        self.core_clock_label.pack(side=tk.RIGHT, padx=5)
+        self.core_clock = tk.IntVar(value=0)
+        core_slider = ttk.Scale(core_frame, from_=0, to=250, orient=tk.HORIZONTAL, variable=self.core_clock, command=lambda v: self.core_clock_label.config(text=f"+{int(float(v))} MHz"))
+        core_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # Memory Clock
+        mem_frame = ttk.Frame(frame)
+        mem_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(mem_frame, text="Memory Clock (MHz):").pack(side=tk.LEFT, anchor="w")
+        self.mem_clock_label = ttk.Label(mem_frame, text="+0 MHz", width=8, anchor="e")
+        self.mem_clock_label.pack(side=tk.RIGHT, padx=5)
+        self.mem_clock = tk.IntVar(value=0)
+        mem_slider = ttk.Scale(mem_frame, from_=0, to=1000, orient=tk.HORIZONTAL, variable=self.mem_clock, command=lambda v: self.mem_clock_label.config(text=f"+{int(float(v))} MHz"))
+        mem_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # Action Buttons
+        buttons_frame = ttk.Frame(frame)
+        buttons_frame.pack(fill=tk.X, pady=20)
+        self.apply_button = ttk.Button(buttons_frame, text="Apply Changes", command=self.apply_settings)
+        self.apply_button.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.reset_button = ttk.Button(buttons_frame, text="Reset to Defaults", command=self.reset_defaults)
+        self.reset_button.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+
+        # Persistent helper - one password prompt for the whole session
+        self.use_helper = tk.BooleanVar(value=False)
+        self.helper_check = ttk.Checkbutton(frame, text="Keep admin helper running (no repeated prompts)", variable=self.use_helper, command=self.toggle_helper)
+        self.helper_check.pack(fill=tk.X)
+
+    def _create_monitoring_ui(self, parent):
+        frame = ttk.LabelFrame(parent, text="Real-Time Monitoring", padding=(10, 10))
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        warning_label = ttk.Label(frame, text="Warning: Overclocking can be risky. Proceed with caution.", style="Warning.TLabel")
+        self.style.configure("Warning.TLabel", foreground="red")
+        warning_label.pack(fill=tk.X)
+        self.stats_table = StatsTable(frame, STATS_ROWS)
+        self.stats_table.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
+
+        # Live graphs of the first selected GPU, fed from the telemetry history
+        graphs_frame = ttk.Frame(frame)
+        graphs_frame.pack(fill=tk.X, pady=(0, 10))
+        self.graphs = {}
+        for position, (key, label, unit, maximum) in enumerate(GRAPH_METRICS):
+            graph = Sparkline(graphs_frame, label, unit, maximum=maximum, width=180)
+            graph.grid(row=position // 2, column=position % 2, sticky="ew", padx=2, pady=2)
+            self.graphs[key] = graph
+        graphs_frame.columnconfigure(0, weight=1)
+        graphs_frame.columnconfigure(1, weight=1)
+        monitor_buttons = ttk.Frame(frame)
+        monitor_buttons.pack(fill=tk.X)
+        self.pause_button = ttk.Button(monitor_buttons, text="Pause Monitor", command=self.toggle_monitoring)
+        self.pause_button.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(monitor_buttons, text="Processes", command=self.show_processes).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(monitor_buttons, text="Diagnostics", command=self.show_diagnostics).pack(side=tk.LEFT, padx=(5, 0))
+
+    def _create_profiles_ui(self, parent):
+        frame = ttk.LabelFrame(parent, text="Profiles", padding=(10, 10))
+        frame.pack(fill=tk.X, padx=5, pady=5)
+        load_frame = ttk.Frame(frame)
+        load_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(load_frame, text="Load Profile:").pack(side=tk.LEFT, padx=(0, 5))
+        self.profile_combobox = ttk.Combobox(load_frame, values=["Default"], state="readonly")
+        self.profile_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.profile_combobox.bind("<<ComboboxSelected>>", self.load_profile)
+        save_frame = ttk.Frame(frame)
+        save_frame.pack(fill=tk.X, pady=5)
+        self.profile_name_entry = ttk.Entry(save_frame)
+        self.profile_name_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        self.save_profile_button = ttk.Button(save_frame, text="Save", command=self.save_profile)
+        self.save_profile_button.pack(side=tk.LEFT)
+        self.delete_profile_button = ttk.Button(frame, text="Delete Selected Profile", command=self.delete_profile)
+        self.delete_profile_button.pack(fill=tk.X, pady=5)
+
+    def set_ui_busy(self, is_busy):
+        state = tk.DISABLED if is_busy else tk.NORMAL
+        for widget in [self.apply_button, self.reset_button, self.save_profile_button, self.delete_profile_button, self.fan_slider, self.profile_combobox, self.device_combobox]:
+            widget.config(state=state)
+        self.root.config(cursor="watch" if is_busy else "")
+
+    def apply_settings(self, profile_name=None):
+        logging.info(f"Applying settings from {'sliders' if not profile_name else f'profile: {profile_name}'}...")
+        if not profile_name: self.set_fan_curve(None)
+        self.set_ui_busy(True)
+        self.worker.submit(
+            self.client.apply if self.client else gpu.apply_all_settings, self.fan_speed.get(), self.core_clock.get(), self.mem_clock.get(), self.selected_gpu_indices(),
+            callback=self._on_apply_finished, error_callback=self._on_apply_failed
+        )
+
+    def _on_apply_finished(self, result):
+        self.set_ui_busy(False)
+        changes = result.changes if isinstance(result, gpu.ApplyResult) else result.get("changes")
+        if not changes:
+            logging.info("Settings already active. Nothing was written.")
+            return
+        logging.info("Settings applied. Verifying values in 2 seconds...")
+        self.boost_sampling()
+        self.root.after(2000, self.verify_settings)
+
+    def _on_apply_failed(self, error):
+        self.set_ui_busy(False)
+        logging.error(f"An error occurred while applying settings: {error}")
+
+    def reset_defaults(self):
+        logging.info("Resetting to default settings...")
+        self.set_fan_curve(None)
+        self.set_ui_busy(True)
+        reset = self.client.reset if self.client else gpu.reset_all_settings
+        self.worker.submit(reset, self.selected_gpu_indices(), callback=self._on_reset_finished, error_callback=self._on_reset_failed)
+
+    def _on_reset_finished(self, result):
+        self.set_ui_busy(False)
+        self.set_sliders_from_profile("Default")
+        logging.info("Defaults restored. Verifying values in 2 seconds...")
+        self.boost_sampling()
+        self.root.after(2000, self.verify_settings)
+
+    def _on_reset_failed(self, error):
+        self.set_ui_busy(False)
+        logging.error(f"An error occurred while resetting defaults: {error}")
+
+    def toggle_helper(self):
+        self.helper_check.config(state=tk.DISABLED)
+        if self.use_helper.get():
+            self.worker.submit(gpu.start_privileged_helper, callback=self._on_helper_toggled)
+        else:
+            self.worker.submit(gpu.stop_privileged_helper, callback=self._on_helper_toggled)
+
+    def _on_helper_toggled(self, result):
+        self.helper_check.config(state=tk.NORMAL)
+        self.use_helper.set(gpu.is_helper_running())
+
+    def verify_settings(self):
+        # The sampler is running fast after an apply, so its latest sample is fresh enough.
+        read_stats = self.client.get_stats if self.client else self.get_current_stats
+        self.worker.submit(read_stats, callback=self._on_verify_finished)
+
+    def _on_verify_finished(self, devices):
+        logging.info("--- Verification Check ---")
+        for stats in devices:
+            if stats.get("index") in self.selected_gpu_indices():
+                logging.info(f"GPU {stats.get('index')} Post-change Target Fan Speed: {stats.get('fan_speed', 'N/A')}%")
+        logging.info("--- End Verification ---")
+        if self.monitoring_paused: self.render_stats(devices)
+        
+    def show_diagnostics(self):
+        if self.diagnostics_window and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        self.diagnostics_window = tk.Toplevel(self.root)
+        self.diagnostics_window.title("Diagnostics - External Commands")
+        self.diagnostics_window.protocol("WM_DELETE_WINDOW", lambda: self._close_window("diagnostics"))
+        self.diagnostics_text = tk.Text(self.diagnostics_window, width=110, height=14, wrap="none", font=("monospace", 9), bg="#f0f0f0")
+        self.diagnostics_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        reset_button = ttk.Button(self.diagnostics_window, text="Reset Counters", command=lambda: (command_stats.RECORDER.reset(), self.refresh_diagnostics(reschedule=False)))
+        reset_button.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self, reschedule=True):
+        if not (self.diagnostics_window and self.diagnostics_window.winfo_exists()): return
+        if self.client:
+            try:
+                table = "Source commands:\n" + json.dumps(self.client.get_diagnostics(), indent=2)
+            except api_client.ApiError as e:
+                table = str(e)
+        else:
+            table = command_stats.RECORDER.format_table()
+        self.diagnostics_text.config(state=tk.NORMAL)
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert("1.0", table)
+        self.diagnostics_text.config(state=tk.DISABLED)
+        if reschedule: self.diagnostics_after_id = self.root.after(STATS_INTERVAL_MS, self.refresh_diagnostics)
+
+    def _close_window(self, name):
+        """Destroys the diagnostics or processes window and cancels its refresh, so reopening it starts one loop."""
+        after_id = getattr(self, f"{name}_after_id")
+        if after_id: self.root.after_cancel(after_id)
+        setattr(self, f"{name}_after_id", None)
+        getattr(self, f"{name}_window").destroy()
+
+    def show_processes(self):
+        if self.processes_window and self.processes_window.winfo_exists():
+            self.processes_window.lift()
+            return
+        if self.client:
+            messagebox.showinfo("Processes", "The process view needs local access to the GPUs and /proc.")
+            return
+        self.processes_window = tk.Toplevel(self.root)
+        self.processes_window.title("GPU Processes")
+        self.processes_window.protocol("WM_DELETE_WINDOW", lambda: self._close_window("processes"))
+        # nvidia-smi only reports SM % through pmon, which blocks for about a second: leave the column out there.
+        self.process_columns = processes.get_process_columns(processes.has_process_utilization())
+        columns = [key for key, _, _ in self.process_columns]
+        self.processes_tree = ttk.Treeview(self.processes_window, columns=columns, show="headings", height=12)
+        for key, header, width in self.process_columns:
+            self.processes_tree.heading(key, text=header, command=lambda key=key: self.sort_processes_by(key))
+            self.processes_tree.column(key, width=width * 9, anchor="w", stretch=key == "command")
+        self.processes_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.refresh_processes()
+
+    def sort_processes_by(self, key):
+        current, reverse = self.process_sort
+        # Clicking the sorted column again flips the order; numbers start largest first.
+        self.process_sort = (key, not reverse if key == current else key in ("used_memory", "sm"))
+        self._reorder_processes()
+
+    def refresh_processes(self):
+        if not (self.processes_window and self.processes_window.winfo_exists()): return
+        if not self.processes_pending:
+            self.processes_pending = True
+            self.worker.submit(self.process_monitor.read, callback=self._on_processes_ready, error_callback=self._on_processes_failed)
+        self.processes_after_id = self.root.after(max(self.scheduler.interval_ms, STATS_INTERVAL_MS), self.refresh_processes)
+
+    def _on_processes_failed(self, error):
+        self.processes_pending = False
+
+    def _on_processes_ready(self, gpu_processes):
+        self.processes_pending = False
+        if not (self.processes_window and self.processes_window.winfo_exists()): return
+        tree = self.processes_tree
+        rows = {f"{process['gpu']}:{process['pid']}": process for process in gpu_processes}
+        for iid in set(tree.get_children()) - set(rows):
+            tree.delete(iid)
+        for iid, process in rows.items():
+            values = [process.get(key, "N/A") for key, _, _ in self.process_columns]
+            if not tree.exists(iid):
+                tree.insert("", tk.END, iid=iid, values=values)
+            elif list(tree.item(iid, "values")) != [str(value) for value in values]:
+                tree.item(iid, values=values)
+        self.process_rows = rows
+        self._reorder_processes()
+
+    def _reorder_processes(self):
+        key, reverse = self.process_sort
+        ordered = processes.sort_processes(list(getattr(self, "process_rows", {}).values()), key, reverse)
+        for position, process in enumerate(ordered):
+            self.processes_tree.move(f"{process['gpu']}:{process['pid']}", "", position)
+
+    def toggle_monitoring(self):
+        self.monitoring_paused = not self.monitoring_paused
+        self.pause_button.config(text="Resume Monitor" if self.monitoring_paused else "Pause Monitor")
+        logging.info(f"Monitoring {'paused' if self.monitoring_paused else 'resumed'}.")
+        if not self.monitoring_paused: self.update_stats()
+
+    def on_close(self):
+        if self.fan_curve_driver:
+            # Hand the fans back to the driver so they do not stay at the curve's last speed.
+            gpu.set_fan_control_state(False, list(self.fan_curve_driver.controllers))
+        if self.use_helper.get():
+            gpu.stop_privileged_helper()
+        if self.sampler: self.sampler.stop()
+        if self.recorder: self.recorder.close()
+        self.worker.shutdown()
+        self.root.destroy()
+
+    def selected_gpu_indices(self):
+        selection = self.device_combobox.get()
+        if selection == ALL_DEVICES:
+            return sorted(self.device_names) or [0]
+        return [int(selection.split(":")[0])]
+
+    def update_device_combobox(self, devices):
+        names = {stats["index"]: stats.get("name", "N/A") for stats in devices if isinstance(stats.get("index"), int)}
+        if names == self.device_names: return
+        self.device_names = names
+        self.device_combobox['values'] = [ALL_DEVICES] + [f"{index}: {name}" for index, name in sorted(names.items())]
+
+    def get_current_stats(self):
+        if self.client: return self.client.get_stats()
+        # Fall back to a one-off query until the sampler has produced fresh lines.
+        devices = self.sampler.get_latest_all(max_age=self.sampler.interval_ms / 1000 * 2)
+        return devices if devices is not None else gpu.get_all_gpu_stats()
+
+    def update_stats_display(self):
+        # Skip the tick if the previous sample is still in flight instead of queueing up.
+        if self.stats_pending: return
+        self.stats_pending = True
+        self.worker.submit(self.get_current_stats, callback=self._on_stats_ready, error_callback=self._on_stats_failed)
+
+    def _on_stats_ready(self, stats):
+        self.stats_pending = False
+        if self.fan_curve_driver:
+            self.fan_curve_driver.on_sample(stats)
+            self.fan_curve_label.config(text=f"Fan curve active ({self.fan_curve_driver.writes} fan writes)")
+        # While paused, samples only keep the fan curve going.
+        if self.monitoring_paused: return
+        self.history.record(stats)
+        interval = self.scheduler.observe(stats)
+        # A transient shortens the interval: do not wait out the long tick already scheduled.
+        if interval < self.stats_interval and self.stats_after_id:
+            self.schedule_stats(interval)
+        if self.recorder: self.recorder.record(stats)
+        self.render_stats(stats)
+        self.update_graphs(stats)
+
+    def update_graphs(self, devices):
+        gpu_index = self.selected_gpu_indices()[0]
+        if gpu_index != self.graph_gpu_index:
+            # Device switched: rebuild each graph once from the stored history.
+            self.graph_gpu_index = gpu_index
+            for key, graph in self.graphs.items():
+                points = self.history.get(gpu_index, key).raw_values.values()
+                graph.set_values(points[-graph.capacity:])
+            return
+        stats = next((device for device in devices if device.get("index") == gpu_index), {})
+        for key, graph in self.graphs.items():
+            value = stats.get(key)
+            graph.add_point(value if isinstance(value, (int, float)) else None)
+
+    def _on_stats_failed(self, error):
+        self.stats_pending = False
+
+    def render_stats(self, devices):
+        self.update_device_combobox(devices)
+        # Only changed cells are written, in one idle callback.
+        self.stats_table.show(devices, self.selected_gpu_indices())
+
+    def update_stats(self):
+        if self.stats_after_id:
+            self.root.after_cancel(self.stats_after_id)
+            self.stats_after_id = None
+        # A fan curve keeps the ticks going while the monitor is paused; manual fan control is still on.
+        if self.monitoring_paused and not self.fan_curve_driver: return
+        self.update_stats_display()
+        self.schedule_stats(self.scheduler.interval_ms)
+
+    def schedule_stats(self, interval):
+        """(Re)schedules the next stats tick and moves the sampler to the same pace (see StreamingSampler for restarts)."""
+        if self.stats_after_id: self.root.after_cancel(self.stats_after_id)
+        if self.sampler: self.sampler.set_interval(interval)
+        self.stats_interval = interval
+        self.stats_after_id = self.root.after(interval, self.update_stats)
+
+    def boost_sampling(self):
+        """Samples fast for a few seconds, e.g. while new settings take effect."""
+        self.scheduler.boost()
+        if not self.monitoring_paused: self.update_stats()
+
+    def _on_visibility_changed(self, event):
+        # Focus events also fire when focus moves between widgets; check once it has settled.
+        self.root.after_idle(self._update_background_state)
+
+    def _update_background_state(self):
+        # Iconified or unfocused: slow down, unless a fan curve depends on the samples.
+        hidden = self.root.state() == "iconic" or self.root.focus_displayof() is None
+        background = hidden and self.fan_curve_driver is None
+        if background == self.scheduler.background: return
+        self.scheduler.set_background(background)
+        logging.debug(f"Window {'hidden' if background else 'visible'}, sampling every {self.scheduler.interval_ms} ms.")
+        if not background and not self.monitoring_paused: self.update_stats()
+
+    def load_and_initialize_profiles(self):
+        self.profiles = profiles.load_profiles()
+        self.update_profile_combobox()
+        self.profile_combobox.set("Default")
+        self.set_sliders_from_profile("Default")
+
+    def update_profile_combobox(self):
+        self.profile_combobox['values'] = sorted(self.profiles.keys())
+
+    def set_sliders_from_profile(self, profile_name):
+        if profile_name not in self.profiles: return
+        settings = self.profiles[profile_name]
+        self.fan_speed.set(settings.get("fan_speed", 30))
+        self.core_clock.set(settings.get("core_clock", 0))
+        self.mem_clock.set(settings.get("mem_clock", 0))
+        self.fan_speed_label.config(text=f"{self.fan_speed.get()}%")
+        self.core_clock_label.config(text=f"+{self.core_clock.get()} MHz")
+        self.mem_clock_label.config(text=f"+{self.mem_clock.get()} MHz")
+
+    def save_profile(self):
+        profile_name = self.profile_name_entry.get().strip()
+        if not profile_name:
+            messagebox.showwarning("Invalid Name", "Profile name cannot be empty.")
+            return
+        if profile_name == "Default":
+            messagebox.showwarning("Invalid Name", "Cannot overwrite the Default profile.")
+            return
+        new_profile = {
+            "fan_speed": self.fan_speed.get(), "core_clock": self.core_clock.get(), "mem_clock": self.mem_clock.get()
+        }
+        # Sliders don't edit fan curves, so keep the one of an overwritten profile.
+        if "fan_curve" in self.profiles.get(profile_name, {}):
+            new_profile["fan_curve"] = self.profiles[profile_name]["fan_curve"]
+        self.profiles[profile_name] = new_profile
+        if profiles.save_profiles(self.profiles):
+            self.update_profile_combobox()
+            self.profile_combobox.set(profile_name)
+            self.profile_name_entry.delete(0, tk.END)
+            messagebox.showinfo("Success", f"Profile '{profile_name}' saved.")
+        else:
+            messagebox.showerror("Error", "Failed to save profiles to file.")
+
+    def load_profile(self, event=None):
+        profile_name = self.profile_combobox.get()
+        logging.info(f"Loading and applying profile '{profile_name}'...")
+        self.set_sliders_from_profile(profile_name)
+        self.set_fan_curve(profiles.get_fan_curve(self.profiles.get(profile_name, {})))
+        self.apply_settings(profile_name=profile_name)
+
+    def set_fan_curve(self, curve):
+        # A profile's fan curve drives the fan from the sampling tick; the slider value is the starting point.
+        if curve is None or self.client:
+            self.fan_curve_driver = None
+            self.fan_curve_label.config(text="")
+            return
+        self.fan_curve_driver = FanCurveDriver(curve, self.selected_gpu_indices(), self._write_fan_speed)
+        self.fan_curve_label.config(text="Fan curve active")
+        if self.monitoring_paused and not self.stats_after_id: self.update_stats()
+
+    def _write_fan_speed(self, speed, gpu_indices, done):
+        # The controller only takes the speed as written once the apply has succeeded.
+        self.worker.submit(gpu.set_fan_speed, speed, gpu_indices,
+                           callback=lambda result: done(result.returncode == 0), error_callback=lambda error: done(False))
+
+    def delete_profile(self):
+        profile_name = self.profile_combobox.get()
+        if profile_name == "Default":
+            messagebox.showwarning("Cannot Delete", "The Default profile cannot be deleted.")
+            return
+        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete the profile '{profile_name}'?"):
+            if profile_name in self.profiles:
+                del self.profiles[profile_name]
+                if profiles.save_profiles(self.profiles):
+                    self.update_profile_combobox()
+                    self.profile_combobox.set("Default")
+                    self.set_sliders_from_profile("Default")
+                    messagebox.showinfo("Success", f"Profile '{profile_name}' deleted.")
+                else:
+                    messagebox.showerror("Error", "Failed to save changes after deleting profile.")
@@ -0,0 +1,152 @@
+import time
+from array import array
+
+# Metrics kept in the history, as keys of the stats dictionaries.
+HISTORY_METRICS = ["temperature", "utilization", "core_clock", "memory_clock", "power_usage", "fan_speed"]
+
+# Downsampled tiers as (bucket length in seconds, number of buckets). Together
+# with the raw tier this covers about a week in constant memory.
+DEFAULT_TIERS = [(10, 1080), (60, 1440), (600, 1008)]
+DEFAULT_RAW_CAPACITY = 600
+
+class RingBuffer:
+    """Fixed-capacity ring buffer of floats backed by array('d')."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value: float):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def last(self):
+        """Returns the most recent value, or None if the buffer is empty."""
+        return self._data[self._next - 1] if self._size else None
+
+    def values(self):
+        """Returns the stored values, oldest first."""
+        if self._size < self.capacity:
+            return self._data[:self._size].tolist()
+        return (self._data[self._next:] + self._data[:self._next]).tolist()
+
+class DownsampledTier:
+    """Fixed number of time buckets, each keeping the min, max and mean of its samples."""
+
+    def __init__(self, bucket_seconds: float, capacity: int):
+        self.bucket_seconds = bucket_seconds
+        self.times = RingBuffer(capacity)
+        self.mins = RingBuffer(capacity)
+        self.maxs = RingBuffer(capacity)
+        self.means = RingBuffer(capacity)
+        self._bucket_start = None
+        self._sum = self._count = 0
+        self._min = self._max = 0.0
+
+    def add(self, timestamp: float, value: float):
+        bucket_start = timestamp - timestamp % self.bucket_seconds
+        if self._bucket_start is not None and bucket_start != self._bucket_start:
+            self._flush()
+        if self._count == 0:
+            self._bucket_start = bucket_start
+            self._min = self._max = value
+        self._sum += value
+        self._count += 1
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+
+    def _flush(self):
+        if self._count:
+            self.times.append(self._bucket_start)
+            self.mins.append(self._min)
+            self.maxs.append(self._max)
+            self.means.append(self._sum / self._count)
+        self._sum = self._count = 0
+
+    def covered_seconds(self):
+        return self.times.capacity * self.bucket_seconds
+
+    def points(self, since: float):
+        """Returns (time, mean, min, max) for every closed bucket starting at or after since."""
+        points = [
+            point for point in zip(self.times.values(), self.means.values(), self.mins.values(), self.maxs.values())
+            if point[0] >= since
+        ]
+        if self._count and self._bucket_start >= since:
+            points.append((self._bucket_start, self._sum / self._count, self._min, self._max))
+        return points
+
+class MetricHistory:
+    """
+    History of one metric: the last raw samples plus min/max/mean buckets at
+    coarser resolutions, so memory stays constant however long the session runs.
+    """
+
+    def __init__(self, raw_capacity: int = DEFAULT_RAW_CAPACITY, tiers=DEFAULT_TIERS):
+        self.raw_times = RingBuffer(raw_capacity)
+        self.raw_values = RingBuffer(raw_capacity)
+        self.tiers = [DownsampledTier(seconds, capacity) for seconds, capacity in tiers]
+
+    def add(self, timestamp: float, value: float):
+        self.raw_times.append(timestamp)
+        self.raw_values.append(value)
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def latest(self):
+        return self.raw_values.last()
+
+    def points(self, seconds: float, now: float = None):
+        """
+        Returns (time, mean, min, max) points for the last `seconds`, using the
+        finest resolution that still covers the whole range.
+        """
+        now = time.time() if now is None else now
+        since = now - seconds
+        raw_times = self.raw_times.values()
+        if not raw_times or raw_times[0] <= since or len(raw_times) < self.raw_times.capacity:
+            return [(t, v, v, v) for t, v in zip(raw_times, self.raw_values.values()) if t >= since]
+        for tier in self.tiers:
+            if tier.covered_seconds() >= seconds or tier is self.tiers[-1]:
+                return tier.points(since)
+
+class TelemetryHistory:
+    """Keeps a MetricHistory per GPU and metric, fed with the sampler's stats dictionaries."""
+
+    def __init__(self, metrics=HISTORY_METRICS, raw_capacity: int = DEFAULT_RAW_CAPACITY, tiers=DEFAULT_TIERS):
+        self.metrics = list(metrics)
+        self.raw_capacity = raw_capacity
+        self.tiers = tiers
+        self._series = {}
+
+    def record(self, devices, timestamp: float = None):
+        """Adds one sample per device. Values that are not numbers (e.g. "N/A") are skipped."""
+        timestamp = time.time() if timestamp is None else timestamp
+        for stats in devices:
+            index = stats.get("index", 0)
+            for metric in self.metrics:
+                value = stats.get(metric)
+                if isinstance(value, (int, float)):
+                    self.get(index, metric).add(timestamp, float(value))
+
+    def get(self, gpu_index: int, metric: str):
+        """Returns the MetricHistory of one GPU metric, creating it on first use."""
+        key = (gpu_index, metric)
+        if key not in self._series:
+            self._series[key] = MetricHistory(self.raw_capacity, self.tiers)
+        return self._series[key]
+
+    def gpu_indices(self):
+        return sorted({index for index, _ in self._series})
+
+    def points(self, gpu_index: int, metric: str, seconds: float, now: float = None):
+        """Returns (time, mean, min, max) points of one GPU metric for the last `seconds`."""
+        if (gpu_index, metric) not in self._series:
+            return []
+        return self._series[(gpu_index, metric)].points(seconds, now)
@@ -0,0 +1,151 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+def get_log_path():
+    """Default log file: nvidiaoc.log in $XDG_STATE_HOME/nvidiaoc (~/.local/state/nvidiaoc)."""
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, "nvidiaoc", "nvidiaoc.log")
+
+LOG_FILE = get_log_path()
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_BYTES = 1024 * 1024
+MAX_AGE = 24 * 3600 # seconds before the log is rotated even if it is small
+BACKUP_COUNT = 3
+REPEAT_INTERVAL = 60.0 # identical messages are logged at most once per interval
+QUEUE_SIZE = 10000
+
+def read_start_time(filename):
+    """
+    Time the log file was started, from the timestamp of its first record.
+    The mtime cannot be used: every write moves it. None if the file is
+    missing or empty; its mtime if the first line has no timestamp.
+    """
+    try:
+        with open(filename, encoding="utf-8", errors="replace") as f:
+            first_line = f.readline()
+        if not first_line:
+            return None
+        try:
+            return time.mktime(time.strptime(first_line[:19], "%Y-%m-%d %H:%M:%S"))
+        except ValueError:
+            return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates the log when it reaches max_bytes or gets older than max_age seconds."""
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, max_age=MAX_AGE, backup_count=BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_age = max_age
+        started = read_start_time(filename)
+        self.opened_at = started if started is not None else time.time()
+
+    def shouldRollover(self, record):
+        if self.max_age and record.created - self.opened_at >= self.max_age:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.opened_at = time.time()
+
+class RepeatFilter(logging.Filter):
+    """
+    Drops a message that is identical (same level and text) to one logged less
+    than `interval` seconds ago. The next copy that gets through carries the
+    number of copies that were dropped.
+    """
+
+    def __init__(self, interval=REPEAT_INTERVAL, max_keys=512):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self._seen = OrderedDict() # (level, message) -> [last logged time, dropped copies]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.levelno, record.getMessage())
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry and record.created - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            dropped = entry[1] if entry else 0
+            self._seen[key] = [record.created, 0]
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        if dropped:
+            record.msg = f"{record.getMessage()} (repeated {dropped} more time(s) in the last {self.interval:g} s)"
+            record.args = None
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the listener falls behind."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+_listener = None
+
+def setup_logging(log_file=LOG_FILE, level=logging.INFO, max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                  backup_count=BACKUP_COUNT, repeat_interval=REPEAT_INTERVAL):
+    """
+    Routes the root logger through a queue to a listener thread writing to a
+    rotating log file and to stderr, so logging calls never wait for disk I/O.
+    Safe to call again; the previous pipeline is stopped first.
+    """
+    global _listener
+    stop_logging()
+
+    handlers = [logging.StreamHandler()]
+    file_error = None
+    try:
+        if os.path.dirname(log_file):
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        handlers.append(SizeAndTimeRotatingFileHandler(log_file, max_bytes, max_age, backup_count))
+    except OSError as e:
+        file_error = e
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    if repeat_interval:
+        queue_handler.addFilter(RepeatFilter(repeat_interval))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if file_error is not None:
+        # Goes out through the stderr handler, like every other message.
+        logging.error(f"Cannot open log file '{log_file}': {file_error}")
+    return _listener
+
+def stop_logging():
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(stop_logging)
@@ -2,30 +2,18 @@ import os
 import sys
 import subprocess
 import logging
-from datetime import datetime
-import tkinter as tk
-from tkinter import ttk, font, messagebox
 import argparse
+import atexit
+import json
 import shutil
 
+# Only what the command-line path needs is imported here. The GUI (tkinter),
+# the daemon (http.server) and the recorder are imported when they are used,
+# so scripted calls such as `--fan 70` start quickly.
 import gpu
+import logsetup
 import profiles
-
-# --- Global Configuration ---
-LOG_FILE = "nvidiaoc.log"
-
-# --- Logger Setup ---
-if os.path.exists(LOG_FILE):
-    os.remove(LOG_FILE)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+import command_stats
 
 # --- Dependency Checkers ---
 def check_tkinter():
@@ -71,9 +59,19 @@ def get_linux_distribution():
     except FileNotFoundError:
         return None
 
+_dependencies_found_on = None # PATH under which xhost was last found
+
 def check_system_dependencies():
-    """Checks for essential system commands like xhost."""
-    if not shutil.which("xhost"):
+    """
+    Checks for essential system commands like xhost. A success is cached
+    until PATH changes; a failure is checked again on the next call, so
+    installing xhost is noticed without a restart.
+    """
+    global _dependencies_found_on
+    search_path = os.environ.get("PATH", os.defpath)
+    if _dependencies_found_on == search_path:
+        return True
+    if not shutil.which("xhost", path=search_path):
         logging.error("'xhost' command not found. This is required for GUI operations that need admin rights.")
         print("\n--- Missing Dependency: xhost ---")
         print("The 'xhost' command is required to grant permissions for changing GPU settings.")
@@ -84,249 +82,39 @@ def check_system_dependencies():
         print("After installation, please restart the application.")
         return False
     logging.info("System dependency 'xhost' found.")
+    _dependencies_found_on = search_path
     return True
 
-# --- Main Application Class (Simplified) ---
-class App:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("NVIDIA GPU Control & Monitor")
-        self.root.geometry("850x650")
-        self.root.minsize(700, 550)
-
-        self.style = ttk.Style()
-        self.style.theme_use('clam')
-        self.monitoring_paused = False
-        self.profiles = {}
-
-        main_paned_window = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
-        main_paned_window.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        controls_frame = ttk.Frame(main_paned_window, width=400)
-        main_paned_window.add(controls_frame, weight=1)
-        right_panel_frame = ttk.Frame(main_paned_window)
-        main_paned_window.add(right_panel_frame, weight=1)
-
-        self._create_controls_ui(controls_frame)
-        self._create_monitoring_ui(right_panel_frame)
-        self._create_profiles_ui(right_panel_frame)
-        
-        self.load_and_initialize_profiles()
-        
-        logging.info("Application GUI initialized.")
-        self.update_stats()
-
-    def _create_controls_ui(self, parent):
-        frame = ttk.LabelFrame(parent, text="GPU Controls", padding=(10, 10))
-        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        # Fan Speed - Always visible and enabled
-        fan_frame = ttk.Frame(frame)
-        fan_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(fan_frame, text="Fan Speed (%):").pack(side=tk.LEFT, anchor="w")
-        self.fan_speed_label = ttk.Label(fan_frame, text="30%", width=8, anchor="e")
-        self.fan_speed_label.pack(side=tk.RIGHT, padx=5)
-        self.fan_speed = tk.IntVar(value=30)
-        self.fan_slider = ttk.Scale(fan_frame, from_=30, to=100, orient=tk.HORIZONTAL, variable=self.fan_speed, command=lambda v: self.fan_speed_label.config(text=f"{int(float(v))}"))
-        self.fan_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
-
-        # Core Clock
-        core_frame = ttk.Frame(frame)
-        core_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(core_frame, text="Core Clock (MHz):").pack(side=tk.LEFT, anchor="w")
-        self.core_clock_label = ttk.Label(core_frame, text="+0 MHz", width=8, anchor="e")
-        self.core_clock_label.pack(side=tk.RIGHT, padx=5)
-        self.core_clock = tk.IntVar(value=0)
-        core_slider = ttk.Scale(core_frame, from_=0, to=250, orient=tk.HORIZONTAL, variable=self.core_clock, command=lambda v: self.core_clock_label.config(text=f"+{int(float(v))} MHz"))
-        core_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
-
-        # Memory Clock
-        mem_frame = ttk.Frame(frame)
-        mem_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(mem_frame, text="Memory Clock (MHz):").pack(side=tk.LEFT, anchor="w")
-        self.mem_clock_label = ttk.Label(mem_frame, text="+0 MHz", width=8, anchor="e")
-        self.mem_clock_label.pack(side=tk.RIGHT, padx=5)
-        self.mem_clock = tk.IntVar(value=0)
-        mem_slider = ttk.Scale(mem_frame, from_=0, to=1000, orient=tk.HORIZONTAL, variable=self.mem_clock, command=lambda v: self.mem_clock_label.config(text=f"+{int(float(v))} MHz"))
-        mem_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True)
-
-        # Action Buttons
-        buttons_frame = ttk.Frame(frame)
-        buttons_frame.pack(fill=tk.X, pady=20)
-        self.apply_button = ttk.Button(buttons_frame, text="Apply Changes", command=self.apply_settings)
-        self.apply_button.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.reset_button = ttk.Button(buttons_frame, text="Reset to Defaults", command=self.reset_defaults)
-        self.reset_button.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
-
-    def _create_monitoring_ui(self, parent):
-        frame = ttk.LabelFrame(parent, text="Real-Time Monitoring", padding=(10, 10))
-        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        warning_label = ttk.Label(frame, text="Warning: Overclocking can be risky. Proceed with caution.", style="Warning.TLabel")
-        self.style.configure("Warning.TLabel", foreground="red")
-        warning_label.pack(fill=tk.X)
-        mono_font = font.Font(family="monospace", size=10)
-        self.stats_text = tk.Text(frame, height=10, wrap="word", state=tk.DISABLED, font=mono_font, bg="#f0f0f0")
-        self.stats_text.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
-        self.pause_button = ttk.Button(frame, text="Pause Monitor", command=self.toggle_monitoring)
-        self.pause_button.pack(fill=tk.X)
-
-    def _create_profiles_ui(self, parent):
-        frame = ttk.LabelFrame(parent, text="Profiles", padding=(10, 10))
-        frame.pack(fill=tk.X, padx=5, pady=5)
-        load_frame = ttk.Frame(frame)
-        load_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(load_frame, text="Load Profile:").pack(side=tk.LEFT, padx=(0, 5))
-        self.profile_combobox = ttk.Combobox(load_frame, values=["Default"], state="readonly")
-        self.profile_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        self.profile_combobox.bind("<<ComboboxSelected>>", self.load_profile)
-        save_frame = ttk.Frame(frame)
-        save_frame.pack(fill=tk.X, pady=5)
-        self.profile_name_entry = ttk.Entry(save_frame)
-        self.profile_name_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
-        self.save_profile_button = ttk.Button(save_frame, text="Save", command=self.save_profile)
-        self.save_profile_button.pack(side=tk.LEFT)
-        self.delete_profile_button = ttk.Button(frame, text="Delete Selected Profile", command=self.delete_profile)
-        self.delete_profile_button.pack(fill=tk.X, pady=5)
-
-    def set_ui_busy(self, is_busy):
-        state = tk.DISABLED if is_busy else tk.NORMAL
-        for widget in [self.apply_button, self.reset_button, self.save_profile_button, self.delete_profile_button, self.fan_slider, self.profile_combobox]:
-            widget.config(state=state)
-        self.root.config(cursor="watch" if is_busy else "")
-
-    def apply_settings(self, profile_name=None):
-        logging.info(f"Applying settings from {'sliders' if not profile_name else f'profile: {profile_name}'}...")
-        self.set_ui_busy(True)
-        self.root.after(100, self._execute_apply_settings)
-
-    def _execute_apply_settings(self):
-        try:
-            gpu.apply_all_settings(self.fan_speed.get(), self.core_clock.get(), self.mem_clock.get())
-            logging.info("Settings applied. Verifying values in 2 seconds...")
-            self.root.after(2000, self.verify_settings)
-        except Exception as e:
-            logging.error(f"An error occurred while applying settings: {e}")
-        finally:
-            self.set_ui_busy(False)
-
-    def reset_defaults(self):
-        logging.info("Resetting to default settings...")
-        self.set_ui_busy(True)
-        self.root.after(100, self._execute_reset_defaults)
-
-    def _execute_reset_defaults(self):
-        try:
-            gpu.reset_all_settings()
-            self.set_sliders_from_profile("Default")
-            logging.info("Defaults restored. Verifying values in 2 seconds...")
-            self.root.after(2000, self.verify_settings)
-        except Exception as e:
-            logging.error(f"An error occurred while resetting defaults: {e}")
-        finally:
-            self.set_ui_busy(False)
-
-    def verify_settings(self):
-        logging.info("--- Verification Check ---")
-        stats = gpu.get_all_stats()
-        logging.info(f"Post-change Target Fan Speed: {stats.get('fan_speed', 'N/A')}%")
-        logging.info("--- End Verification ---")
-        if self.monitoring_paused: self.update_stats_display()
-        
-    def toggle_monitoring(self):
-        self.monitoring_paused = not self.monitoring_paused
-        self.pause_button.config(text="Resume Monitor" if self.monitoring_paused else "Pause Monitor")
-        logging.info(f"Monitoring {'paused' if self.monitoring_paused else 'resumed'}.")
-        if not self.monitoring_paused: self.update_stats()
-
-    def update_stats_display(self):
-        stats = gpu.get_all_stats()
-        stats_str = (
-            f"{'GPU Name':<18}: {stats.get('name', 'N/A')}\n"
-            f"{'Temperature':<18}: {stats.get('temperature', 'N/A')} °C\n"
-            f"{'GPU Usage':<18}: {stats.get('utilization', 'N/A')} %\n"
-            f"{'Core Clock':<18}: {stats.get('core_clock', 'N/A')} MHz\n"
-            f"{'Memory Clock':<18}: {stats.get('memory_clock', 'N/A')} MHz\n"
-            f"{'Power Usage':<18}: {stats.get('power_usage', 'N/A')} W\n"
-            f"{'Target Fan Speed':<18}: {stats.get('fan_speed', 'N/A')} %"
-        )
-        self.stats_text.config(state=tk.NORMAL)
-        self.stats_text.delete("1.0", tk.END)
-        self.stats_text.insert("1.0", stats_str)
-        self.stats_text.config(state=tk.DISABLED)
-
-    def update_stats(self):
-        if self.monitoring_paused: return
-        self.update_stats_display()
-        self.root.after(2000, self.update_stats)
-
-    def load_and_initialize_profiles(self):
-        self.profiles = profiles.load_profiles()
-        self.update_profile_combobox()
-        self.profile_combobox.set("Default")
-        self.set_sliders_from_profile("Default")
-
-    def update_profile_combobox(self):
-        self.profile_combobox['values'] = sorted(self.profiles.keys())
-
-    def set_sliders_from_profile(self, profile_name):
-        if profile_name not in self.profiles: return
-        settings = self.profiles[profile_name]
-        self.fan_speed.set(settings.get("fan_speed", 30))
-        self.core_clock.set(settings.get("core_clock", 0))
-        self.mem_clock.set(settings.get("mem_clock", 0))
-        self.fan_speed_label.config(text=f"{self.fan_speed.get()}%")
-        self.core_clock_label.config(text=f"+{self.core_clock.get()} MHz")
-        self.mem_clock_label.config(text=f"+{self.mem_clock.get()} MHz")
-
-    def save_profile(self):
-        profile_name = self.profile_name_entry.get().strip()
-        if not profile_name:
-            messagebox.showwarning("Invalid Name", "Profile name cannot be empty.")
-            return
-        if profile_name == "Default":
-            messagebox.showwarning("Invalid Name", "Cannot overwrite the Default profile.")
-            return
-        new_profile = {
-            "fan_speed": self.fan_speed.get(), "core_clock": self.core_clock.get(), "mem_clock": self.mem_clock.get()
-        }
-        self.profiles[profile_name] = new_profile
-        if profiles.save_profiles(self.profiles):
-            self.update_profile_combobox()
-            self.profile_combobox.set(profile_name)
-            self.profile_name_entry.delete(0, tk.END)
-            messagebox.showinfo("Success", f"Profile '{profile_name}' saved.")
-        else:
-            messagebox.showerror("Error", "Failed to save profiles to file.")
-
-    def load_profile(self, event=None):
-        profile_name = self.profile_combobox.get()
-        logging.info(f"Loading and applying profile '{profile_name}'...")
-        self.set_sliders_from_profile(profile_name)
-        self.apply_settings(profile_name=profile_name)
-
-    def delete_profile(self):
-        profile_name = self.profile_combobox.get()
-        if profile_name == "Default":
-            messagebox.showwarning("Cannot Delete", "The Default profile cannot be deleted.")
-            return
-        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete the profile '{profile_name}'?"):
-            if profile_name in self.profiles:
-                del self.profiles[profile_name]
-                if profiles.save_profiles(self.profiles):
-                    self.update_profile_combobox()
-                    self.profile_combobox.set("Default")
-                    self.set_sliders_from_profile("Default")
-                    messagebox.showinfo("Success", f"Profile '{profile_name}' deleted.")
-                else:
-                    messagebox.showerror("Error", "Failed to save changes after deleting profile.")
-
 # --- CLI and Main Execution ---
+def parse_gpu_list(value):
+    """Parses a comma-separated list of GPU indices such as "0,2"."""
+    try:
+        return sorted({int(index) for index in value.split(",") if index.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid GPU list '{value}'. Use comma-separated indices, e.g. 0,2.")
+
+def resolve_gpu_indices(args):
+    """Returns the GPU indices selected by --gpu/--all, defaulting to GPU 0."""
+    if args.all:
+        indices = gpu.get_gpu_indices()
+        if not indices:
+            logging.error("Could not list GPUs with nvidia-smi.")
+            sys.exit(1)
+        return indices
+    return args.gpu or [0]
+
 def cli_main(args):
     logging.info("Running in Command-Line Interface mode.")
     if not check_system_dependencies(): sys.exit(1)
+    if args.stop_helper:
+        gpu.stop_privileged_helper()
+        return
+    if args.start_helper and not gpu.start_privileged_helper(args.helper_idle_timeout):
+        sys.exit(1)
+    gpu_indices = resolve_gpu_indices(args)
     if args.reset:
-        logging.info("Resetting GPU settings to defaults.")
-        gpu.reset_all_settings()
+        logging.info(f"Resetting GPU settings to defaults on GPUs {gpu_indices}.")
+        gpu.reset_all_settings(gpu_indices, force=args.force)
         logging.info("GPU settings have been reset.")
         return
     if args.fan is not None or args.core is not None or args.mem is not None:
@@ -336,30 +124,177 @@ def cli_main(args):
         fan = args.fan if args.fan is not None else 30 # A safe default
         core = args.core if args.core is not None else 0
         mem = args.mem if args.mem is not None else 0
-        gpu.apply_all_settings(fan, core, mem)
+        gpu.apply_all_settings(fan, core, mem, gpu_indices, force=args.force)
     logging.info("CLI operations complete.")
 
 def main():
-    logging.info("Starting NVIDIA GPU Control & Monitor.")
     parser = argparse.ArgumentParser(description="Control and monitor NVIDIA GPUs.")
     parser.add_argument("--fan", type=int, help="Set fan speed in percent (e.g., 75).")
     parser.add_argument("--core", type=int, help="Set core clock offset in MHz (e.g., 150).")
     parser.add_argument("--mem", type=int, help="Set memory clock offset in MHz (e.g., 750).")
     parser.add_argument("--reset", action="store_true", help="Reset all settings to default.")
+    parser.add_argument("--force", action="store_true", help="Write all settings even if they are already active.")
+    parser.add_argument("--start-helper", action="store_true", help="Start the persistent privileged helper so later applies need no password prompt.")
+    parser.add_argument("--stop-helper", action="store_true", help="Stop the persistent privileged helper.")
+    parser.add_argument("--helper-idle-timeout", type=float, help="Stop the helper after this many idle seconds.")
+    parser.add_argument("--daemon", action="store_true", help="Run headless and serve OpenMetrics on /metrics.")
+    parser.add_argument("--listen", help="HOST:PORT or unix:/path for --daemon (default 127.0.0.1:9835).")
+    parser.add_argument("--fan-curve", metavar="PROFILE", help="With --daemon, drive the fans from the fan curve of this profile.")
+    parser.add_argument("--stats", action="store_true", help="Print counters and latencies of the external commands run, on exit.")
+    parser.add_argument("--trace", metavar="FILE", help="Append one JSON line per external command to FILE.")
+    parser.add_argument("--connect", metavar="ADDRESS", help="Run the GUI as a client of a running daemon (HOST:PORT or unix:/path).")
+    parser.add_argument("--record", metavar="FILE", help="Record the sampled telemetry to FILE (GUI or --daemon).")
+    parser.add_argument("--record-max-mb", type=float, default=64.0, help="Start a new recording segment after this many MiB (default 64).")
+    parser.add_argument("--record-max-segments", type=int, default=16, help="Delete the oldest recording segment beyond this many (default 16).")
+    parser.add_argument("--record-overwrite", action="store_true", help="Replace an existing recording at --record instead of refusing it.")
+    parser.add_argument("--replay", metavar="FILE", help="Show a recording in the GUI instead of live data.")
+    parser.add_argument("--rules", metavar="FILE", help="Watchdog rules (JSON) evaluated by --daemon, or checked against the recording of --replay.")
+    parser.add_argument("--summary", metavar="FILE", help="Print min/max/mean/percentiles per metric of a recording.")
+    parser.add_argument("--watch", action="store_true", help="Stream stats to stdout, one line per GPU and sample.")
+    parser.add_argument("--fields", help="With --watch, comma-separated stats to print (e.g. temperature,power_usage). Default: all.")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Output format of --watch (default jsonl).")
+    parser.add_argument("--count", type=int, help="With --watch, stop after this many samples.")
+    parser.add_argument("--processes", action="store_true", help="List the compute processes on the GPUs (PID, user, memory, SM %%, command).")
+    parser.add_argument("--sort", choices=["used_memory", "sm", "pid", "gpu", "user", "command"], default="used_memory", help="Sort column of --processes (default used_memory).")
+    parser.add_argument("--autotune", metavar="PROFILE", help="Search the highest stable clock offsets and save them as PROFILE.")
+    parser.add_argument("--probe", metavar="COMMAND", help="Benchmark run at each --autotune step; exit status 0 means stable, a number on the last line is the score.")
+    parser.add_argument("--simulate", action="store_true", help="Run --autotune against a simulated GPU instead of the hardware.")
+    parser.add_argument("--strategy", choices=["binary", "step"], default="binary", help="Search strategy of --autotune (default binary).")
+    parser.add_argument("--max-core", type=int, default=300, help="Highest core offset --autotune tries, in MHz (default 300).")
+    parser.add_argument("--max-mem", type=int, default=1500, help="Highest memory offset --autotune tries, in MHz (default 1500).")
+    parser.add_argument("--temp-limit", type=int, default=83, help="With --autotune, a step fails at this temperature in °C (default 83).")
+    parser.add_argument("--auto-profiles", metavar="FILE", help="Apply profiles automatically while the workloads listed in FILE (JSON) are running.")
+    parser.add_argument("--interval", type=int, default=1000, help="Sampling interval in milliseconds for --daemon and --watch (default 1000).")
+    parser.add_argument("--log-file", default=logsetup.LOG_FILE, help=f"Log file, rotated by size and age (default {logsetup.LOG_FILE}).")
+    parser.add_argument("--verbose", action="store_true", help="Also log every external command that is run.")
+    device_group = parser.add_mutually_exclusive_group()
+    device_group.add_argument("--gpu", type=parse_gpu_list, help="Comma-separated GPU indices to act on (e.g., 0,2). Defaults to 0.")
+    device_group.add_argument("--all", action="store_true", help="Act on all GPUs.")
     args = parser.parse_args()
+    if args.rules and not (args.daemon or args.replay):
+        parser.error("--rules needs --daemon (to evaluate them live) or --replay (to check a recording).")
 
-    is_cli_mode = any(arg is not None for arg in [args.fan, args.core, args.mem]) or args.reset
+    logsetup.setup_logging(args.log_file, logging.DEBUG if args.verbose else logging.INFO)
+    logging.info("Starting NVIDIA GPU Control & Monitor.")
+    if args.trace:
+        command_stats.RECORDER.enable_trace(args.trace)
+    if args.stats:
+        atexit.register(lambda: print(command_stats.RECORDER.format_table()))
+
+    if args.processes:
+        import processes
+        gpu_processes = processes.ProcessMonitor().read(with_sm=True)
+        if args.gpu or args.all:
+            wanted = set(resolve_gpu_indices(args))
+            gpu_processes = [process for process in gpu_processes if process["gpu"] in wanted]
+        print(processes.format_processes(processes.sort_processes(gpu_processes, args.sort)))
+        sys.exit(0)
 
-    if not is_cli_mode:
-        if not check_tkinter() or not check_system_dependencies():
-            logging.error("Cannot start GUI due to missing dependencies. Exiting.")
+    if args.watch:
+        import watch
+        try:
+            fields = watch.parse_fields(args.fields) if args.fields else None
+        except ValueError as e:
+            parser.error(str(e))
+        gpu_indices = resolve_gpu_indices(args) if args.gpu or args.all else None
+        sys.exit(watch.run_watch(fields, args.interval, args.format, args.count, gpu_indices))
+
+    if args.autotune:
+        if not args.simulate and not args.probe:
+            parser.error("--autotune needs --probe COMMAND (or --simulate).")
+        if not args.simulate and not check_system_dependencies():
             sys.exit(1)
-        root = tk.Tk()
-        app = App(root)
-        root.mainloop()
-    else:
+        import autotune
+        sys.exit(autotune.run_autotune(
+            args.autotune, args.probe, args.simulate, resolve_gpu_indices(args), args.fan if args.fan is not None else 70,
+            args.strategy, args.max_core, args.max_mem, args.temp_limit,
+        ))
+
+    if args.auto_profiles:
+        if not check_system_dependencies(): sys.exit(1)
+        import workload
+        sys.exit(workload.run_auto_profiles(args.auto_profiles, resolve_gpu_indices(args), args.interval))
+
+    is_cli_mode = any(arg is not None for arg in [args.fan, args.core, args.mem]) or args.reset or args.start_helper or args.stop_helper
+    if is_cli_mode and not args.daemon:
         cli_main(args)
         sys.exit(0)
 
+    import recorder
+    if args.summary:
+        try:
+            recording = recorder.Recording(args.summary)
+        except (recorder.RecordingError, OSError, ValueError) as e:
+            logging.error(f"Cannot read recording: {e}")
+            sys.exit(1)
+        print(recording.format_summary())
+        recording.close()
+        sys.exit(0)
+
+    rules = None
+    if args.rules:
+        import alerts
+        try:
+            rules = alerts.load_rules(args.rules)
+        except ValueError as e:
+            logging.error(str(e))
+            sys.exit(1)
+        if args.replay:
+            try:
+                recording = recorder.Recording(args.replay)
+            except (recorder.RecordingError, OSError, ValueError) as e:
+                logging.error(f"Cannot read recording: {e}")
+                sys.exit(1)
+            try:
+                events = alerts.check_recording(rules, recording)
+            except ValueError as e:
+                logging.error(str(e))
+                sys.exit(1)
+            finally:
+                recording.close()
+            for event in events:
+                print(json.dumps(event))
+            print(f"{len(events)} event(s) from {len(rules)} rule(s).")
+            sys.exit(0)
+
+    session_recorder = None
+    if args.record:
+        try:
+            session_recorder = recorder.Recorder(args.record, max_bytes=int(args.record_max_mb * 2**20),
+                                                 max_segments=args.record_max_segments, overwrite=args.record_overwrite)
+        except (recorder.RecordingError, OSError) as e:
+            logging.error(f"Cannot record: {e}")
+            sys.exit(1)
+
+    if args.daemon:
+        import daemon
+        fan_curve = None
+        if args.fan_curve:
+            fan_curve = profiles.get_fan_curve(profiles.load_profiles().get(args.fan_curve, {}))
+            if fan_curve is None:
+                logging.error(f"Profile '{args.fan_curve}' has no valid fan curve.")
+                sys.exit(1)
+        daemon.run_daemon(args.listen or daemon.DEFAULT_LISTEN, args.interval, fan_curve, resolve_gpu_indices(args) if fan_curve else None, session_recorder, rules)
+        sys.exit(0)
+
+    if not check_tkinter() or not check_system_dependencies():
+        logging.error("Cannot start GUI due to missing dependencies. Exiting.")
+        sys.exit(1)
+    import tkinter as tk
+    import api_client
+    import gui
+    client = None
+    if args.replay:
+        try:
+            client = recorder.ReplaySource(args.replay)
+        except (recorder.RecordingError, OSError, ValueError) as e:
+            logging.error(f"Cannot replay recording: {e}")
+            sys.exit(1)
+    elif args.connect:
+        client = api_client.ApiClient(args.connect)
+    root = tk.Tk()
+    app = gui.App(root, client=client, recorder=session_recorder)
+    root.mainloop()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
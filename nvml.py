@@ -0,0 +1,214 @@
+import ctypes
+import logging
+
+# NVML return codes and enums used below (see nvml.h).
+NVML_SUCCESS = 0
+NVML_ERROR_NOT_SUPPORTED = 3
+NVML_ERROR_NOT_FOUND = 6
+NVML_ERROR_INSUFFICIENT_SIZE = 7
+NVML_VALUE_NOT_AVAILABLE = 2**64 - 1
+MAX_PROCESSES = 64
+NVML_TEMPERATURE_GPU = 0
+NVML_CLOCK_GRAPHICS = 0
+NVML_CLOCK_MEM = 2
+NVML_DEVICE_NAME_BUFFER_SIZE = 96
+NVML_DEVICE_UUID_BUFFER_SIZE = 80
+NVML_SYSTEM_DRIVER_VERSION_BUFFER_SIZE = 80
+NVML_DEVICE_VBIOS_VERSION_BUFFER_SIZE = 32
+
+LIBRARY_NAMES = ["libnvidia-ml.so.1", "libnvidia-ml.so"]
+
+class NvmlError(Exception):
+    """Raised when NVML cannot be loaded or a call fails."""
+
+class NvmlUtilization(ctypes.Structure):
+    _fields_ = [("gpu", ctypes.c_uint), ("memory", ctypes.c_uint)]
+
+class NvmlProcessInfo(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_uint), ("usedGpuMemory", ctypes.c_ulonglong),
+        ("gpuInstanceId", ctypes.c_uint), ("computeInstanceId", ctypes.c_uint),
+    ]
+
+class NvmlProcessUtilizationSample(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_uint), ("timeStamp", ctypes.c_ulonglong), ("smUtil", ctypes.c_uint),
+        ("memUtil", ctypes.c_uint), ("encUtil", ctypes.c_uint), ("decUtil", ctypes.c_uint),
+    ]
+
+def load_library():
+    """Loads libnvidia-ml through ctypes, raising NvmlError if it is not available."""
+    for name in LIBRARY_NAMES:
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            continue
+    raise NvmlError("libnvidia-ml.so could not be loaded.")
+
+def _read_string(function, size):
+    def reader(backend, handle):
+        buffer = ctypes.create_string_buffer(size)
+        backend.call(function, handle, buffer, ctypes.c_uint(size))
+        return buffer.value.decode(errors="replace")
+    return reader
+
+def _read_driver_version(backend, handle):
+    buffer = ctypes.create_string_buffer(NVML_SYSTEM_DRIVER_VERSION_BUFFER_SIZE)
+    backend.call("nvmlSystemGetDriverVersion", buffer, ctypes.c_uint(NVML_SYSTEM_DRIVER_VERSION_BUFFER_SIZE))
+    return buffer.value.decode(errors="replace")
+
+def _read_power_max_limit(backend, handle):
+    minimum, maximum = ctypes.c_uint(), ctypes.c_uint()
+    backend.call("nvmlDeviceGetPowerManagementLimitConstraints", handle, ctypes.byref(minimum), ctypes.byref(maximum))
+    return maximum.value / 1000.0 # mW -> W
+
+def _read_uint(function, *args, scale=None):
+    def reader(backend, handle):
+        value = ctypes.c_uint()
+        backend.call(function, handle, *args, ctypes.byref(value))
+        return value.value / scale if scale else value.value
+    return reader
+
+def _read_throttle_reasons(backend, handle):
+    reasons = ctypes.c_ulonglong()
+    backend.call("nvmlDeviceGetCurrentClocksThrottleReasons", handle, ctypes.byref(reasons))
+    return reasons.value
+
+def _read_utilization(backend, handle):
+    utilization = NvmlUtilization()
+    backend.call("nvmlDeviceGetUtilizationRates", handle, ctypes.byref(utilization))
+    return utilization.gpu
+
+# Readers for the stats keys registered in gpu.QUERY_FIELDS. Keys without a
+# reader are reported as "N/A" by this backend.
+READERS = {
+    "name": _read_string("nvmlDeviceGetName", NVML_DEVICE_NAME_BUFFER_SIZE),
+    "uuid": _read_string("nvmlDeviceGetUUID", NVML_DEVICE_UUID_BUFFER_SIZE),
+    "driver_version": _read_driver_version,
+    "vbios_version": _read_string("nvmlDeviceGetVbiosVersion", NVML_DEVICE_VBIOS_VERSION_BUFFER_SIZE),
+    "power_default_limit": _read_uint("nvmlDeviceGetPowerManagementDefaultLimit", scale=1000.0),
+    "power_max_limit": _read_power_max_limit,
+    "max_core_clock": _read_uint("nvmlDeviceGetMaxClockInfo", ctypes.c_uint(NVML_CLOCK_GRAPHICS)),
+    "temperature": _read_uint("nvmlDeviceGetTemperature", ctypes.c_uint(NVML_TEMPERATURE_GPU)),
+    "utilization": _read_utilization,
+    "core_clock": _read_uint("nvmlDeviceGetClockInfo", ctypes.c_uint(NVML_CLOCK_GRAPHICS)),
+    "memory_clock": _read_uint("nvmlDeviceGetClockInfo", ctypes.c_uint(NVML_CLOCK_MEM)),
+    "power_usage": _read_uint("nvmlDeviceGetPowerUsage", scale=1000.0), # mW -> W
+    "fan_speed": _read_uint("nvmlDeviceGetFanSpeed"),
+    "throttle_reasons": _read_throttle_reasons,
+}
+
+class NvmlBackend:
+    """
+    Telemetry backend reading stats directly from NVML. The library is
+    initialised once and the device handles are kept open, so a read costs a
+    few library calls instead of a process spawn.
+    """
+    name = "nvml"
+
+    def __init__(self, library=None):
+        """
+        :param library: Object exposing the NVML C functions. Defaults to the
+                        real libnvidia-ml; tests can pass a stub instead.
+        """
+        self.library = library if library is not None else load_library()
+        self.call("nvmlInit_v2")
+        count = ctypes.c_uint()
+        self.call("nvmlDeviceGetCount_v2", ctypes.byref(count))
+        self.handles = []
+        for index in range(count.value):
+            handle = ctypes.c_void_p()
+            self.call("nvmlDeviceGetHandleByIndex_v2", ctypes.c_uint(index), ctypes.byref(handle))
+            self.handles.append(handle)
+        logging.info(f"NVML backend initialised with {len(self.handles)} GPU(s).")
+
+    def call(self, function, *args):
+        """Calls an NVML function, raising NvmlError on a non-success return code."""
+        ret = getattr(self.library, function)(*args)
+        if ret != NVML_SUCCESS:
+            raise NvmlError(f"{function} failed: {self.error_string(ret)}", ret)
+
+    def error_string(self, ret):
+        try:
+            error_string = self.library.nvmlErrorString
+            error_string.restype = ctypes.c_char_p
+            return error_string(ret).decode()
+        except Exception:
+            return f"NVML error {ret}"
+
+    def read_all(self, keys):
+        """Returns one stats dictionary per GPU with the given keys."""
+        stats = []
+        for index, handle in enumerate(self.handles):
+            device = {}
+            for key in keys:
+                if key == "index":
+                    device[key] = index
+                    continue
+                reader = READERS.get(key)
+                try:
+                    device[key] = reader(self, handle) if reader else "N/A"
+                except NvmlError as e:
+                    if e.args[1:] != (NVML_ERROR_NOT_SUPPORTED,):
+                        logging.error(f"NVML read of '{key}' on GPU {index} failed: {e.args[0]}")
+                    device[key] = "N/A"
+            stats.append(device)
+        return stats
+
+    def read_processes(self):
+        """
+        Returns the compute processes of all GPUs as dictionaries with "gpu",
+        "pid", "used_memory" (MiB), "sm" (%) and "name" keys.
+        """
+        processes = []
+        for index, handle in enumerate(self.handles):
+            infos = self._read_array(NvmlProcessInfo, lambda buffer, count: self.call(
+                "nvmlDeviceGetComputeRunningProcesses_v2", handle, ctypes.byref(count), buffer))
+            utilization = self._process_utilization(handle)
+            for info in infos:
+                memory = info.usedGpuMemory
+                processes.append({
+                    "gpu": index,
+                    "pid": info.pid,
+                    "used_memory": memory // 2**20 if memory != NVML_VALUE_NOT_AVAILABLE else "N/A",
+                    "sm": utilization.get(info.pid, "N/A"),
+                    "name": "N/A",
+                })
+        return processes
+
+    def _process_utilization(self, handle):
+        """Returns {pid: SM %} of the recent samples, or {} where this is not supported."""
+        try:
+            samples = self._read_array(NvmlProcessUtilizationSample, lambda buffer, count: self.call(
+                "nvmlDeviceGetProcessUtilization", handle, buffer, ctypes.byref(count), ctypes.c_ulonglong(0)))
+        except NvmlError as e:
+            if e.args[1:] not in ((NVML_ERROR_NOT_SUPPORTED,), (NVML_ERROR_NOT_FOUND,)):
+                logging.error(f"NVML process utilization read failed: {e.args[0]}")
+            return {}
+        return {sample.pid: sample.smUtil for sample in samples}
+
+    def _read_array(self, structure, call, attempts=3):
+        """
+        Runs call(buffer, count) with a buffer of MAX_PROCESSES structures.
+        On NVML_ERROR_INSUFFICIENT_SIZE NVML stores the number of entries it
+        needs in count, so the call is retried with a buffer that large (plus
+        room for processes started in between). Returns the filled entries.
+        """
+        size = MAX_PROCESSES
+        for attempt in range(attempts):
+            buffer = (structure * size)()
+            count = ctypes.c_uint(size)
+            try:
+                call(buffer, count)
+                return buffer[:count.value]
+            except NvmlError as e:
+                if e.args[1:] != (NVML_ERROR_INSUFFICIENT_SIZE,) or attempt == attempts - 1:
+                    raise
+                size = max(count.value, size) + MAX_PROCESSES
+
+    def close(self):
+        try:
+            self.call("nvmlShutdown")
+        except NvmlError as e:
+            logging.warning(f"NVML shutdown failed: {e.args[0]}")
+        self.handles = []
@@ -0,0 +1,188 @@
+"""
+Persistent privileged helper.
+
+Started once through pkexec (via pkexec_wrapper.sh, so DISPLAY and XAUTHORITY
+are set) and then serves apply/reset requests from the unprivileged app over a
+local Unix socket. Only the user who started it can connect, and only a fixed
+set of nvidia-settings assignments is accepted.
+
+Protocol: one JSON object per line, answered with one JSON object per line.
+    {"action": "ping"}
+    {"action": "apply", "assignments": ["[gpu:0]/GPUFanControlState=1", ...]}
+    {"action": "shutdown"}
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import socket
+import stat
+import struct
+import subprocess
+import sys
+
+# Assignments the helper is allowed to pass to nvidia-settings -a.
+ASSIGNMENT_PATTERN = re.compile(
+    r"^\[(gpu|fan):\d{1,2}\]/"
+    r"(GPUFanControlState|GPUTargetFanSpeed|GPUGraphicsClockOffset\[\d\]|GPUMemoryTransferRateOffset\[\d\])"
+    r"=-?\d{1,5}$"
+)
+MAX_REQUEST_SIZE = 64 * 1024
+
+def validate_request(request):
+    """Returns an error message if the request is not allowed, otherwise None."""
+    if not isinstance(request, dict):
+        return "Request must be a JSON object."
+    action = request.get("action")
+    if action in ("ping", "shutdown"):
+        return None
+    if action != "apply":
+        return f"Unknown action: {action!r}"
+    assignments = request.get("assignments")
+    if not isinstance(assignments, list) or not assignments:
+        return "'assignments' must be a non-empty list."
+    for assignment in assignments:
+        if not isinstance(assignment, str) or not ASSIGNMENT_PATTERN.match(assignment):
+            return f"Assignment not allowed: {assignment!r}"
+    return None
+
+def get_peer_uid(connection):
+    """Returns the uid of the process on the other end of a Unix socket."""
+    creds = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+def handle_request(request):
+    """Executes a validated request and returns the response dictionary."""
+    if request["action"] in ("ping", "shutdown"):
+        return {"ok": True}
+    command = ["nvidia-settings"]
+    for assignment in request["assignments"]:
+        command += ["-a", assignment]
+    logging.info(f"Executing: {' '.join(command)}")
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        return {"ok": False, "returncode": 127, "stdout": "", "stderr": "nvidia-settings not found"}
+    return {
+        "ok": result.returncode == 0,
+        "returncode": result.returncode,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
+
+def serve_connection(connection):
+    """Answers the requests of one client. Returns False if a shutdown was requested."""
+    connection.settimeout(10)
+    stream = connection.makefile("rwb")
+    for line in stream:
+        request, error = None, None
+        if len(line) > MAX_REQUEST_SIZE:
+            error = "Request too large."
+        else:
+            try:
+                request = json.loads(line)
+                error = validate_request(request)
+            except ValueError:
+                error = "Invalid JSON."
+        response = {"ok": False, "error": error} if error else handle_request(request)
+        stream.write(json.dumps(response).encode() + b"\n")
+        stream.flush()
+        if not error and request["action"] == "shutdown":
+            return False
+    return True
+
+def open_socket_directory(directory, allowed_uid):
+    """
+    Opens the directory of the socket without following symlinks and checks
+    that it belongs to allowed_uid (or root) and is not writable by others.
+    Returns the directory fd; raises PermissionError otherwise.
+    """
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    info = os.fstat(fd)
+    if info.st_uid not in (allowed_uid, 0) or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        os.close(fd)
+        raise PermissionError(f"{directory} must belong to uid {allowed_uid} and not be writable by others.")
+    return fd
+
+def serve(socket_path, allowed_uid, idle_timeout=None):
+    """
+    Serves requests on socket_path until a shutdown request or the idle timeout.
+
+    The socket lives in a directory the user controls, so every path
+    operation goes through a directory fd and never follows symlinks, and
+    the socket is created with mode 0600 instead of being chmod-ed after bind.
+    """
+    directory, name = os.path.split(os.path.abspath(socket_path))
+    dir_fd = open_socket_directory(directory, allowed_uid)
+    try:
+        existing = os.lstat(name, dir_fd=dir_fd)
+    except FileNotFoundError:
+        existing = None
+    if existing is not None:
+        if not stat.S_ISSOCK(existing.st_mode) or existing.st_uid != allowed_uid:
+            os.close(dir_fd)
+            raise PermissionError(f"Refusing to replace {socket_path}: not a socket owned by uid {allowed_uid}.")
+        os.unlink(name, dir_fd=dir_fd)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    previous_umask = os.umask(0o077)
+    try:
+        # Binding through /proc/self/fd resolves the directory we checked, not whatever the path points to now.
+        server.bind(f"/proc/self/fd/{dir_fd}/{name}")
+    finally:
+        os.umask(previous_umask)
+    bound = os.lstat(name, dir_fd=dir_fd)
+    os.chown(name, allowed_uid, -1, dir_fd=dir_fd, follow_symlinks=False)
+    server.listen(4)
+    server.settimeout(idle_timeout)
+    logging.info(f"Privileged helper listening on {socket_path} for uid {allowed_uid}.")
+
+    try:
+        while True:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                logging.info("Privileged helper idle timeout reached. Exiting.")
+                return
+            with connection:
+                if get_peer_uid(connection) not in (allowed_uid, 0):
+                    logging.warning("Rejected connection from unexpected uid.")
+                    continue
+                try:
+                    if not serve_connection(connection):
+                        logging.info("Privileged helper shutting down on request.")
+                        return
+                except OSError as e:
+                    logging.warning(f"Connection error: {e}")
+    finally:
+        server.close()
+        try:
+            # Only remove the socket we created, not something put in its place.
+            current = os.lstat(name, dir_fd=dir_fd)
+            if (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+                os.unlink(name, dir_fd=dir_fd)
+        except FileNotFoundError:
+            pass
+        os.close(dir_fd)
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent privileged helper for nvidiaoc.")
+    parser.add_argument("--socket", required=True, help="Path of the Unix socket to listen on.")
+    parser.add_argument("--uid", type=int, help="uid allowed to connect (defaults to PKEXEC_UID).")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Exit after this many idle seconds.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - helper - %(levelname)s - %(message)s")
+    uid = int(os.environ["PKEXEC_UID"]) if "PKEXEC_UID" in os.environ else args.uid
+    if uid is None:
+        logging.error("No uid given and PKEXEC_UID is not set.")
+        sys.exit(1)
+    try:
+        serve(args.socket, uid, args.idle_timeout)
+    except PermissionError as e:
+        logging.error(str(e))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
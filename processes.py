@@ -0,0 +1,174 @@
+import logging
+import os
+import pwd
+
+import gpu
+
+# Columns of the process view: (key, header, width)
+PROCESS_COLUMNS = [
+    ("gpu", "GPU", 4),
+    ("pid", "PID", 8),
+    ("user", "User", 10),
+    ("used_memory", "Mem MiB", 8),
+    ("sm", "SM %", 5),
+    ("command", "Command", 60),
+]
+SORT_KEYS = ["used_memory", "sm", "pid", "gpu", "user", "command"]
+
+def get_process_columns(with_sm=True):
+    """PROCESS_COLUMNS, without the SM % column if with_sm is False."""
+    return [column for column in PROCESS_COLUMNS if with_sm or column[0] != "sm"]
+
+def has_process_utilization():
+    """Whether read_gpu_processes() fills in SM % without the slow pmon pass (NVML only)."""
+    return hasattr(gpu.get_backend(), "read_processes")
+
+COMPUTE_APPS_COMMAND = [
+    "nvidia-smi", "--query-compute-apps=gpu_uuid,pid,used_memory,process_name", "--format=csv,noheader,nounits"
+]
+PMON_COMMAND = ["nvidia-smi", "pmon", "-c", "1", "-s", "u"]
+
+def parse_compute_apps(output, uuid_to_index):
+    """
+    Parses `nvidia-smi --query-compute-apps=gpu_uuid,pid,used_memory,process_name`
+    output into process dictionaries. GPUs are mapped from UUID to index.
+    """
+    processes = []
+    for line in output.splitlines():
+        values = [value.strip() for value in line.split(",", 3)]
+        if len(values) != 4:
+            continue
+        uuid, pid, used_memory, name = values
+        pid = gpu.parse_int(pid)
+        if not isinstance(pid, int):
+            continue
+        processes.append({
+            "gpu": uuid_to_index.get(uuid, "N/A"),
+            "pid": pid,
+            "used_memory": gpu.parse_int(used_memory),
+            "sm": "N/A",
+            "name": gpu.parse_str(name),
+        })
+    return processes
+
+def parse_pmon(output):
+    """
+    Parses `nvidia-smi pmon -c 1 -s u` output into {(gpu index, pid): SM %}.
+    Lines look like "    0      1234     C    45    12     -     -   python".
+    """
+    utilization = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith("#") or len(fields) < 4:
+            continue
+        index, pid, sm = gpu.parse_int(fields[0]), gpu.parse_int(fields[1]), gpu.parse_int(fields[3])
+        if isinstance(index, int) and isinstance(pid, int):
+            utilization[(index, pid)] = sm
+    return utilization
+
+def read_smi_processes(with_sm=False):
+    """
+    Reads the compute processes with nvidia-smi; pmon (about a second) only if
+    with_sm. nvidia-smi cannot report processes in the --query-gpu pass the
+    sampler makes, so every read costs its own spawn (two with pmon). The GUI
+    only reads while the Processes window is open, at most every 2 seconds.
+    """
+    result = gpu.run_command(COMPUTE_APPS_COMMAND)
+    if not result or result.returncode != 0:
+        return []
+    uuid_to_index = {info.get("uuid"): index for index, info in gpu.get_static_info_all().items()}
+    processes = parse_compute_apps(result.stdout, uuid_to_index)
+    if with_sm and processes:
+        pmon = gpu.run_command(PMON_COMMAND)
+        if pmon and pmon.returncode == 0:
+            utilization = parse_pmon(pmon.stdout)
+            for process in processes:
+                process["sm"] = utilization.get((process["gpu"], process["pid"]), "N/A")
+    return processes
+
+def read_gpu_processes(with_sm=False):
+    """Returns the compute processes of all GPUs from the active backend."""
+    backend = gpu.get_backend()
+    if hasattr(backend, "read_processes"):
+        try:
+            return backend.read_processes()
+        except Exception as e:
+            logging.error(f"Reading GPU processes failed: {e}")
+            return []
+    return read_smi_processes(with_sm)
+
+def read_start_time(pid, proc="/proc"):
+    """Start time of a process in clock ticks since boot (field 22 of /proc/<pid>/stat), or None."""
+    try:
+        with open(f"{proc}/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name (field 2) may contain spaces and parentheses; fields after it are plain.
+    return int(stat[stat.rindex(b")") + 2:].split()[19])
+
+def read_proc_info(pid, proc="/proc"):
+    """Reads the command line and owner of a process from /proc."""
+    info = {"command": "N/A", "user": "N/A"}
+    try:
+        with open(f"{proc}/{pid}/cmdline", "rb") as f:
+            command = f.read().replace(b"\0", b" ").strip().decode(errors="replace")
+        info["command"] = command or "N/A"
+        uid = os.stat(f"{proc}/{pid}").st_uid
+        try:
+            info["user"] = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            info["user"] = str(uid)
+    except OSError:
+        pass
+    return info
+
+class ProcessMonitor:
+    """
+    Joins GPU processes with their /proc metadata. Metadata is cached by
+    (pid, start time): a pid that stays in the listing from one read to the
+    next is not looked up again, and a pid that (re)appears only costs a read
+    of its start time unless it belongs to a new process.
+    """
+
+    def __init__(self, proc="/proc"):
+        self.proc = proc
+        self._cache = {} # pid -> (start time, info)
+        self._previous_pids = set()
+
+    def join(self, processes):
+        """Adds "command" and "user" to each process dictionary (in place) and returns the list."""
+        pids = {process["pid"] for process in processes}
+        for pid in pids - self._previous_pids:
+            start_time = read_start_time(pid, self.proc)
+            cached = self._cache.get(pid)
+            if cached is None or cached[0] != start_time:
+                self._cache[pid] = (start_time, read_proc_info(pid, self.proc))
+        # Forget processes that are gone so the cache stays the size of the listing.
+        for pid in set(self._cache) - pids:
+            del self._cache[pid]
+        self._previous_pids = pids
+        for process in processes:
+            info = self._cache[process["pid"]][1]
+            process["user"] = info["user"]
+            process["command"] = info["command"] if info["command"] != "N/A" else process.get("name", "N/A")
+        return processes
+
+    def read(self, with_sm=False):
+        return self.join(read_gpu_processes(with_sm))
+
+def sort_processes(processes, key="used_memory", reverse=None):
+    """Sorts by key; numeric columns default to largest first. "N/A" values sort last."""
+    reverse = key in ("used_memory", "sm") if reverse is None else reverse
+    present = [process for process in processes if process.get(key) != "N/A"]
+    missing = [process for process in processes if process.get(key) == "N/A"]
+    return sorted(present, key=lambda process: process[key], reverse=reverse) + missing
+
+def format_processes(processes):
+    """Renders processes as a fixed-width text table."""
+    lines = [" ".join(f"{header:<{width}}" for _, header, width in PROCESS_COLUMNS).rstrip()]
+    for process in processes:
+        lines.append(" ".join(f"{str(process.get(key, 'N/A')):<{width}.{width}}" for key, _, width in PROCESS_COLUMNS).rstrip())
+    if not processes:
+        lines.append("(no compute processes)")
+    return "\n".join(lines)
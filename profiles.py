@@ -1,8 +1,26 @@
+import copy
 import json
 import logging
 import os
+import tempfile
 
-PROFILES_FILE = "profiles.json"
+# Older versions kept the profiles in the working directory; migrated on first load.
+LEGACY_PROFILES_FILE = "profiles.json"
+
+def get_profiles_path():
+    """
+    Location of the profile store: $NVIDIAOC_PROFILES, otherwise
+    profiles.json in $XDG_CONFIG_HOME/nvidiaoc (~/.config/nvidiaoc).
+    """
+    if os.environ.get("NVIDIAOC_PROFILES"):
+        return os.environ["NVIDIAOC_PROFILES"]
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_home, "nvidiaoc", "profiles.json")
+
+PROFILES_FILE = get_profiles_path()
+
+# (path, mtime_ns, size) of the file the cached profiles were read from.
+_cache = {"key": None, "profiles": None}
 
 def get_default_profile():
     """Returns the default profile settings."""
@@ -14,36 +32,97 @@ def get_default_profile():
         }
     }
 
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+def _initial_profiles():
+    """Profiles of a new store: those of a legacy profiles.json in the working directory, else the default."""
+    if os.path.exists(LEGACY_PROFILES_FILE) and os.path.abspath(LEGACY_PROFILES_FILE) != os.path.abspath(PROFILES_FILE):
+        try:
+            with open(LEGACY_PROFILES_FILE) as f:
+                profiles = json.load(f)
+            logging.info(f"Migrating profiles from '{os.path.abspath(LEGACY_PROFILES_FILE)}' to '{PROFILES_FILE}'.")
+            return profiles
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Cannot migrate '{LEGACY_PROFILES_FILE}': {e}.")
+    logging.info(f"'{PROFILES_FILE}' not found. Creating with default profile.")
+    return get_default_profile()
+
 def load_profiles():
     """
-    Loads profiles from profiles.json.
-    If the file doesn't exist, it creates it with a default profile.
+    Loads the profiles, creating the store (with the default profile) if it
+    doesn't exist. The parsed file is cached and only read again when its
+    mtime or size changes; callers get their own copy to modify.
     """
-    if not os.path.exists(PROFILES_FILE):
-        logging.info(f"'{PROFILES_FILE}' not found. Creating with default profile.")
-        profiles = get_default_profile()
+    key = _file_key(PROFILES_FILE)
+    if key is None:
+        profiles = _initial_profiles()
+        profiles.setdefault("Default", get_default_profile()["Default"])
         save_profiles(profiles)
         return profiles
-    
-    try:
-        with open(PROFILES_FILE, 'r') as f:
-            profiles = json.load(f)
-            # Ensure the default profile is always present
-            if "Default" not in profiles:
-                profiles["Default"] = get_default_profile()["Default"]
-            logging.info(f"Successfully loaded profiles from '{PROFILES_FILE}'.")
-            return profiles
-    except (json.JSONDecodeError, IOError) as e:
-        logging.error(f"Error reading '{PROFILES_FILE}': {e}. Loading default profile.")
-        return get_default_profile()
+    if key != _cache["key"]:
+        try:
+            with open(PROFILES_FILE, 'r') as f:
+                profiles = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Error reading '{PROFILES_FILE}': {e}. Loading default profile.")
+            return get_default_profile()
+        # Ensure the default profile is always present
+        if "Default" not in profiles:
+            profiles["Default"] = get_default_profile()["Default"]
+        logging.info(f"Successfully loaded profiles from '{PROFILES_FILE}'.")
+        _cache.update(key=key, profiles=profiles)
+    return copy.deepcopy(_cache["profiles"])
 
 def save_profiles(profiles):
-    """Saves the profiles dictionary to profiles.json."""
+    """
+    Saves the profiles dictionary. The file is written under a temporary name
+    and renamed over the old one, so readers never see a partial file.
+    """
+    directory = os.path.dirname(PROFILES_FILE) or "."
     try:
-        with open(PROFILES_FILE, 'w') as f:
-            json.dump(profiles, f, indent=4)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(prefix=".profiles-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(profiles, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, PROFILES_FILE)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        _cache.update(key=_file_key(PROFILES_FILE), profiles=copy.deepcopy(profiles))
         logging.info(f"Profiles saved to '{PROFILES_FILE}'.")
         return True
-    except IOError as e:
+    except (IOError, TypeError, ValueError) as e:
         logging.error(f"Error writing to '{PROFILES_FILE}': {e}.")
         return False
+
+def get_fan_curve(profile):
+    """
+    Returns the FanCurve stored in a profile's "fan_curve" entry
+    (a list of [temperature, speed] points), or None if it has none.
+    """
+    points = profile.get("fan_curve")
+    if not points:
+        return None
+    from fancurve import FanCurve
+    try:
+        return FanCurve(points)
+    except (ValueError, TypeError) as e:
+        logging.error(f"Invalid fan curve in profile: {e}")
+        return None
+
+def apply_profile(name, gpu_indices=(0,)):
+    """Applies the clock and fan settings of a stored profile. Returns the ApplyResult, or None if it doesn't exist."""
+    profile = load_profiles().get(name)
+    if profile is None:
+        logging.error(f"Profile '{name}' does not exist.")
+        return None
+    import gpu
+    return gpu.apply_all_settings(profile.get("fan_speed", 60), profile.get("core_clock", 0), profile.get("mem_clock", 0), gpu_indices)
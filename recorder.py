@@ -0,0 +1,322 @@
+"""
+Compact on-disk recording of telemetry sessions.
+
+A recording is one or more segment files (`session.nvrec`, `session.nvrec.1`,
+...; a new segment is started when the current one reaches max_bytes, and the
+oldest segment is deleted once there are more than max_segments). Each
+segment is:
+
+    magic    8 bytes   b"NVOCREC1"
+    length   uint32    length of the JSON header that follows
+    header   JSON      {"metrics": [...], "names": {"0": "GPU name"}, "created": ...},
+                       padded with spaces so records start at a multiple of 8
+    records  fixed-width, little endian: float64 time, uint32 GPU index,
+             then one float32 per metric (NaN when the value was not available)
+
+Records are appended in time order, so the reader can memory-map a segment
+and binary search it for a time range without loading or copying the file.
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+
+import history
+
+MAGIC = b"NVOCREC1"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 16
+FLUSH_INTERVAL = 5.0 # seconds between flushes of the current segment
+SUMMARY_PERCENTILES = (0.5, 0.95, 0.99)
+
+class RecordingError(Exception):
+    """Raised for unreadable recordings and for writes attempted during a replay."""
+
+def record_struct(metrics):
+    return struct.Struct("<dI" + "f" * len(metrics))
+
+def segment_paths(path):
+    """
+    Returns the existing segments of a recording, oldest first. The first
+    segments may be missing once the recorder has started dropping them.
+    """
+    directory, base = os.path.split(path)
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+    prefix = base + "."
+    numbers = sorted(int(name[len(prefix):]) for name in names if name.startswith(prefix) and name[len(prefix):].isdigit())
+    paths = [path] if base in names else []
+    return paths + [f"{path}.{number}" for number in numbers]
+
+class Recorder:
+    """
+    Appends sampler output (lists of stats dictionaries) to a recording.
+    Register record() as a sampler listener or call it once per tick.
+    A recording keeps at most max_segments segments of max_bytes each and is
+    flushed every flush_interval seconds. An existing recording at `path` is
+    refused, or deleted first with overwrite=True, so sessions never mix.
+    """
+
+    def __init__(self, path, metrics=history.HISTORY_METRICS, max_bytes=DEFAULT_MAX_BYTES,
+                 max_segments=DEFAULT_MAX_SEGMENTS, flush_interval=FLUSH_INTERVAL, overwrite=False):
+        existing = segment_paths(path)
+        if existing and not overwrite:
+            raise RecordingError(f"Recording {path} already exists. Choose another file or overwrite it.")
+        for segment_path in existing:
+            os.remove(segment_path)
+        self.path = path
+        self.metrics = list(metrics)
+        self.max_bytes = max_bytes
+        self.max_segments = max(1, max_segments)
+        self.flush_interval = flush_interval
+        self.struct = record_struct(self.metrics)
+        self.records = 0
+        self._file = None
+        self._size = 0
+        self._segment = 0
+        self._paths = [] # segments written by this recorder, oldest first
+        self._flushed_at = 0.0
+
+    def _open_segment(self, names):
+        path = self.path if self._segment == 0 else f"{self.path}.{self._segment}"
+        self._segment += 1
+        while len(self._paths) >= self.max_segments:
+            oldest = self._paths.pop(0)
+            try:
+                os.remove(oldest)
+                logging.info(f"Dropped the oldest recording segment {oldest}")
+            except OSError as e:
+                logging.warning(f"Cannot remove recording segment {oldest}: {e}")
+        header = json.dumps({"metrics": self.metrics, "names": names, "created": time.time()}).encode()
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._size = self._file.tell()
+        self._paths.append(path)
+        logging.info(f"Recording telemetry to {path}")
+
+    def record(self, devices, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._file is None or self._size + self.struct.size * len(devices) > self.max_bytes:
+            self.close()
+            names = {str(stats.get("index", 0)): stats.get("name", "N/A") for stats in devices}
+            self._open_segment(names)
+        chunk = bytearray()
+        for stats in devices:
+            values = [stats.get(metric) for metric in self.metrics]
+            chunk += self.struct.pack(
+                timestamp, stats.get("index", 0),
+                *(float(value) if isinstance(value, (int, float)) else math.nan for value in values)
+            )
+        self._file.write(chunk)
+        self._size += len(chunk)
+        self.records += len(devices)
+        now = time.monotonic()
+        if now - self._flushed_at >= self.flush_interval:
+            # Bounds what a crash or a kill -9 can lose to the last few seconds.
+            self._file.flush()
+            self._flushed_at = now
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class Segment:
+    """One memory-mapped segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(len(MAGIC) + 4)
+            if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+                raise RecordingError(f"{path} is not a telemetry recording.")
+            header_length = struct.unpack("<I", prefix[len(MAGIC):])[0]
+            header = json.loads(f.read(header_length))
+            self.offset = len(prefix) + header_length
+            self.metrics = header["metrics"]
+            self.names = {int(index): name for index, name in header.get("names", {}).items()}
+            self.struct = record_struct(self.metrics)
+            size = os.fstat(f.fileno()).st_size
+            # A record cut short by a crash is ignored.
+            self.count = (size - self.offset) // self.struct.size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        self._view = memoryview(self._map) if self._map else None
+
+    def __len__(self):
+        return self.count
+
+    def time_at(self, position):
+        return struct.unpack_from("<d", self._view, self.offset + position * self.struct.size)[0]
+
+    def bisect(self, timestamp):
+        """Position of the first record at or after timestamp."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.time_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=None, end=None):
+        """Yields (time, index, values...) tuples of records with start <= time < end."""
+        if not self.count:
+            return
+        first = 0 if start is None else self.bisect(start)
+        last = self.count if end is None else self.bisect(end)
+        size = self.struct.size
+        yield from self.struct.iter_unpack(self._view[self.offset + first * size:self.offset + last * size])
+
+    def close(self):
+        if self._view is None:
+            return
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass # a records() generator is still open; the map is closed when it is collected
+        self._view = self._map = None
+
+class Recording:
+    """Read-only view of all segments of a recording."""
+
+    def __init__(self, path):
+        paths = segment_paths(path)
+        if not paths:
+            raise RecordingError(f"Recording {path} not found.")
+        self.segments = [Segment(segment_path) for segment_path in paths]
+        self.metrics = self.segments[0].metrics
+        self.names = {}
+        for segment in self.segments:
+            if segment.metrics != self.metrics:
+                raise RecordingError(f"{segment.path} records different metrics than {paths[0]}.")
+            self.names.update(segment.names)
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def time_range(self):
+        """Returns (first, last) timestamp, or None for an empty recording."""
+        segments = [segment for segment in self.segments if len(segment)]
+        if not segments:
+            return None
+        return segments[0].time_at(0), segments[-1].time_at(len(segments[-1]) - 1)
+
+    def records(self, start=None, end=None):
+        for segment in self.segments:
+            if not len(segment):
+                continue
+            if start is not None and segment.time_at(len(segment) - 1) < start:
+                continue
+            if end is not None and segment.time_at(0) >= end:
+                break
+            yield from segment.records(start, end)
+
+    def samples(self, start=None, end=None):
+        """Yields (time, devices) with the stats dictionaries of every recorded sample."""
+        current_time, devices = None, []
+        for record in self.records(start, end):
+            if record[0] != current_time and devices:
+                yield current_time, devices
+                devices = []
+            current_time = record[0]
+            stats = {"index": record[1], "name": self.names.get(record[1], "N/A")}
+            for metric, value in zip(self.metrics, record[2:]):
+                stats[metric] = "N/A" if math.isnan(value) else round(value, 2)
+            devices.append(stats)
+        if devices:
+            yield current_time, devices
+
+    def summary(self, start=None, end=None, percentiles=SUMMARY_PERCENTILES):
+        """
+        Returns {gpu index: {metric: {"count", "min", "max", "mean", "p50", ...}}}
+        over the records with start <= time < end.
+        """
+        values = {}
+        for record in self.records(start, end):
+            series = values.setdefault(record[1], [[] for _ in self.metrics])
+            for column, value in zip(series, record[2:]):
+                if not math.isnan(value):
+                    column.append(value)
+        summary = {}
+        for index, series in sorted(values.items()):
+            summary[index] = {}
+            for metric, column in zip(self.metrics, series):
+                if not column:
+                    continue
+                column.sort()
+                stats = {"count": len(column), "min": column[0], "max": column[-1], "mean": sum(column) / len(column)}
+                for fraction in percentiles:
+                    stats[f"p{fraction * 100:g}"] = column[min(len(column) - 1, int(fraction * len(column)))]
+                summary[index][metric] = stats
+        return summary
+
+    def format_summary(self, start=None, end=None):
+        """Renders summary() as a text table."""
+        time_range = self.time_range()
+        if time_range is None:
+            return "Empty recording."
+        lines = [f"{len(self)} records from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time_range[0]))} "
+                 f"to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time_range[1]))}"]
+        for index, metrics in self.summary(start, end).items():
+            lines.append(f"\nGPU {index}: {self.names.get(index, 'N/A')}")
+            lines.append(f"{'Metric':<14} {'Min':>9} {'Mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'Max':>9}")
+            for metric, stats in metrics.items():
+                lines.append(f"{metric:<14} {stats['min']:>9.1f} {stats['mean']:>9.1f} {stats['p50']:>9.1f} "
+                             f"{stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+class ReplaySource:
+    """
+    Plays a recording back through the GUI in place of a live source, paced
+    by the recorded timestamps: get_stats() returns the latest sample at or
+    before the replay clock, which runs `speed` times faster than real time
+    from the first call. How often the GUI ticks does not change the pace.
+    Writes are refused.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.recording = Recording(path)
+        self.speed = speed
+        self._samples = self.recording.samples()
+        self._next = next(self._samples, None)
+        self._last = []
+        self._origin = None # (monotonic time, recorded time) at the first call
+        self.finished = self._next is None
+
+    def get_stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self._next is not None and self._origin is None:
+            self._origin = (now, self._next[0])
+        if self._origin is not None:
+            position = self._origin[1] + (now - self._origin[0]) * self.speed
+            while self._next is not None and self._next[0] <= position:
+                self._last = self._next[1]
+                self._next = next(self._samples, None)
+        if self._next is None and not self.finished:
+            logging.info("End of the recording reached.")
+            self.finished = True
+        return self._last
+
+    def get_diagnostics(self):
+        return {}
+
+    def _read_only(self, *args, **kwargs):
+        raise RecordingError("A recording is being replayed. Settings cannot be changed.")
+
+    apply = reset = load_profile = _read_only
+
+    def close(self):
+        self._samples.close()
+        self.recording.close()
@@ -0,0 +1,111 @@
+import tkinter as tk
+from tkinter import font
+
+# (warning, critical[, key of the stats value they are fractions of]) per stats key.
+DEFAULT_THRESHOLDS = {
+    "temperature": (75, 85),
+    "power_usage": (0.9, 1.0, "power_default_limit"),
+}
+LEVEL_COLORS = ["black", "#b36b00", "#c62828"]
+
+def threshold_level(key, stats, thresholds=DEFAULT_THRESHOLDS):
+    """Returns 0 (normal), 1 (warning) or 2 (critical) for one stats value."""
+    rule = thresholds.get(key)
+    value = stats.get(key)
+    if rule is None or not isinstance(value, (int, float)):
+        return 0
+    warning, critical = rule[0], rule[1]
+    if len(rule) > 2:
+        reference = stats.get(rule[2])
+        if not isinstance(reference, (int, float)) or reference <= 0:
+            return 0
+        value = value / reference
+    return 2 if value >= critical else 1 if value >= warning else 0
+
+def format_cell(key, unit, stats, thresholds=DEFAULT_THRESHOLDS):
+    """Returns the (text, threshold level) of one table cell."""
+    value = stats.get(key, "N/A")
+    text = f"{value} {unit}".rstrip() if unit and value != "N/A" else str(value)
+    return text, threshold_level(key, stats, thresholds)
+
+class StatsTable(tk.Frame):
+    """
+    Grid of stats with one row per metric and one column per GPU, each cell
+    bound to its own StringVar. show() only stores the latest samples; a
+    single idle callback per tick then touches the cells whose text or
+    colour changed, so a tick costs what changed rather than the table size.
+    """
+
+    def __init__(self, parent, rows, thresholds=DEFAULT_THRESHOLDS, bg="#f0f0f0", **kwargs):
+        super().__init__(parent, bg=bg, **kwargs)
+        self.rows = rows # (stats key, label, unit)
+        self.thresholds = thresholds
+        self.bg = bg
+        self.font = font.Font(family="monospace", size=10)
+        self._columns = {} # GPU index -> {key: (StringVar, Label)}
+        self._shown = {} # (GPU index, key) -> (text, level) currently displayed
+        self._visible = []
+        self._pending = None
+        self._idle_id = None
+        for row, (_, label, _) in enumerate(self.rows):
+            tk.Label(self, text=f"{label:<18}:", font=self.font, bg=bg, anchor="w").grid(row=row, column=0, sticky="w")
+        self._empty = tk.Label(self, text="No GPU data available.", font=self.font, bg=bg, anchor="w")
+        self._empty.grid(row=len(rows), column=0, columnspan=2, sticky="w")
+
+    def show(self, devices, visible_indices):
+        """Queues a redraw with the given samples, showing the GPUs in visible_indices."""
+        self._pending = (devices, list(visible_indices))
+        if self._idle_id is None:
+            self._idle_id = self.after_idle(self._flush)
+
+    def _column(self, gpu_index):
+        column = self._columns.get(gpu_index)
+        if column is None:
+            column = {}
+            for row, (key, _, _) in enumerate(self.rows):
+                var = tk.StringVar(self, value="")
+                label = tk.Label(self, textvariable=var, font=self.font, bg=self.bg, anchor="w", fg=LEVEL_COLORS[0])
+                column[key] = (var, label)
+            self._columns[gpu_index] = column
+        return column
+
+    def _flush(self):
+        self._idle_id = None
+        if self._pending is None:
+            return
+        devices, visible = self._pending
+        self._pending = None
+        shown = [stats for stats in devices if stats.get("index") in visible]
+        shown_indices = [stats.get("index") for stats in shown]
+        if shown_indices != self._visible:
+            self._layout(shown_indices)
+        for stats in shown:
+            column = self._column(stats.get("index"))
+            for key, _, unit in self.rows:
+                text, level = format_cell(key, unit, stats, self.thresholds)
+                cell = (stats.get("index"), key)
+                previous = self._shown.get(cell)
+                if previous == (text, level):
+                    continue
+                var, label = column[key]
+                if previous is None or previous[0] != text:
+                    var.set(text)
+                if previous is None or previous[1] != level:
+                    label.config(fg=LEVEL_COLORS[level])
+                self._shown[cell] = (text, level)
+
+    def _layout(self, gpu_indices):
+        """Shows the columns of gpu_indices, in that order, and hides the others."""
+        for index, column in self._columns.items():
+            if index not in gpu_indices:
+                for _, label in column.values():
+                    label.grid_remove()
+        for position, index in enumerate(gpu_indices, start=1):
+            column = self._column(index)
+            for row, (key, _, _) in enumerate(self.rows):
+                column[key][1].grid(row=row, column=position, sticky="w", padx=(0, 12))
+        if gpu_indices:
+            self._empty.grid_remove()
+        else:
+            self._empty.grid()
+        self._visible = gpu_indices
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import alerts
+import recorder
+
+def gpu_sample(**stats):
+    return [dict(index=0, **stats)]
+
+def fire_times(watchdog, samples):
+    """Feeds (time, stats) pairs and returns the times at which a rule fired."""
+    return [now for now, stats in samples if watchdog.on_sample(gpu_sample(**stats), now)]
+
+def test_rule_fires_after_its_duration_once_per_streak():
+    watchdog = alerts.Watchdog([alerts.Rule("hot", "temperature > 83", duration=5, cooldown=0)])
+    samples = [(t, {"temperature": 85}) for t in range(0, 10)]
+    # Fires once the condition has held for 5 s, and only once per streak.
+    assert fire_times(watchdog, samples) == [5]
+    # A cool sample ends the streak; the next one needs another 5 s.
+    samples = [(10, {"temperature": 70})] + [(t, {"temperature": 85}) for t in range(11, 18)]
+    assert fire_times(watchdog, samples) == [16]
+
+def test_avg_uses_the_sliding_window():
+    watchdog = alerts.Watchdog([alerts.Rule("power", "avg(power_usage) >= 300", window=3, cooldown=0)])
+    # One spike does not lift the 3 s average over the threshold...
+    assert fire_times(watchdog, [(0, {"power_usage": 200}), (1, {"power_usage": 200}), (2, {"power_usage": 450})]) == []
+    # ...but sustained load does, once the oldest low sample has left the window.
+    assert fire_times(watchdog, [(3, {"power_usage": 350}), (4, {"power_usage": 350})]) == [3]
+
+def test_cooldown_limits_how_often_a_rule_fires():
+    watchdog = alerts.Watchdog([alerts.Rule("hot", "temperature > 83", cooldown=60)])
+    samples = []
+    for start in (0, 10, 70):
+        samples += [(start, {"temperature": 90}), (start + 1, {"temperature": 60})]
+    # The streak at 10 s is within the cooldown of the firing at 0 s.
+    assert fire_times(watchdog, samples) == [0, 70]
+
+def test_mask_operator_matches_any_bit():
+    watchdog = alerts.Watchdog([alerts.Rule("thermal", "throttle_reasons & 0x60", cooldown=0)])
+    samples = [(0, {"throttle_reasons": 0x4}), (1, {"throttle_reasons": 0x0}), (2, {"throttle_reasons": 0x20}),
+               (3, {"throttle_reasons": 0x1}), (4, {"throttle_reasons": 0x44})]
+    assert fire_times(watchdog, samples) == [2, 4]
+
+def test_missing_values_never_match():
+    watchdog = alerts.Watchdog([alerts.Rule("hot", "temperature > 83")])
+    assert fire_times(watchdog, [(0, {"temperature": "N/A"})]) == []
+
+def test_duplicate_rule_names_are_rejected(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"name": "hot", "when": "temperature > 83"}, {"name": "hot", "when": "temperature > 90"}]))
+    with pytest.raises(ValueError, match="Duplicate rule name 'hot'"):
+        alerts.load_rules(str(path))
+    with pytest.raises(ValueError):
+        alerts.ActionRunner([alerts.Rule("a", "temperature > 1"), alerts.Rule("a", "temperature > 2")], submit=None)
+
+def test_unknown_metrics_are_rejected():
+    with pytest.raises(ValueError, match="Unknown metric 'temprature'"):
+        alerts.Rule("typo", "temprature > 80")
+
+def test_check_recording_rejects_metrics_it_does_not_store(tmp_path):
+    path = tmp_path / "session.nvrec"
+    session = recorder.Recorder(str(path))
+    session.record([{"index": 0, "temperature": 70, "throttle_reasons": 0x8}], timestamp=1000.0)
+    session.close()
+    recording = recorder.Recording(str(path))
+    try:
+        with pytest.raises(ValueError, match="throttle_reasons"):
+            alerts.check_recording([alerts.Rule("throttle", "throttle_reasons & 0x8")], recording)
+        assert alerts.check_recording([alerts.Rule("hot", "temperature > 60")], recording)[0]["rule"] == "hot"
+    finally:
+        recording.close()
@@ -0,0 +1,42 @@
+import pytest
+
+from autotune import AutoTuner, SimulatedGpu
+
+def run_simulated(strategy):
+    """Runs AutoTuner over a SimulatedGpu and returns the result and the apply/probe event log."""
+    model = SimulatedGpu()
+    events = []
+
+    def apply_settings(core, mem):
+        events.append(("apply", core, mem))
+        return model.apply(core, mem)
+
+    def probe(core, mem):
+        result = model.probe(core, mem)
+        events.append(("probe", core, mem, result.stable))
+        return result
+
+    tuner = AutoTuner(apply_settings, probe, model.read_stats, strategy, sample_interval=0.01)
+    return tuner.run(), events, model
+
+@pytest.mark.parametrize("strategy, expected", [("binary", (165, 750)), ("step", (165, 900))])
+def test_autotune_finds_the_simulated_limits(strategy, expected):
+    best, _, model = run_simulated(strategy)
+    assert best == expected
+    assert (model.core_offset, model.mem_offset) == expected
+
+@pytest.mark.parametrize("strategy", ["binary", "step"])
+def test_failed_points_are_rolled_back_to_last_good(strategy):
+    _, events, _ = run_simulated(strategy)
+    last_good = None
+    failures = 0
+    for position, event in enumerate(events):
+        if event[0] != "probe":
+            continue
+        if event[3]:
+            last_good = event[1:3]
+            continue
+        failures += 1
+        # The next thing done after a failed probe is re-applying the last good point.
+        assert events[position + 1] == ("apply", *last_good)
+    assert failures
@@ -0,0 +1,35 @@
+import socket
+import threading
+
+import pytest
+
+import daemon
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """TCP daemon server on a free port, with its token file under tmp_path."""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    server = daemon.create_server(None, "127.0.0.1:0")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def post_status(server, authorization: bytes):
+    """Sends a raw POST /api/reset with the given Authorization header bytes; returns the status code."""
+    request = (b"POST /api/reset HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+               b"Content-Length: 2\r\nAuthorization: " + authorization + b"\r\nConnection: close\r\n\r\n{}")
+    with socket.create_connection(server.server_address, timeout=5) as connection:
+        connection.sendall(request)
+        response = b""
+        while chunk := connection.recv(4096):
+            response += chunk
+    return int(response.split()[1])
+
+def test_wrong_token_is_rejected(server):
+    assert post_status(server, b"Bearer " + b"0" * 32) == 401
+
+def test_non_ascii_token_is_rejected(server):
+    assert post_status(server, "Bearer é".encode("latin-1")) == 401
+    assert post_status(server, "Bearer é".encode()) == 401
@@ -0,0 +1,82 @@
+from fancurve import FanCurve, FanCurveController, FanCurveDriver
+
+# 30% at 40 °C rising linearly to 100% at 80 °C (1.75% per degree).
+CURVE = FanCurve([[40, 30], [80, 100]])
+
+def step(controller, temperature, now):
+    """Feeds one sample; a returned speed is confirmed as written right away."""
+    speed = controller.update(temperature, now)
+    if speed is not None:
+        controller.confirm(speed, True, now)
+    return speed
+
+def feed(controller, ramp):
+    """Feeds (time, temperature) pairs and returns the (time, speed) writes."""
+    writes = []
+    for now, temperature in ramp:
+        speed = step(controller, temperature, now)
+        if speed is not None:
+            writes.append((now, speed))
+    return writes
+
+def test_ramp_limit_spreads_a_temperature_jump():
+    controller = FanCurveController(CURVE, max_ramp=10.0, min_hold=0)
+    # Idle at 40 °C, then jump to 80 °C and stay there, one sample per second.
+    ramp = [(0, 40.0)] + [(t, 80.0) for t in range(1, 12)]
+    writes = feed(controller, ramp)
+
+    assert writes[0] == (0, 30)
+    assert [speed for _, speed in writes] == [30, 40, 50, 60, 70, 80, 90, 100]
+    for (t0, s0), (t1, s1) in zip(writes, writes[1:]):
+        assert s1 - s0 <= controller.max_ramp * (t1 - t0)
+    assert controller.current == 100
+
+def test_hysteresis_ignores_small_drops():
+    controller = FanCurveController(CURVE, hysteresis=3.0, max_ramp=1000.0, min_hold=0)
+    assert step(controller, 60.0, 0) == 65
+    # Within the hysteresis band the speed stays put, even though the curve says less.
+    assert feed(controller, [(t, 58.0) for t in range(1, 10)]) == []
+    assert controller.current == 65
+    # A drop clearly below the band follows the curve, minus the hysteresis.
+    assert step(controller, 54.0, 10) == 60
+    # Rising back is followed immediately.
+    assert step(controller, 60.0, 11) == 65
+
+def test_hold_time_delays_decreases_only():
+    controller = FanCurveController(CURVE, hysteresis=0, max_ramp=1000.0, min_hold=5.0)
+    assert step(controller, 72.0, 0) == 85
+    # A cooler sample right after the write is held back until min_hold has passed.
+    writes = feed(controller, [(t, 50.0) for t in range(1, 6)])
+    assert writes == [(5, 50)]
+    # Increases are never held, even right after a write.
+    assert step(controller, 72.0, 6) == 85
+    stats = controller.stats()
+    assert stats["writes"] == 3
+    assert stats["max_latency"] == 4
+
+def test_failed_write_is_not_taken_as_the_fan_speed():
+    controller = FanCurveController(CURVE, max_ramp=1000.0, min_hold=5.0)
+    assert controller.update(60.0, 0) == 65
+    # Nothing else is written while a write is in flight.
+    assert controller.update(70.0, 1) is None
+    controller.confirm(65, False, now=1)
+    assert controller.current is None
+    # Retried after min_hold, with the target of the latest sample.
+    assert controller.update(70.0, 3) is None
+    assert controller.update(70.0, 6) == 80
+    controller.confirm(80, True, now=6)
+    assert controller.current == 80
+    assert controller.stats()["failures"] == 1
+    assert controller.stats()["writes"] == 1
+
+def test_driver_commits_speeds_from_the_write_outcome():
+    outcomes = []
+    driver = FanCurveDriver(CURVE, [0], lambda speed, indices, done: outcomes.append((speed, indices, done)),
+                            max_ramp=1000.0, min_hold=0)
+    driver.on_sample([{"index": 0, "temperature": 60.0}], now=0)
+    speed, indices, done = outcomes.pop()
+    assert (speed, indices) == (65, [0])
+    assert driver.controllers[0].current is None
+    done(True)
+    assert driver.controllers[0].current == 65
+    assert driver.writes == 1
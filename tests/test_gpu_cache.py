@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import gpu
+
+class FailingBackend:
+    """Backend whose GPUs never answer, counting how often it is asked."""
+
+    def __init__(self):
+        self.reads = 0
+
+    def read_all(self, keys):
+        self.reads += 1
+        return []
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def failing_backend():
+    previous = gpu.get_backend()
+    backend = FailingBackend()
+    gpu.set_backend(backend)
+    yield backend
+    gpu.set_backend(previous)
+
+def test_failed_static_query_is_cached(failing_backend, monkeypatch):
+    assert gpu.get_static_info_all() == {}
+    for _ in range(10):
+        assert gpu.with_static_info({"index": 0}) == {"index": 0}
+    assert failing_backend.reads == 1
+
+    # Retried once the failure is older than STATIC_RETRY_TTL.
+    monkeypatch.setattr(gpu._static_query, "error_ttl", 0)
+    assert gpu.get_static_info_all() == {}
+    assert failing_backend.reads == 2
+
+def test_cached_query_retries_failures_without_error_ttl():
+    calls = []
+    def query():
+        calls.append(1)
+        raise RuntimeError("no GPU")
+    cached = gpu.CachedQuery(query)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            cached.get()
+    assert len(calls) == 3
+
+def run_together(cached, callers=8):
+    """Starts callers threads on cached.get() at once; returns what each got (value or exception)."""
+    barrier = threading.Barrier(callers)
+    outcomes = [None] * callers
+
+    def call(position):
+        barrier.wait()
+        try:
+            outcomes[position] = cached.get()
+        except Exception as e:
+            outcomes[position] = e
+
+    threads = [threading.Thread(target=call, args=(position,)) for position in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return outcomes
+
+def test_concurrent_callers_share_one_query():
+    calls = []
+    def slow_query():
+        calls.append(1)
+        time.sleep(0.2)
+        return [{"index": 0, "temperature": 60}]
+    # ttl=0: nothing is served from the cache, callers can only share the query in flight.
+    outcomes = run_together(gpu.CachedQuery(slow_query, ttl=0))
+    assert len(calls) == 1
+    assert outcomes[0] == [{"index": 0, "temperature": 60}]
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+
+def test_concurrent_callers_share_one_failure():
+    calls = []
+    def slow_failure():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("no GPU")
+    outcomes = run_together(gpu.CachedQuery(slow_failure))
+    assert len(calls) == 1
+    assert all(isinstance(outcome, RuntimeError) and outcome is outcomes[0] for outcome in outcomes)
@@ -0,0 +1,42 @@
+import logging
+import os
+import time
+
+import logsetup
+
+def make_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+def test_old_log_is_rotated_even_if_recently_written(tmp_path):
+    path = tmp_path / "nvidiaoc.log"
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - 2 * 24 * 3600))
+    path.write_text(f"{started},000 - INFO - first run\n")
+    # A later run appended to it a moment ago, so the mtime is recent.
+    with open(path, "a") as f:
+        f.write("2099-01-01 00:00:00,000 - INFO - latest run\n")
+    os.utime(path)
+
+    handler = logsetup.SizeAndTimeRotatingFileHandler(str(path), max_bytes=0, max_age=24 * 3600, backup_count=1)
+    handler.setFormatter(logging.Formatter(logsetup.LOG_FORMAT))
+    try:
+        handler.emit(make_record("new run"))
+    finally:
+        handler.close()
+
+    assert "first run" in (tmp_path / "nvidiaoc.log.1").read_text()
+    assert "new run" in path.read_text() and "first run" not in path.read_text()
+
+def test_young_log_is_kept(tmp_path):
+    path = tmp_path / "nvidiaoc.log"
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - 60))
+    path.write_text(f"{started},000 - INFO - first run\n")
+
+    handler = logsetup.SizeAndTimeRotatingFileHandler(str(path), max_bytes=0, max_age=24 * 3600, backup_count=1)
+    handler.setFormatter(logging.Formatter(logsetup.LOG_FORMAT))
+    try:
+        handler.emit(make_record("new run"))
+    finally:
+        handler.close()
+
+    assert not (tmp_path / "nvidiaoc.log.1").exists()
+    assert path.read_text().splitlines()[-1].endswith("new run")
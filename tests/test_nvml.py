@@ -0,0 +1,87 @@
+import ctypes
+
+import gpu
+import nvml
+
+class FakeLibrary:
+    """Stands in for libnvidia-ml: one GPU at 61 °C, fan speed not supported, running 100 compute processes."""
+
+    def __init__(self, init_result=nvml.NVML_SUCCESS):
+        self.init_result = init_result
+        self.process_count = 100
+        self.calls = []
+
+    def nvmlInit_v2(self):
+        self.calls.append("nvmlInit_v2")
+        return self.init_result
+
+    def nvmlShutdown(self):
+        self.calls.append("nvmlShutdown")
+        return nvml.NVML_SUCCESS
+
+    def nvmlDeviceGetCount_v2(self, count):
+        count._obj.value = 1
+        return nvml.NVML_SUCCESS
+
+    def nvmlDeviceGetHandleByIndex_v2(self, index, handle):
+        handle._obj.value = 0x1000 + index.value
+        return nvml.NVML_SUCCESS
+
+    def nvmlDeviceGetTemperature(self, handle, sensor, value):
+        value._obj.value = 61
+        return nvml.NVML_SUCCESS
+
+    def nvmlDeviceGetFanSpeed(self, handle, value):
+        return nvml.NVML_ERROR_NOT_SUPPORTED
+
+    def nvmlDeviceGetComputeRunningProcesses_v2(self, handle, count, infos):
+        # More processes than the first buffer holds: NVML asks for a bigger one.
+        self.calls.append("nvmlDeviceGetComputeRunningProcesses_v2")
+        if count._obj.value < self.process_count:
+            count._obj.value = self.process_count
+            return nvml.NVML_ERROR_INSUFFICIENT_SIZE
+        for position in range(self.process_count):
+            infos[position].pid = 1000 + position
+            infos[position].usedGpuMemory = 256 * 2**20
+        count._obj.value = self.process_count
+        return nvml.NVML_SUCCESS
+
+    def nvmlDeviceGetProcessUtilization(self, handle, samples, count, since):
+        return nvml.NVML_ERROR_NOT_SUPPORTED
+
+def test_read_all_maps_not_supported_to_na():
+    backend = nvml.NvmlBackend(FakeLibrary())
+    stats = backend.read_all(["index", "temperature", "fan_speed", "no_such_metric"])
+    assert stats == [{"index": 0, "temperature": 61, "fan_speed": "N/A", "no_such_metric": "N/A"}]
+
+def test_not_supported_is_not_logged_as_error(caplog):
+    backend = nvml.NvmlBackend(FakeLibrary())
+    backend.read_all(["fan_speed"])
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+def test_init_failure_raises_nvml_error():
+    library = FakeLibrary(init_result=9) # NVML_ERROR_DRIVER_NOT_LOADED
+    try:
+        nvml.NvmlBackend(library)
+    except nvml.NvmlError as e:
+        assert e.args[1] == 9
+    else:
+        raise AssertionError("NvmlBackend accepted a failed nvmlInit_v2")
+
+def test_init_failure_falls_back_to_smi(monkeypatch):
+    monkeypatch.setattr(nvml, "load_library", lambda: FakeLibrary(init_result=9))
+    backend = gpu._create_backend("auto")
+    assert isinstance(backend, gpu.SmiBackend)
+
+def test_nvml_is_used_when_init_succeeds(monkeypatch):
+    monkeypatch.setattr(nvml, "load_library", FakeLibrary)
+    backend = gpu._create_backend("auto")
+    assert backend.name == "nvml"
+    assert isinstance(backend.handles[0], ctypes.c_void_p)
+
+def test_read_processes_grows_the_buffer_when_nvml_asks():
+    library = FakeLibrary()
+    processes = nvml.NvmlBackend(library).read_processes()
+    assert len(processes) == library.process_count > nvml.MAX_PROCESSES
+    assert processes[-1] == {"gpu": 0, "pid": 1099, "used_memory": 256, "sm": "N/A", "name": "N/A"}
+    assert library.calls.count("nvmlDeviceGetComputeRunningProcesses_v2") == 2
@@ -0,0 +1,76 @@
+import pytest
+
+import history
+import recorder
+
+METRICS = history.HISTORY_METRICS
+
+def sample(index, temperature):
+    """One GPU's stats with every recorded metric; the fan does not report a speed."""
+    stats = {"index": index, "name": "Fake GPU", **{metric: 0 for metric in METRICS}}
+    stats.update(temperature=temperature, power_usage=100 + temperature, fan_speed="N/A")
+    return [stats]
+
+def record_session(path, count, **options):
+    session = recorder.Recorder(str(path), metrics=METRICS, **options)
+    for second in range(count):
+        session.record(sample(0, 40 + second), timestamp=1000.0 + second)
+    session.close()
+    return session
+
+def test_existing_recording_is_refused_or_replaced(tmp_path):
+    path = tmp_path / "session.nvrec"
+    record_session(path, 3)
+    with pytest.raises(recorder.RecordingError):
+        recorder.Recorder(str(path), metrics=METRICS)
+
+    record_session(path, 2, overwrite=True)
+    recording = recorder.Recording(str(path))
+    assert len(recording) == 2
+    assert recording.metrics == METRICS
+    recording.close()
+
+def test_samples_round_trip(tmp_path):
+    path = tmp_path / "session.nvrec"
+    record_session(path, 1)
+    recording = recorder.Recording(str(path))
+    assert list(recording.samples()) == [(1000.0, sample(0, 40))]
+    recording.close()
+
+def test_oldest_segments_are_dropped(tmp_path):
+    path = tmp_path / "session.nvrec"
+    record_size = recorder.record_struct(METRICS).size
+    header_size = record_session(tmp_path / "probe.nvrec", 1)._size - record_size
+    # Room for the header and two records per segment, with slack for the padded header changing length.
+    record_session(path, 10, max_bytes=header_size + 2 * record_size + record_size // 2, max_segments=3)
+
+    assert recorder.segment_paths(str(path)) == [f"{path}.2", f"{path}.3", f"{path}.4"]
+    recording = recorder.Recording(str(path))
+    assert [time for time, _ in recording.samples()] == [1004.0, 1005.0, 1006.0, 1007.0, 1008.0, 1009.0]
+    recording.close()
+
+def test_records_are_flushed_while_recording(tmp_path):
+    path = tmp_path / "session.nvrec"
+    session = recorder.Recorder(str(path), metrics=METRICS, flush_interval=0)
+    session.record(sample(0, 50), timestamp=1000.0)
+    # Still open, but the record is already on disk.
+    recording = recorder.Recording(str(path))
+    assert len(recording) == 1
+    recording.close()
+    session.close()
+
+def test_replay_is_paced_by_the_recorded_timestamps(tmp_path):
+    path = tmp_path / "session.nvrec"
+    record_session(path, 10)
+    source = recorder.ReplaySource(str(path))
+
+    assert source.get_stats(now=0.0)[0]["temperature"] == 40
+    # Fast GUI ticks keep showing the same sample...
+    assert source.get_stats(now=0.1)[0]["temperature"] == 40
+    assert source.get_stats(now=0.5)[0]["temperature"] == 40
+    # ...and slow ones skip ahead to the sample due at that time.
+    assert source.get_stats(now=4.2)[0]["temperature"] == 44
+    assert not source.finished
+    assert source.get_stats(now=60.0)[0]["temperature"] == 49
+    assert source.finished
+    source.close()
@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+import gpu
+
+STUBS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "stubs")
+
+@pytest.fixture
+def spawn_log(tmp_path, monkeypatch):
+    """Puts the nvidia-smi stub on PATH and returns the file it logs every spawn to."""
+    log_path = tmp_path / "spawns.log"
+    monkeypatch.setenv("PATH", STUBS + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("BENCH_SPAWN_LOG", str(log_path))
+    monkeypatch.setenv("BENCH_LATENCY_MS", "0")
+    return log_path
+
+def spawns(log_path):
+    return log_path.read_text().split().count("nvidia-smi") if log_path.exists() else 0
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_streaming_sampler_restarts_only_for_faster_or_sustained_intervals(spawn_log):
+    sampler = gpu.StreamingSampler(interval_ms=100, keys=["temperature"], settle_seconds=0.5)
+    sampler.start()
+    try:
+        assert wait_for(lambda: sampler.get_latest_all() is not None)
+        assert spawns(spawn_log) == 1
+
+        # Flapping between slower intervals (as an adaptive reader would) keeps the child.
+        for interval in (200, 400, 800, 400, 200):
+            sampler.set_interval(interval)
+        time.sleep(0.3)
+        assert spawns(spawn_log) == 1
+
+        # Faster than the child: restarted at once.
+        sampler.set_interval(50)
+        assert wait_for(lambda: spawns(spawn_log) == 2)
+
+        # Slower and held for settle_seconds: one restart.
+        sampler.set_interval(150)
+        assert wait_for(lambda: spawns(spawn_log) == 3)
+        time.sleep(0.8)
+        assert spawns(spawn_log) == 3
+    finally:
+        sampler.stop()
+
+def test_streaming_sampler_settles_at_a_backed_off_interval(spawn_log):
+    sampler = gpu.StreamingSampler(interval_ms=50, keys=["temperature"], settle_seconds=0.3)
+    sampler.start()
+    try:
+        assert wait_for(lambda: sampler.get_latest_all() is not None)
+        # An adaptive reader doubling its interval while values stay stable.
+        for interval in (100, 200, 400):
+            sampler.set_interval(interval)
+            time.sleep(0.1)
+        # Once the slowest interval has held for settle_seconds the child follows it, once.
+        assert wait_for(lambda: spawns(spawn_log) == 2)
+        assert wait_for(lambda: sampler._child_interval == 400)
+        time.sleep(0.5)
+        assert spawns(spawn_log) == 2
+    finally:
+        sampler.stop()
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+def test_cli_import_does_not_load_the_gui_or_the_daemon():
+    # A fresh interpreter, so modules imported by other tests do not count.
+    result = run_python("-c", (
+        "import json, sys; import nvidia_control; "
+        "print(json.dumps([m for m in ('tkinter', 'http.server', 'gui', 'daemon') if m in sys.modules]))"
+    ))
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+def test_rules_need_daemon_or_replay(tmp_path):
+    rules = tmp_path / "rules.json"
+    rules.write_text("[]")
+    result = run_python("nvidia_control.py", "--rules", str(rules))
+    assert result.returncode == 2
+    assert "--rules needs --daemon" in result.stderr
+
+def test_dependency_check_is_cached_until_path_changes(tmp_path, monkeypatch):
+    import nvidia_control
+    lookups = []
+    monkeypatch.setattr(nvidia_control.shutil, "which", lambda name, path=None: lookups.append(path) or "/usr/bin/xhost")
+    monkeypatch.setattr(nvidia_control, "_dependencies_found_on", None)
+    monkeypatch.setenv("PATH", "/usr/bin")
+    assert nvidia_control.check_system_dependencies()
+    assert nvidia_control.check_system_dependencies()
+    assert lookups == ["/usr/bin"]
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin")
+    assert nvidia_control.check_system_dependencies()
+    assert lookups == ["/usr/bin", f"{tmp_path}:/usr/bin"]
+
+def test_missing_dependency_is_checked_again(monkeypatch, capsys):
+    import nvidia_control
+    found = [None, "/usr/bin/xhost"]
+    monkeypatch.setattr(nvidia_control.shutil, "which", lambda name, path=None: found.pop(0))
+    monkeypatch.setattr(nvidia_control, "_dependencies_found_on", None)
+    assert not nvidia_control.check_system_dependencies()
+    # xhost installed meanwhile, same PATH.
+    assert nvidia_control.check_system_dependencies()
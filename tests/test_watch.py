@@ -0,0 +1,31 @@
+import io
+import json
+import time
+
+import gpu
+import watch
+
+class LaggingSampler:
+    """Sampler whose only sample was taken `age` seconds before it is read."""
+
+    def __init__(self, age):
+        self.sample_time = time.monotonic() - age
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_updates(self, since=None):
+        if since is not None and since >= self.sample_time:
+            return [], since
+        return [{"index": 0, "temperature": 60}], self.sample_time
+
+def test_records_carry_the_sample_time(monkeypatch):
+    monkeypatch.setattr(gpu, "create_sampler", lambda interval_ms, keys: LaggingSampler(age=30))
+    out = io.StringIO()
+    assert watch.run_watch(["temperature"], interval_ms=10, count=1, out=out) == 0
+    record = json.loads(out.getvalue())
+    assert abs(record["time"] - (time.time() - 30)) < 1
+    assert record["temperature"] == 60
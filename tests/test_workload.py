@@ -0,0 +1,103 @@
+import os
+import struct
+
+import workload
+
+def make_process(proc, pid, exe, start_time=1000):
+    """Creates /proc/<pid> with an exe link, a stat and an empty cgroup, or re-points them (an exec)."""
+    directory = proc / str(pid)
+    directory.mkdir(exist_ok=True)
+    link = directory / "exe"
+    if os.path.lexists(link):
+        link.unlink()
+    link.symlink_to(f"/usr/bin/{exe}")
+    fields = ["S", "1"] + ["0"] * 17 + [str(start_time)] + ["0"] * 10
+    (directory / "stat").write_text(f"{pid} ({exe[:15]}) {' '.join(fields)}\n")
+    (directory / "cgroup").write_text("0::/user.slice\n")
+
+def remove_process(proc, pid):
+    directory = proc / str(pid)
+    for name in ("exe", "stat", "cgroup"):
+        (directory / name).unlink()
+    directory.rmdir()
+
+class CountingTracker(workload.ProcessTracker):
+    """ProcessTracker that counts how often each pid is classified."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.classified = []
+
+    def classify(self, pid):
+        self.classified.append(pid)
+        return super().classify(pid)
+
+def test_marker_is_read_from_stat(tmp_path):
+    make_process(tmp_path, 100, "a (weird) name", start_time=4242)
+    assert workload.read_marker(100, str(tmp_path)) == (b"a (weird) name", b"4242")
+    assert workload.read_marker(101, str(tmp_path)) is None
+
+def test_tracker_reclassifies_known_pids_after_an_exec(tmp_path):
+    make_process(tmp_path, 100, "launcher")
+    make_process(tmp_path, 200, "shell")
+    tracker = CountingTracker([workload.WorkloadRule("Gaming", exe="game")], str(tmp_path), reclassify_scans=3)
+    tracker.scan()
+    assert tracker.active_profile() is None
+
+    # The launcher execs the game under the same pid: no new pid to notice...
+    make_process(tmp_path, 100, "game")
+    tracker.scan()
+    assert tracker.active_profile() is None
+    # ...until the periodic pass sees its marker changed. The unchanged pid is not read again.
+    tracker.scan()
+    assert tracker.active_profile() == "Gaming"
+    assert tracker.counts == [1]
+    assert sorted(tracker.classified) == [100, 100, 200]
+
+    remove_process(tmp_path, 100)
+    tracker.scan()
+    assert tracker.active_profile() is None
+    assert tracker.counts == [0]
+
+def test_switcher_only_records_successful_applies():
+    results = [False, True]
+    calls = []
+
+    def apply(profile):
+        calls.append(profile)
+        return results.pop(0)
+
+    switcher = workload.ProfileSwitcher(apply, fallback="Default", debounce=3)
+    assert switcher.update("Gaming", now=0) is None
+    # The first apply fails: nothing is recorded and it is not retried on the next tick.
+    assert switcher.update("Gaming", now=3) is None
+    assert switcher.applied == "Default"
+    assert switcher.update("Gaming", now=4) is None
+    # Retried once another debounce period has passed.
+    assert switcher.update("Gaming", now=6) == "Gaming"
+    assert switcher.applied == "Gaming"
+    assert calls == ["Gaming", "Gaming"]
+    assert switcher.switches == 1
+
+def fork_message(parent, child, child_tgid=None):
+    """A netlink process connector message for parent forking child."""
+    event = struct.pack("=IIQiiii", workload.PROC_EVENT_FORK, 0, 0, parent, parent, child, child if child_tgid is None else child_tgid)
+    message = workload.CN_MSG_HEADER.pack(workload.CN_IDX_PROC, workload.CN_VAL_PROC, 0, 0, len(event), 0) + event
+    return workload.NLMSG_HEADER.pack(workload.NLMSG_HEADER.size + len(message), workload.NLMSG_DONE, 0, 0, 0) + message
+
+def test_forked_child_inherits_the_parent_rule(tmp_path):
+    make_process(tmp_path, 100, "game")
+    # No socket: only the event handling is exercised.
+    tracker = workload.ProcConnectorTracker.__new__(workload.ProcConnectorTracker)
+    workload.ProcessTracker.__init__(tracker, [workload.WorkloadRule("Gaming", exe="game")], str(tmp_path))
+    tracker.scan()
+    assert tracker.counts == [1]
+
+    # A worker forked by the game, without exec, keeps it matched after the game exits.
+    tracker.handle(fork_message(100, 101))
+    # A new thread is not a process.
+    tracker.handle(fork_message(100, 102, child_tgid=100))
+    assert tracker.counts == [2]
+    assert 102 not in tracker.known
+    tracker.remove(100)
+    assert tracker.active_profile() == "Gaming"
@@ -0,0 +1,88 @@
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+import gpu
+
+FORMATS = ("jsonl", "csv")
+
+def parse_fields(value):
+    """Parses a comma-separated list of stats keys, e.g. "temperature,power_usage"."""
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in gpu.QUERY_FIELDS]
+    if unknown or not fields:
+        known = ", ".join(gpu.QUERY_FIELDS)
+        raise ValueError(f"Unknown field(s) {', '.join(unknown) or '(none)'}. Available: {known}.")
+    return fields
+
+class RecordWriter:
+    """Writes one stats dictionary per line as JSON or CSV and flushes after every record."""
+
+    def __init__(self, out, fields, output_format="jsonl"):
+        self.out = out
+        self.columns = ["time", "index"] + [field for field in fields if field != "index"]
+        self.output_format = output_format
+        self._csv = csv.writer(out, lineterminator="\n") if output_format == "csv" else None
+        if self._csv:
+            self._csv.writerow(self.columns)
+            out.flush()
+
+    def write(self, timestamp, stats):
+        row = {"time": round(timestamp, 3), **stats}
+        if self._csv:
+            self._csv.writerow([row.get(column, "N/A") for column in self.columns])
+        else:
+            self.out.write(json.dumps({column: row.get(column, "N/A") for column in self.columns}) + "\n")
+        self.out.flush()
+
+def run_watch(fields=None, interval_ms=1000, output_format="jsonl", count=None, gpu_indices=None, out=None):
+    """
+    Streams samples to `out` (stdout) until interrupted or `count` samples
+    were written, each sample being one line per GPU.
+
+    The sampler only keeps the latest sample per GPU, so when the consumer
+    reads slower than the interval, samples are dropped instead of queued and
+    memory stays flat. Returns the process exit status.
+    """
+    out = out or sys.stdout
+    fields = list(fields or gpu.QUERY_FIELDS)
+    # Only query what is printed, plus the index the lines are keyed by.
+    # Static attributes (name, driver...) are merged in by the sampler from memoized values.
+    sampler = gpu.create_sampler(interval_ms, keys=["index"] + [field for field in fields if field != "index" and field not in gpu.STATIC_FIELDS])
+    writer = RecordWriter(out, fields, output_format)
+    wanted = set(gpu_indices) if gpu_indices is not None else None
+
+    written = dropped = 0
+    last_seen = None
+    sampler.start()
+    try:
+        next_tick = time.monotonic()
+        while count is None or written < count:
+            samples, last_seen = sampler.get_updates(last_seen)
+            samples = [stats for stats in samples if wanted is None or stats.get("index") in wanted]
+            if samples:
+                # The sampler stamps samples with time.monotonic(); convert that instant to wall-clock time.
+                timestamp = time.time() - (time.monotonic() - last_seen)
+                for stats in samples:
+                    writer.write(timestamp, stats)
+                written += 1
+            # Ticks missed while the consumer was blocking the write are skipped, not made up.
+            next_tick += interval_ms / 1000
+            now = time.monotonic()
+            if next_tick < now:
+                dropped += int((now - next_tick) / (interval_ms / 1000)) + 1
+                next_tick = now + interval_ms / 1000
+            time.sleep(max(0.0, next_tick - now))
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The consumer went away (e.g. `| head`); keep the flush at exit from failing again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+    finally:
+        sampler.stop()
+    if dropped:
+        logging.info(f"Watch skipped {dropped} tick(s) because the output was not read fast enough.")
+    return 0
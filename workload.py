@@ -0,0 +1,310 @@
+import errno
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import struct
+import time
+
+# Netlink process connector (linux/connector.h, linux/cn_proc.h).
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+NLMSG_HEADER = struct.Struct("=IHHII")
+CN_MSG_HEADER = struct.Struct("=IIIIHH")
+PROC_EVENT_HEADER = struct.Struct("=IIQii") # what, cpu, timestamp, process pid, process tgid
+FORK_EVENT = struct.Struct("=16xiiii") # (what, cpu, timestamp) parent pid, parent tgid, child pid, child tgid
+
+DEFAULT_DEBOUNCE = 3.0 # seconds
+RECLASSIFY_SCANS = 10 # scans between checks of the known pids for an exec
+
+class WorkloadRule:
+    """Maps processes to a profile by executable name and/or cgroup path substring."""
+
+    def __init__(self, profile: str, exe=None, cgroup=None):
+        if not exe and not cgroup:
+            raise ValueError(f"Workload rule for '{profile}' needs an exe or a cgroup.")
+        self.profile = profile
+        self.exe = {exe} if isinstance(exe, str) else set(exe or ())
+        self.cgroup = [cgroup] if isinstance(cgroup, str) else list(cgroup or ())
+
+    def matches(self, info: dict) -> bool:
+        if info["exe"] in self.exe:
+            return True
+        return any(pattern in info["cgroup"] for pattern in self.cgroup)
+
+def load_config(path: str):
+    """
+    Reads {"rules": [{"profile", "exe", "cgroup"}...], "fallback", "debounce"}.
+    Rules earlier in the list win when several workloads run at once. The
+    fallback profile (default "Default", null to reset) is applied when the
+    last matching process exits. Raises ValueError if the file is not valid.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        rules = [WorkloadRule(rule["profile"], rule.get("exe"), rule.get("cgroup")) for rule in data["rules"]]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Cannot read workload rules from '{path}': {e}")
+    return rules, data.get("fallback", "Default"), float(data.get("debounce", DEFAULT_DEBOUNCE))
+
+def read_process(pid: int, proc: str = "/proc"):
+    """Executable name and cgroup of a process, or None if it is gone."""
+    try:
+        exe = os.path.basename(os.readlink(f"{proc}/{pid}/exe"))
+    except PermissionError:
+        # Processes of other users: the name the kernel keeps is readable by anyone.
+        try:
+            with open(f"{proc}/{pid}/comm") as f:
+                exe = f.read().strip()
+        except OSError:
+            return None
+    except OSError:
+        return None
+    try:
+        with open(f"{proc}/{pid}/cgroup") as f:
+            cgroup = f.read()
+    except OSError:
+        cgroup = ""
+    return {"exe": exe.removesuffix(" (deleted)"), "cgroup": cgroup}
+
+def read_marker(pid: int, proc: str = "/proc"):
+    """
+    (comm, start time) from /proc/<pid>/stat, or None if the process is gone.
+    One small read that changes when the pid execs (comm) or is reused (start time).
+    """
+    try:
+        with open(f"{proc}/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses; fields after the last ")" are plain.
+    end = stat.rindex(b")")
+    return stat[stat.index(b"(") + 1:end], stat[end + 2:].split()[19]
+
+class ProcessTracker:
+    """
+    Keeps the rule matched by every known pid and a count of matching pids
+    per rule, so the active workloads are known without walking all pids.
+    A pid that execs keeps its number (e.g. a launcher that execs the game),
+    so every `reclassify_scans` scans the comm and start time of the known
+    pids are compared with the ones they were classified with, and only the
+    pids where they changed are classified again.
+    """
+
+    def __init__(self, rules, proc: str = "/proc", reclassify_scans: int = RECLASSIFY_SCANS):
+        self.rules = rules
+        self.proc = proc
+        self.reclassify_scans = reclassify_scans
+        self.known = {} # pid -> position of the matching rule, or None
+        self.markers = {} # pid -> read_marker() at classification
+        self.counts = [0] * len(rules)
+        self.scans = 0
+
+    def classify(self, pid: int):
+        info = read_process(pid, self.proc)
+        if info is None:
+            return None
+        return next((position for position, rule in enumerate(self.rules) if rule.matches(info)), None)
+
+    def add(self, pid: int, position=False):
+        """Classifies a pid, or records it under `position` (e.g. inherited from its parent) if given."""
+        self.remove(pid)
+        self.markers[pid] = read_marker(pid, self.proc)
+        if position is False:
+            position = self.classify(pid)
+        self.known[pid] = position
+        if position is not None:
+            self.counts[position] += 1
+
+    def remove(self, pid: int):
+        self.markers.pop(pid, None)
+        position = self.known.pop(pid, None)
+        if position is not None:
+            self.counts[position] -= 1
+
+    def scan(self) -> int:
+        """
+        Diffs the pid set of /proc with the known one; only new pids are read,
+        plus, every reclassify_scans-th scan, known pids whose marker changed.
+        """
+        pids = {int(name) for name in os.listdir(self.proc) if name.isdigit()}
+        self.scans += 1
+        new = pids - self.known.keys()
+        for pid in self.known.keys() - pids:
+            self.remove(pid)
+        if self.reclassify_scans and self.scans % self.reclassify_scans == 0:
+            new |= {pid for pid in self.known if read_marker(pid, self.proc) != self.markers.get(pid)}
+        for pid in new:
+            self.add(pid)
+        return len(new)
+
+    def active_profile(self):
+        """Profile of the first rule with a running process, or None."""
+        return next((self.rules[position].profile for position, count in enumerate(self.counts) if count), None)
+
+    def poll(self, timeout: float):
+        """Waits up to timeout seconds for process changes and applies them."""
+        time.sleep(timeout)
+        self.scan()
+
+    def close(self):
+        pass
+
+class ProcConnectorTracker(ProcessTracker):
+    """
+    ProcessTracker fed by fork/exec/exit events of the netlink process
+    connector instead of periodic scans. A forked child inherits its parent's
+    rule until it execs. Subscribing needs CAP_NET_ADMIN (root).
+    """
+
+    def __init__(self, rules, proc: str = "/proc"):
+        super().__init__(rules, proc)
+        self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self.socket.bind((os.getpid(), CN_IDX_PROC))
+            payload = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+            message = CN_MSG_HEADER.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+            self.socket.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(message), NLMSG_DONE, 0, 0, os.getpid()) + message)
+        except OSError:
+            self.socket.close()
+            raise
+        # Processes that started before the subscription.
+        self.scan()
+
+    def poll(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.socket], [], [], remaining)[0]:
+                return
+            try:
+                data = self.socket.recv(65536)
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # Events were dropped while we were busy: resynchronise from /proc.
+                logging.warning("Process connector overrun, rescanning /proc.")
+                self.scan()
+                continue
+            self.handle(data)
+
+    def handle(self, data: bytes):
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length = NLMSG_HEADER.unpack_from(data, offset)[0]
+            if length < NLMSG_HEADER.size:
+                break
+            event_offset = offset + NLMSG_HEADER.size + CN_MSG_HEADER.size
+            if event_offset + PROC_EVENT_HEADER.size <= offset + length:
+                what, _, _, pid, tgid = PROC_EVENT_HEADER.unpack_from(data, event_offset)
+                if what == PROC_EVENT_FORK:
+                    if event_offset + FORK_EVENT.size <= offset + length:
+                        _, parent_tgid, child, child_tgid = FORK_EVENT.unpack_from(data, event_offset)
+                        # New processes only, not threads; same program as the parent until it execs.
+                        if child == child_tgid:
+                            self.add(child, self.known[parent_tgid] if parent_tgid in self.known else False)
+                # Only whole processes (thread group leaders) are tracked.
+                elif pid == tgid:
+                    if what == PROC_EVENT_EXEC:
+                        self.add(pid)
+                    elif what == PROC_EVENT_EXIT:
+                        self.remove(pid)
+            offset += (length + 3) & ~3
+
+    def close(self):
+        self.socket.close()
+
+def create_tracker(rules):
+    """Uses the process connector when permitted, otherwise scans /proc."""
+    # Without CAP_NET_ADMIN the subscription is accepted but no event is ever delivered.
+    if os.geteuid() == 0:
+        try:
+            tracker = ProcConnectorTracker(rules)
+            logging.info("Watching processes through the netlink process connector.")
+            return tracker
+        except OSError as e:
+            logging.info(f"Process connector unavailable ({e}), scanning /proc instead.")
+    tracker = ProcessTracker(rules)
+    tracker.scan()
+    return tracker
+
+class ProfileSwitcher:
+    """
+    Applies the profile of the active workload once it has stayed the same
+    for `debounce` seconds. Processes that start and exit in between, or
+    flap, never reach apply(), so they cost no privileged write.
+    apply(profile) returns whether it succeeded; a failed apply is retried
+    after another debounce period.
+    """
+
+    def __init__(self, apply, fallback="Default", debounce: float = DEFAULT_DEBOUNCE):
+        self.apply = apply
+        self.fallback = fallback
+        self.debounce = debounce
+        # Settings are left alone until a workload starts.
+        self.applied = fallback
+        self.pending = fallback
+        self.pending_since = 0.0
+        self.switches = 0
+
+    def update(self, profile, now: float = None):
+        """Feeds the active profile (None: no workload). Returns the profile applied, if any."""
+        now = time.monotonic() if now is None else now
+        desired = profile if profile is not None else self.fallback
+        if desired != self.pending:
+            self.pending, self.pending_since = desired, now
+        if desired == self.applied or now - self.pending_since < self.debounce:
+            return None
+        logging.info(f"Workload changed, applying {'profile ' + repr(desired) if desired else 'the default settings'}.")
+        if not self.apply(desired):
+            logging.warning(f"Applying {'profile ' + repr(desired) if desired else 'the default settings'} failed. Retrying in {self.debounce:g} s.")
+            self.pending_since = now
+            return None
+        self.applied = desired
+        self.switches += 1
+        return desired
+
+def run_auto_profiles(config_path: str, gpu_indices=(0,), interval_ms: int = 1000) -> int:
+    """Entry point of --auto-profiles: switches profiles until SIGINT/SIGTERM. Returns the exit status."""
+    import gpu
+    import profiles
+    try:
+        rules, fallback, debounce = load_config(config_path)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+
+    stored = profiles.load_profiles()
+    for name in {rule.profile for rule in rules} | ({fallback} if fallback else set()):
+        if name not in stored:
+            logging.warning(f"Workload profile '{name}' does not exist yet; it will be skipped until it is created.")
+
+    def apply(name):
+        # apply_profile returns None for a profile that does not exist.
+        result = gpu.reset_all_settings(gpu_indices) if name is None else profiles.apply_profile(name, gpu_indices)
+        return result is not None and result.returncode == 0
+
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    tracker = create_tracker(rules)
+    switcher = ProfileSwitcher(apply, fallback, debounce)
+    logging.info(f"Switching profiles for {len(rules)} workload rule(s), fallback {fallback!r}.")
+    try:
+        while True:
+            switcher.update(tracker.active_profile())
+            tracker.poll(interval_ms / 1000)
+    except KeyboardInterrupt:
+        logging.info(f"Stopping automatic profile switching after {switcher.switches} switch(es).")
+    finally:
+        tracker.close()
+    return 0